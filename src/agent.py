@@ -36,6 +36,12 @@ import time
 import random
 from heapq import heappush, heappop
 
+from think_time_model import ThinkTimeModel
+from distance_field import get_distance_fields
+from perceived_cost import get_cost_field
+from seeding import make_rng, record_seed
+from reason_log import load_reason_log
+
 # --- 補助関数 ---
 
 def parse_coordinate(coord_str):
@@ -51,7 +57,10 @@ def load_decision_points_from_file(file_path):
     """
     実験データ形式のファイルから、各ブロック内の "Coordinates: (x,y)" 部分を抽出し
     意思決定ポイントのリストとして返す．
+    JSON Lines 形式（.jsonl）の理由ログの場合は reason_log.load_reason_log で読み込む．
     """
+    if file_path.endswith('.jsonl'):
+        return [tuple(int(v) for v in p) for p in load_reason_log(file_path)['coordinates']]
     decision_points = []
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -77,12 +86,27 @@ def load_decision_points_from_file(file_path):
 # --- エージェント本体 ---
 
 class MazeAgent:
-    def __init__(self, maze_file, decision_points, start, goal):
+    def __init__(self, maze_file, decision_points, start, goal, timing=None, use_distance_cache=False,
+                 seed=None, instrument=False, cost_field=None, turn_penalty=0):
         """
         maze_file       : 迷路仕様ファイルのパス
         decision_points : 意思決定ポイントの座標（リスト of (row, col)）
         start           : スタート位置 (row, col)
         goal            : ゴール位置 (row, col)
+        timing          : 移動・待機時間のモデル（ThinkTimeModel）．省略時は既定値
+        use_distance_cache : True なら全セル間の最短経路表（distance_field，ディスクにキャッシュ）から
+                             経路を引き、ダイクストラ法を毎回実行しない（結果は bfs_path と同じ）
+        seed            : 候補が同点のときのランダム選択に使う乱数の種．省略時は新しく作って self.seed に残す
+        instrument      : True なら呼び出し回数・時間・ヒープ操作の回数などを self.stats（agent_profile.AgentStats）
+                          に集計する．False（既定）なら何もしない
+        cost_field      : 経路を選ぶときに使うコストの場（perceived_cost.COST_FIELDS の名前か、
+                          (rows, cols) の整数配列）．省略時は迷路の数字（真のコスト）
+        turn_penalty    : 経路の探索で 1 回曲がるごとに足すコスト．単位は cost_field と同じ「コスト × COST_SCALE」
+                          （perceived_cost．10 ならマスの数字 1 つ分）で、cost_field を省略した場合は
+                          'true'（迷路の数字 × COST_SCALE）の場に足す．
+                          全セル間の最短経路表は曲がる回数を考えないので、use_distance_cache とは併用できない
+        ※ cost_field / turn_penalty を指定した場合、候補の比較（ルール 2）には見た目のコストを使い、
+           待機時間と total_cost には実際に通った経路の真のコストを使う
         """
         self.maze_file = maze_file
         self.decision_points = decision_points[:]  # コピーしておく
@@ -92,7 +116,28 @@ class MazeAgent:
         self.visited = set()       # 探索済みセルの集合
         self.move_history = []     # (方向, 時刻) のリスト
         self.sim_time = 0          # シミュレーション時刻（ms 単位・相対時間）
+        self.visit_order = []      # 巡回した意思決定ポイントの順番
+        self.total_cost = 0        # 移動コストの合計（ゴールまで）
+        self.timing = timing if timing is not None else ThinkTimeModel()
+        self.seed, self.rng = make_rng(seed)
         self._read_maze()
+        if use_distance_cache and turn_penalty > 0:
+            raise ValueError("turn_penalty と use_distance_cache=True は同時に指定できません"
+                             "（全セル間の最短経路表は曲がる回数を考えないため）．"
+                             "turn_penalty を使う場合は use_distance_cache=False にしてください．")
+        if cost_field is None and turn_penalty > 0:
+            # turn_penalty は COST_SCALE 倍の単位なので、真のコストも同じ単位の場で足す
+            cost_field = 'true'
+        if isinstance(cost_field, str):
+            cost_field = get_cost_field(self.maze, cost_field)
+        self.cost_field = cost_field
+        self.turn_penalty = turn_penalty
+        self.perceived = cost_field is not None or turn_penalty > 0
+        self.fields = get_distance_fields(self.maze, cost_grid=cost_field) if use_distance_cache else None
+        self.stats = None
+        if instrument:
+            from agent_profile import attach_stats
+            attach_stats(self)
 
     def _read_maze(self):
         """迷路ファイルを読み込み、2次元リスト self.maze に格納する"""
@@ -131,61 +176,77 @@ class MazeAgent:
                 nx += dx
                 ny += dy
 
+    def path_cost(self, start, path):
+        """start から path（移動方向のリスト）に沿って移動したときの真のコスト（移動先の数字の和）を返す"""
+        x, y = start
+        cost = 0
+        for move in path:
+            dx, dy = {'up': (-1, 0), 'down': (1, 0),
+                      'left': (0, -1), 'right': (0, 1)}[move]
+            x, y = x + dx, y + dy
+            cost += int(self.maze[x][y])
+        return cost
+
     def bfs_path(self, start, goal):
         """
         ダイクストラ法を用いて、start から goal までの「総移動コストが最小」の経路を求める
         各移動は 1 マス移動（実際の移動時間は10 ms としてシミュレーションするが、
         コストとしては1マス移動とし、経路上の各セルに記載の数字を加算）とする
+        cost_field / turn_penalty を指定した場合は、そのマスの場の値（＋曲がるごとの加算）を足す
 
         戻り値：
             path  : 移動方向のリスト（例：['right', 'right', 'up', …]）
             steps : 移動ステップ数（経路の長さ）
-            cost  : 経路上（移動先セル）のコスト合計
+            cost  : 経路上（移動先セル）のコスト合計（cost_field / turn_penalty 指定時は見た目のコスト）
         到達不能の場合は (None, None, None) を返す
         """
+        if self.fields is not None:
+            return self.fields.route(start, goal)
         heap = []
         # (cost_so_far, steps, current_pos, path)
         heappush(heap, (0, 0, start, []))
         visited_local = dict()  # pos -> cost_so_far
+        pops = 0  # ヒープから取り出した回数（instrument 用）
 
         while heap:
             cost, steps, pos, path = heappop(heap)
-            if pos in visited_local and visited_local[pos] <= cost:
+            pops += 1
+            # 曲がるときに加算する場合は、最後に動いた方向ごとに別の状態とする
+            key = (pos, path[-1] if path else None) if self.turn_penalty else pos
+            if key in visited_local and visited_local[key] <= cost:
                 continue
-            visited_local[pos] = cost
+            visited_local[key] = cost
             if pos == goal:
+                if self.stats is not None:
+                    self.stats.record_search(pops, pops + len(heap), len(visited_local))
                 return path, steps, cost
             for d, (dx, dy) in zip(['up', 'down', 'left', 'right'],
                                      [(-1, 0), (1, 0), (0, -1), (0, 1)]):
                 new_pos = (pos[0] + dx, pos[1] + dy)
                 if (0 <= new_pos[0] < self.rows and 0 <= new_pos[1] < self.cols and 
                     self.maze[new_pos[0]][new_pos[1]].isdigit()):
-                    new_cost = cost + int(self.maze[new_pos[0]][new_pos[1]])
+                    if self.cost_field is None:
+                        new_cost = cost + int(self.maze[new_pos[0]][new_pos[1]])
+                    else:
+                        new_cost = cost + int(self.cost_field[new_pos[0]][new_pos[1]])
+                    if self.turn_penalty and path and path[-1] != d:
+                        new_cost += self.turn_penalty
                     heappush(heap, (new_cost, steps + 1, new_pos, path + [d]))
+        if self.stats is not None:
+            self.stats.record_search(pops, pops, len(visited_local))
         return None, None, None  # 到達不能の場合
 
     def compute_manhattan(self, a, b):
         """2点 a, b のマンハッタン距離を返す"""
         return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-    def choose_decision_point(self):
+    def tied_candidates(self):
         """
-        現在位置 self.current_pos から、残っている意思決定ポイントの中で
-        ルールに基づいて次の目的点を決定する
-
-        ルール：
-          1. 各候補とのマンハッタン距離を求め、最小の候補群を抽出
-          2. その中から、ダイクストラ法で求めた経路の総コストが最小のものを選択
-          3. さらに、経路上に「未探索セル」が含まれている候補があれば優先
-          4. 複数あればランダムに選択
+        choose_decision_point のルール 1〜3 で絞り込んだ候補（ルール 4 のランダム選択の対象）を返す
+        到達可能な候補が無ければ空のリストを返す
 
         戻り値：
-            (point, m_dist, cost, unexplored, path, steps)
-            ※ point : 候補の座標
-                m_dist: マンハッタン距離
-                cost  : 経路の総コスト
-                unexplored: 経路上に未探索セルがあるか（True/False）
-                path, steps: 経路情報
+            [(point, m_dist, cost, unexplored, path, steps), …]
         """
         candidates = []
         for point in self.decision_points:
@@ -205,7 +266,7 @@ class MazeAgent:
                     break
             candidates.append( (point, m_dist, cost, has_new, path, steps) )
         if not candidates:
-            return None
+            return []
         # (1) マンハッタン距離が最小の候補群
         min_m = min(c[1] for c in candidates)
         filtered = [c for c in candidates if c[1] == min_m]
@@ -215,18 +276,44 @@ class MazeAgent:
         # (3) 未探索セルを通る経路があれば優先
         if any(c[3] for c in filtered):
             filtered = [c for c in filtered if c[3]]
+        return filtered
+
+    def choose_decision_point(self):
+        """
+        現在位置 self.current_pos から、残っている意思決定ポイントの中で
+        ルールに基づいて次の目的点を決定する
+
+        ルール：
+          1. 各候補とのマンハッタン距離を求め、最小の候補群を抽出
+          2. その中から、ダイクストラ法で求めた経路の総コストが最小のものを選択
+          3. さらに、経路上に「未探索セル」が含まれている候補があれば優先
+          4. 複数あればランダムに選択
+
+        戻り値：
+            (point, m_dist, cost, unexplored, path, steps)
+            ※ point : 候補の座標
+                m_dist: マンハッタン距離
+                cost  : 経路の総コスト
+                unexplored: 経路上に未探索セルがあるか（True/False）
+                path, steps: 経路情報
+        """
+        filtered = self.tied_candidates()
+        if not filtered:
+            return None
         # (4) 複数あればランダムに選択
-        chosen = random.choice(filtered)
+        chosen = self.rng.choice(filtered)
         return chosen  # (point, m_dist, cost, unexplored, path, steps)
 
     def simulate_path(self, path, path_cost, path_steps, wait_after=True):
         """
         与えられた path（移動方向のリスト）に沿って移動をシミュレートする
-         - 各マス移動は 10 ms として move_history に (方向, 時刻) を記録する
-         - wait_after が True の場合、移動後に「移動ステップ数＋経路の総コスト」×10 ms 待機する
+         - 各マス移動は timing.move_time（既定 20 ms）として move_history に (方向, 時刻) を記録する
+         - wait_after が True の場合、移動後に timing.leg_wait（既定「移動ステップ数＋経路の総コスト」×20 ms）待機する
+        path の終点に着いたら True を返す（地図を知らないエージェントでは途中で打ち切って False を返すことがある）
         """
         for move in path:
-            self.sim_time += 20  # 1マス移動：10 ms
+            prev_move = self.move_history[-1][0] if self.move_history else None
+            self.sim_time += round(self.timing.move_time(move, prev_move))
             self.move_history.append((move, self.sim_time))
             # 現在位置を更新
             dx, dy = {'up': (-1, 0), 'down': (1, 0),
@@ -235,8 +322,8 @@ class MazeAgent:
             # 移動先から上下左右に伸びる通路を探索済みとする
             self.mark_explored(self.current_pos)
         if wait_after:
-            wait_time = (path_steps + path_cost) * 20
-            self.sim_time += wait_time
+            self.sim_time += round(self.timing.leg_wait(path_steps, path_cost))
+        return True
 
     def run(self):
         """
@@ -246,9 +333,12 @@ class MazeAgent:
          3. 全意思決定ポイントを巡回後、ゴールへ移動（移動前に待機）
         """
         # スタートに設定し、探索済みマスを記録
+        self.rng = random.Random(self.seed)  # 同じ seed なら同じ選択になるよう run の開始時に初期化する
         self.current_pos = self.start
         self.sim_time = 0
         self.move_history = []
+        self.visit_order = []
+        self.total_cost = 0
         self.visited = set()
         self.mark_explored(self.current_pos)
         
@@ -259,20 +349,28 @@ class MazeAgent:
                 print("到達可能な意思決定ポイントがありません．")
                 break
             point, m_dist, cost, unexplored, path, steps = candidate
+            if self.perceived:
+                cost = self.path_cost(self.current_pos, path)
             # シミュレーション：候補点へ移動
-            self.simulate_path(path, cost, steps, wait_after=True)
-            # 巡回済みとする
+            reached = self.simulate_path(path, cost, steps, wait_after=True)
+            # 候補から外し、着いた場合だけ巡回済みとする（着けなかった点は選び直さない）
             self.decision_points.remove(point)
+            if reached:
+                self.visit_order.append(point)
+            self.total_cost += cost
         
         # 全意思決定ポイント巡回後、ゴールへ移動
         path, steps, cost = self.bfs_path(self.current_pos, self.goal)
         if path is None:
             print("ゴールへ到達できませんでした．")
             return
-        # ゴール移動前に待機（移動ステップ数＋移動コスト）×10 ms
-        self.sim_time += (steps + cost) * 10
+        if self.perceived:
+            cost = self.path_cost(self.current_pos, path)
+        # ゴール移動前に待機（既定では（移動ステップ数＋移動コスト）×10 ms）
+        self.sim_time += round(self.timing.goal_wait(steps, cost))
         # ゴールへ向けて移動（移動後の待機は不要）
         self.simulate_path(path, cost, steps, wait_after=False)
+        self.total_cost += cost
     
     def save_move_history(self, filename):
         """
@@ -287,7 +385,8 @@ class MazeAgent:
             f.write(f"_ 0\n")
             for move, t in self.move_history:
                 f.write(f"{move} {t}\n")
-        print(f"移動履歴を {filename} に保存しました．")
+        record_seed(filename, self.seed, "agent.MazeAgent")
+        print(f"移動履歴を {filename} に保存しました．（seed={self.seed}）")
 
 # --- main ---
 
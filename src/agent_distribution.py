@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+agent_distribution.py
+
+MazeAgent は候補が同点のとき（choose_decision_point のルール 4）ランダムに選ぶため、
+1回のシミュレーションでは振る舞いのサンプルが 1 つしか得られない．
+このスクリプトは、同点の選び方すべてについての結果（総コスト・総時間・巡回順）の分布を求める．
+
+- 厳密計算：状態 (現在位置, 残りの意思決定ポイント, 探索済みセル, 直前の移動方向) ごとに
+  「そこから先の結果の分布」をメモ化し、同じ状態に合流する枝では結果を共有する
+- 状態数が max_states を超えた場合は、seed を変えた MazeAgent を並列に実行するサンプリングに切り替える
+  （子の seed は seeding.spawn_seeds で決めるので、並列数によらず同じ結果になる）
+
+分布は {(総コスト, 総時間, 巡回順のタプル): 確率} の辞書で表す．
+
+使い方：
+    python src/agent_distribution.py <迷路ファイル> <意思決定ポイントのファイル or "x,y; x,y; …"> [サンプル数]
+"""
+
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agent import MazeAgent, load_decision_points_from_file, parse_coordinate
+from corpus import load_maze, find_start
+from seeding import make_rng, spawn_seeds
+
+
+class _StateLimitExceeded(Exception):
+    """厳密計算の状態数が上限を超えた"""
+
+
+class TieBreakEstimator:
+    """同点の選び方すべてについて MazeAgent の結果の分布を厳密に求める"""
+
+    def __init__(self, agent, max_states=200000):
+        self.agent = agent
+        self.max_states = max_states
+        self.memo = {}
+        self.n_states = 0
+
+    def _set_state(self, pos, remaining, visited, prev_move):
+        agent = self.agent
+        agent.current_pos = pos
+        agent.decision_points = list(remaining)
+        agent.visited = set(visited)
+        agent.move_history = [(prev_move, 0)] if prev_move is not None else []
+        agent.sim_time = 0
+
+    def _expand(self, pos, remaining, visited, prev_move):
+        """状態から先の結果の分布 {(cost, time, order): prob} を返す"""
+        key = (pos, remaining, visited, prev_move)
+        if key in self.memo:
+            return self.memo[key]
+        self.n_states += 1
+        if self.n_states > self.max_states:
+            raise _StateLimitExceeded()
+
+        agent = self.agent
+        self._set_state(pos, remaining, visited, prev_move)
+        tied = agent.tied_candidates() if remaining else []
+
+        result = defaultdict(float)
+        if not tied:
+            # 残りの意思決定ポイントが無い（または到達できない）ので、ゴールへ移動して終了
+            path, steps, cost = agent.bfs_path(pos, agent.goal)
+            if path is None:
+                result[(0, 0, ())] = 1.0
+            else:
+                agent.sim_time = round(agent.timing.goal_wait(steps, cost))
+                agent.simulate_path(path, cost, steps, wait_after=False)
+                result[(cost, agent.sim_time, ())] = 1.0
+        else:
+            prob = 1.0 / len(tied)
+            for point, m_dist, cost, unexplored, path, steps in tied:
+                self._set_state(pos, remaining, visited, prev_move)
+                agent.simulate_path(path, cost, steps, wait_after=True)
+                leg_time = agent.sim_time
+                next_remaining = list(remaining)
+                next_remaining.remove(point)
+                next_prev = agent.move_history[-1][0] if agent.move_history else None
+                sub = self._expand(agent.current_pos, tuple(next_remaining),
+                                   frozenset(agent.visited), next_prev)
+                for (c, t, order), p in sub.items():
+                    result[(cost + c, leg_time + t, (point,) + order)] += prob * p
+
+        result = dict(result)
+        self.memo[key] = result
+        return result
+
+    def distribution(self):
+        """スタートからの結果の分布を返す（状態数が上限を超えた場合は _StateLimitExceeded）"""
+        agent = self.agent
+        agent.visited = set()
+        agent.mark_explored(agent.start)
+        remaining = tuple(sorted(agent.decision_points))
+        return self._expand(agent.start, remaining, frozenset(agent.visited), None)
+
+
+def _sample_chunk(args):
+    """seed のリストそれぞれで MazeAgent を実行し、結果のリストを返す（並列実行用）"""
+    maze_file, decision_points, start, goal, timing, seeds = args
+    outcomes = []
+    for seed in seeds:
+        agent = MazeAgent(maze_file, decision_points, start, goal, timing=timing,
+                          use_distance_cache=True, seed=seed)
+        agent.run()
+        outcomes.append((agent.total_cost, agent.sim_time, tuple(agent.visit_order)))
+    return outcomes
+
+
+def sample_distribution(maze_file, decision_points, start, goal, n_samples=10000, seed=None,
+                        timing=None, workers=None, chunk_size=250):
+    """seed を変えて MazeAgent を n_samples 回並列に実行し、結果の経験分布を返す"""
+    seed, _ = make_rng(seed)
+    seeds = spawn_seeds(seed, n_samples)
+    chunks = [(maze_file, decision_points, start, goal, timing, seeds[i:i + chunk_size])
+              for i in range(0, n_samples, chunk_size)]
+    if workers == 1:
+        counts = _count(map(_sample_chunk, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = _count(executor.map(_sample_chunk, chunks))
+    return {outcome: n / n_samples for outcome, n in counts.items()}
+
+
+def _count(results):
+    """各チャンクの結果を数え上げる"""
+    counts = defaultdict(int)
+    for outcomes in results:
+        for outcome in outcomes:
+            counts[outcome] += 1
+    return counts
+
+
+def estimate_distribution(maze_file, decision_points, start, goal, timing=None, max_states=200000,
+                          n_samples=10000, seed=None, workers=None):
+    """
+    結果の分布を求める．まず厳密計算を試し、状態数が多すぎる場合はサンプリングに切り替える
+
+    戻り値：
+        (distribution, method)．method は "exact" または "sampled"
+    """
+    agent = MazeAgent(maze_file, decision_points, start, goal, timing=timing, use_distance_cache=True)
+    try:
+        return TieBreakEstimator(agent, max_states).distribution(), "exact"
+    except _StateLimitExceeded:
+        print(f"状態数が {max_states} を超えたため、{n_samples} 回のサンプリングに切り替えます．")
+        return sample_distribution(maze_file, decision_points, start, goal, n_samples, seed,
+                                   timing, workers), "sampled"
+
+
+def summarize(distribution):
+    """
+    分布の要約を返す
+
+    戻り値：
+        dict（expected_cost, std_cost, expected_time, std_time, cost（コストの周辺分布）,
+              time（時間の周辺分布）, orders（巡回順の確率，降順））
+    """
+    outcomes = list(distribution)
+    probs = np.array([distribution[o] for o in outcomes])
+    costs = np.array([o[0] for o in outcomes], dtype=float)
+    times = np.array([o[1] for o in outcomes], dtype=float)
+    marginal = {name: defaultdict(float) for name in ['cost', 'time', 'orders']}
+    for (cost, time_ms, order), p in distribution.items():
+        marginal['cost'][cost] += p
+        marginal['time'][time_ms] += p
+        marginal['orders'][order] += p
+    expected_cost = float(probs @ costs)
+    expected_time = float(probs @ times)
+    return {
+        'expected_cost': expected_cost,
+        'std_cost': float(np.sqrt(probs @ (costs - expected_cost) ** 2)),
+        'expected_time': expected_time,
+        'std_time': float(np.sqrt(probs @ (times - expected_time) ** 2)),
+        'cost': dict(sorted(marginal['cost'].items())),
+        'time': dict(sorted(marginal['time'].items())),
+        'orders': sorted(marginal['orders'].items(), key=lambda item: -item[1]),
+    }
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python agent_distribution.py <maze_file> <decision_point_file or \"x,y; x,y\"> [n_samples]")
+        sys.exit(1)
+    maze_file = sys.argv[1]
+    if os.path.isfile(sys.argv[2]):
+        decision_points = load_decision_points_from_file(sys.argv[2])
+    else:
+        decision_points = [parse_coordinate(s) for s in sys.argv[2].split(';') if s.strip()]
+    n_samples = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+    # スタート＝ゴール＝迷路の '5' のマス（実験と同じ）
+    start = goal = find_start(load_maze(maze_file))
+
+    distribution, method = estimate_distribution(maze_file, decision_points, start, goal,
+                                                 n_samples=n_samples)
+    summary = summarize(distribution)
+    print(f"### 結果の分布（{method}）：{len(distribution)} 通り ###")
+    print(f"総コスト: 期待値 {summary['expected_cost']:.2f}, 標準偏差 {summary['std_cost']:.2f}")
+    print(f"総時間  : 期待値 {summary['expected_time']:.1f} ms, 標準偏差 {summary['std_time']:.1f} ms")
+    print("巡回順（上位 5 件）:")
+    for order, p in summary['orders'][:5]:
+        print(f"  {p:.4f}: {' → '.join(f'({x},{y})' for x, y in order)}")
+
+
+if __name__ == '__main__':
+    main()
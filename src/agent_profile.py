@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+agent_profile.py
+
+MazeAgent のどの処理に時間がかかっているか（ダイクストラ法・未探索の判定・mark_explored など）を
+調べるための計測用モジュール．
+
+- MazeAgent(..., instrument=True) とすると、attach_stats がエージェントのメソッドを計測用に包み、
+  agent.stats（AgentStats）に次の値を集計する
+    ・bfs_path / tied_candidates / mark_explored / simulate_path の呼び出し回数と時間
+      （時間は他の計測対象の呼び出しを含む値と、含まない値（self）の両方）
+    ・ダイクストラ法のヒープへの push / pop の回数と、確定したノード数
+    ・評価した候補（意思決定ポイント）の数
+    ・探索済みセル（visited）の増加数
+- instrument=False（既定）ではメソッドを包まないので、bfs_path の中の回数の数え上げ以外に負担は無い
+- profile_run で 1 回の実行を cProfile で測り、pstats の形式で保存できる
+
+使い方：
+    python src/agent_profile.py [exp_data ディレクトリ] [cProfile で測る実行の番号]
+    （exp_data の人間の移動履歴ごとに、理由ログの座標を意思決定ポイントとしてエージェントを実行し、
+      実行ごとの集計を表示する）
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+
+TIMED_METHODS = ['bfs_path', 'tied_candidates', 'mark_explored', 'simulate_path']
+PROFILE_DIR = os.path.join("exp_data", "profile")
+
+
+class AgentStats:
+    """MazeAgent の 1 回（または複数回）の実行の計測結果"""
+
+    def __init__(self):
+        self.calls = dict.fromkeys(TIMED_METHODS, 0)
+        self.seconds = dict.fromkeys(TIMED_METHODS, 0.0)
+        self.self_seconds = dict.fromkeys(TIMED_METHODS, 0.0)
+        self.searches = 0
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.nodes_settled = 0
+        self.candidates_evaluated = 0
+        self.visited_growth = 0
+        self._child_seconds = []  # 呼び出し中の計測対象ごとの、その中で呼ばれた計測対象の時間
+
+    def record_search(self, pops, pushes, settled):
+        """bfs_path（ダイクストラ法）1 回分のヒープ操作の回数と確定ノード数を加える"""
+        self.searches += 1
+        self.heap_pops += pops
+        self.heap_pushes += pushes
+        self.nodes_settled += settled
+
+    def reset(self):
+        """集計を 0 に戻す"""
+        self.__init__()
+
+    def merge(self, other):
+        """other（AgentStats）の集計を加える（バッチ全体の集計用）"""
+        for name in TIMED_METHODS:
+            self.calls[name] += other.calls[name]
+            self.seconds[name] += other.seconds[name]
+            self.self_seconds[name] += other.self_seconds[name]
+        self.searches += other.searches
+        self.heap_pushes += other.heap_pushes
+        self.heap_pops += other.heap_pops
+        self.nodes_settled += other.nodes_settled
+        self.candidates_evaluated += other.candidates_evaluated
+        self.visited_growth += other.visited_growth
+
+    def as_dict(self):
+        """JSON などに保存できる辞書として返す"""
+        return {
+            'calls': dict(self.calls),
+            'seconds': dict(self.seconds),
+            'self_seconds': dict(self.self_seconds),
+            'searches': self.searches,
+            'heap_pushes': self.heap_pushes,
+            'heap_pops': self.heap_pops,
+            'nodes_settled': self.nodes_settled,
+            'candidates_evaluated': self.candidates_evaluated,
+            'visited_growth': self.visited_growth,
+        }
+
+    def report(self):
+        """集計を表形式の文字列で返す"""
+        lines = [f"{'method':16s} {'calls':>8s} {'total ms':>10s} {'self ms':>10s} {'us/call':>10s}"]
+        for name in TIMED_METHODS:
+            calls = self.calls[name]
+            per_call = self.seconds[name] / calls * 1e6 if calls else 0.0
+            lines.append(f"{name:16s} {calls:8d} {self.seconds[name] * 1000:10.2f} "
+                         f"{self.self_seconds[name] * 1000:10.2f} {per_call:10.1f}")
+        lines.append(f"searches={self.searches}, heap push/pop={self.heap_pushes}/{self.heap_pops}, "
+                     f"nodes settled={self.nodes_settled}, candidates={self.candidates_evaluated}, "
+                     f"visited growth={self.visited_growth}")
+        return '\n'.join(lines)
+
+
+def _timed(stats, name, method, before=None, after=None):
+    """method を包み、呼び出し回数と時間を stats に加える（before / after は前後に呼ぶ関数）"""
+    def wrapper(*args, **kwargs):
+        state = before() if before is not None else None
+        stats._child_seconds.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            child = stats._child_seconds.pop()
+            stats.calls[name] += 1
+            stats.seconds[name] += elapsed
+            stats.self_seconds[name] += elapsed - child
+            if stats._child_seconds:
+                stats._child_seconds[-1] += elapsed
+            if after is not None:
+                after(state)
+    wrapper.__wrapped__ = method
+    return wrapper
+
+
+def attach_stats(agent, stats=None):
+    """
+    agent のメソッドを計測用に包み、agent.stats に AgentStats を設定して返す
+    （MazeAgent(..., instrument=True) から呼ばれる）
+    """
+    if agent.stats is not None:
+        return agent.stats
+    stats = stats if stats is not None else AgentStats()
+    agent.stats = stats
+
+    def count_candidates():
+        stats.candidates_evaluated += len(agent.decision_points)
+
+    def visited_size():
+        return len(agent.visited)
+
+    def add_visited_growth(size_before):
+        stats.visited_growth += len(agent.visited) - size_before
+
+    hooks = {
+        'tied_candidates': (count_candidates, None),
+        'mark_explored': (visited_size, add_visited_growth),
+    }
+    for name in TIMED_METHODS:
+        before, after = hooks.get(name, (None, None))
+        setattr(agent, name, _timed(stats, name, getattr(agent, name), before, after))
+    return stats
+
+
+def profile_run(agent, dump_file=None):
+    """
+    agent.run() を cProfile で測り、pstats.Stats を返す
+    dump_file を指定すると pstats の形式で保存する（python -m pstats <dump_file> で見られる）
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        agent.run()
+    finally:
+        profiler.disable()
+    if dump_file is not None:
+        directory = os.path.dirname(dump_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(dump_file)
+    return pstats.Stats(profiler)
+
+
+def main():
+    from agent import MazeAgent, load_decision_points_from_file
+    from corpus import load_maze, find_start, find_reason_log_for_history, iter_corpus
+
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    profile_index = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    runs = []
+    for maze_file, history_file in iter_corpus(data_dir):
+        reason_log = find_reason_log_for_history(history_file, os.path.join(data_dir, "reasons"))
+        if reason_log is not None:
+            runs.append((maze_file, history_file, load_decision_points_from_file(reason_log)))
+
+    total = AgentStats()
+    for i, (maze_file, history_file, decision_points) in enumerate(runs):
+        start = goal = find_start(load_maze(maze_file))
+        agent = MazeAgent(maze_file, decision_points, start, goal, seed=0, instrument=True)
+        print(f"### run {i}: {os.path.basename(history_file)} ({len(decision_points)} decision points) ###")
+        if i == profile_index:
+            dump_file = os.path.join(PROFILE_DIR, f"run_{i}.pstats")
+            profile_run(agent, dump_file).sort_stats('cumulative').print_stats(15)
+            print(f"Profile saved to {dump_file}")
+        else:
+            agent.run()
+        print(agent.stats.report())
+        total.merge(agent.stats)
+
+    print("### total ###")
+    print(total.report())
+
+
+if __name__ == '__main__':
+    main()
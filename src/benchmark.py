@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+経路探索・探索済み判定の処理（MazeAgent.bfs_path, choose_decision_point, mark_explored,
+hist_maze_road.count_apparent_paths）の速度を測るベンチマーク．
+
+- 迷路：seed を固定して生成した 17×17 〜 513×513 の迷路と、exp_data/maze の迷路
+  （生成する迷路は全ての通路がつながっていて、到達できるマスの数がおよそ N^2 / 2 で増える）
+- 意思決定ポイント：スタートから到達できるマスから seed に従って選ぶ（毎回同じ）
+- 測定項目：
+    ops_per_sec : 1 秒あたりの処理回数（min_time 秒以上繰り返して測る）
+    peak_kib    : 1 回の処理中のメモリ使用量のピーク（tracemalloc）
+    nodes       : 1 回の処理で展開したノード数
+                  （MazeAgent(instrument=True) の集計を使う．bfs_path / choose_decision_point は
+                    ヒープから取り出した数、mark_explored は探索済みセルの増加数、
+                    count_apparent_paths は迷路のマスを読んだ回数）
+- 結果を JSON のベースラインとして保存し、後から同じ条件で測った結果と比べて劣化を検出する
+  （速度・メモリは tolerance 以上の悪化、ノード数は増加を劣化とする）
+
+使い方：
+    python src/benchmark.py save [ベースライン JSON] [最大サイズ]      # 測ってベースラインを保存する
+    python src/benchmark.py compare [ベースライン JSON] [最大サイズ]   # 測ってベースラインと比べる（劣化があれば終了コード 1）
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from agent import MazeAgent
+from corpus import load_maze, find_start
+from hist_maze_road import count_apparent_paths
+from seeding import make_rng, spawn_seeds
+
+BENCH_SEED = 20250201
+MAZE_SIZES = [17, 33, 65, 129, 257, 513]
+N_DECISION_POINTS = 5
+N_MARK_CELLS = 1000
+DEFAULT_BASELINE = os.path.join("exp_data", "benchmark_baseline.json")
+
+
+def reachable_cells(maze, start):
+    """start から移動できるマスの一覧を返す（幅優先探索）"""
+    rows, cols = len(maze), len(maze[0])
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+            if 0 <= nx < rows and 0 <= ny < cols and maze[nx][ny].isdigit() and (nx, ny) not in seen:
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return sorted(seen)
+
+
+def generate_connected_maze(n, rng, extra_ratio=0.05):
+    """
+    n×n（n は奇数）の、全ての通路がつながった迷路を作る
+    偶数座標のマスを深さ優先探索の全域木（穴掘り法）でつなぎ、さらに通路の間の壁を
+    およそ n * n * extra_ratio 個壊して回り道を作る．各マスのコストは 5〜9 の一様乱数
+    rng : random.Random
+    """
+    maze = [['#'] * n for _ in range(n)]
+
+    def dig(r, c):
+        maze[r][c] = str(rng.randint(5, 9))
+
+    dig(0, 0)
+    stack = [(0, 0)]
+    while stack:
+        r, c = stack[-1]
+        options = [(r + dr, c + dc) for dr, dc in [(-2, 0), (2, 0), (0, -2), (0, 2)]
+                   if 0 <= r + dr < n and 0 <= c + dc < n and maze[r + dr][c + dc] == '#']
+        if not options:
+            stack.pop()
+            continue
+        nr, nc = rng.choice(options)
+        dig((r + nr) // 2, (c + nc) // 2)
+        dig(nr, nc)
+        stack.append((nr, nc))
+    # 左右または上下の通路に挟まれた壁を壊す
+    walls = [(r, c) for r in range(n) for c in range(n) if maze[r][c] == '#' and r % 2 != c % 2]
+    for r, c in rng.sample(walls, min(len(walls), int(n * n * extra_ratio))):
+        dig(r, c)
+    return maze
+
+
+class _CountingRow(list):
+    """要素を読んだ回数を数える迷路の行（count_apparent_paths の調べたマスの数を数えるため）"""
+
+    def __init__(self, row, counter):
+        super().__init__(row)
+        self.counter = counter
+
+    def __getitem__(self, index):
+        self.counter[0] += 1
+        return super().__getitem__(index)
+
+
+def largest_component(maze):
+    """数字マスの連結成分のうち最も大きいものの (代表のマス, マスの一覧) を返す"""
+    seen = set()
+    best = []
+    for i, row in enumerate(maze):
+        for j, cell in enumerate(row):
+            if cell.isdigit() and (i, j) not in seen:
+                component = reachable_cells(maze, (i, j))
+                seen.update(component)
+                if len(component) > len(best):
+                    best = component
+    return best[0], best
+
+
+def measure(fn, ops_per_call=1, min_time=0.1, repeat=5):
+    """
+    fn を min_time 秒以上（少なくとも 1 回）繰り返して 1 秒あたりの処理回数を求める．
+    これを repeat 回行い、最も速かった値を返す（他の処理による揺らぎを除くため）
+    """
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        t0 = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+        best = max(best, calls * ops_per_call / elapsed)
+    return best
+
+
+def peak_memory(fn):
+    """fn を 1 回実行したときのメモリ使用量のピーク（KiB）を返す"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def maze_cases(max_size=MAZE_SIZES[-1], seed=BENCH_SEED, maze_dir=os.path.join("exp_data", "maze")):
+    """
+    ベンチマークに使う (名前, 迷路, スタート) の一覧を返す
+    スタートは exp_data の迷路では '5' のマス（実験と同じ）、生成した迷路では左上のマス
+    """
+    cases = []
+    sizes = [n for n in MAZE_SIZES if n <= max_size]
+    for n, child_seed in zip(sizes, spawn_seeds(seed, len(MAZE_SIZES))):
+        cases.append((f"connected_{n}x{n}", generate_connected_maze(n, make_rng(child_seed)[1]), (0, 0)))
+    if os.path.isdir(maze_dir):
+        for filename in sorted(os.listdir(maze_dir)):
+            if filename.endswith('.txt'):
+                maze = load_maze(os.path.join(maze_dir, filename))
+                cases.append((filename, maze, find_start(maze)))
+    return cases
+
+
+def benchmark_maze(maze, maze_file, start=None, seed=BENCH_SEED, min_time=0.1):
+    """
+    1つの迷路についてベンチマークを行い、{処理名: {ops_per_sec, peak_kib, nodes}} を返す
+    start が None なら最大の連結成分の先頭のマスをスタートにする
+    """
+    if start is None:
+        start, cells = largest_component(maze)
+    else:
+        cells = reachable_cells(maze, start)
+    _, rng = make_rng(seed)
+    decision_points = rng.sample(cells[1:] if cells[0] == start else cells,
+                                 min(N_DECISION_POINTS, len(cells) - 1))
+    mark_cells = rng.sample(cells, min(N_MARK_CELLS, len(cells)))
+
+    def make_benches(agent):
+        """agent を使う {処理名: (関数, 1 回の呼び出しでの処理回数)} を返す"""
+        def run_bfs_path():
+            for point in decision_points:
+                agent.bfs_path(start, point)
+
+        def run_choose_decision_point():
+            agent.current_pos = start
+            agent.visited = set()
+            agent.mark_explored(start)
+            agent.decision_points = list(decision_points)
+            agent.choose_decision_point()
+
+        def run_mark_explored():
+            agent.visited = set()
+            for cell in mark_cells:
+                agent.mark_explored(cell)
+
+        def run_count_apparent_paths():
+            count_apparent_paths(maze)
+
+        return {
+            'bfs_path': (run_bfs_path, max(len(decision_points), 1)),
+            'choose_decision_point': (run_choose_decision_point, 1),
+            'mark_explored': (run_mark_explored, max(len(mark_cells), 1)),
+            'count_apparent_paths': (run_count_apparent_paths, 1),
+        }
+
+    # 時間・メモリは計測なしのエージェントで測り、ノード数は instrument=True のエージェントで数える
+    benches = make_benches(MazeAgent(maze_file, decision_points, start, start, seed=seed))
+    counted_agent = MazeAgent(maze_file, decision_points, start, start, seed=seed, instrument=True)
+    counted = make_benches(counted_agent)
+    results = {}
+    for name, (fn, ops_per_call) in benches.items():
+        counted_agent.stats.reset()
+        counted[name][0]()
+        if name == 'mark_explored':
+            nodes = counted_agent.stats.visited_growth
+        elif name == 'count_apparent_paths':
+            counter = [0]
+            count_apparent_paths([_CountingRow(row, counter) for row in maze])
+            nodes = counter[0]
+        else:
+            nodes = counted_agent.stats.heap_pops
+        results[name] = {
+            'ops_per_sec': measure(fn, ops_per_call, min_time),
+            'peak_kib': peak_memory(fn),
+            'nodes': nodes,
+        }
+    return results
+
+
+def run_benchmarks(max_size=MAZE_SIZES[-1], seed=BENCH_SEED, min_time=0.1):
+    """全ての迷路でベンチマークを行い、結果（JSON に保存できる辞書）を返す"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, maze, start in maze_cases(max_size, seed):
+            maze_file = os.path.join(tmp, name if name.endswith('.txt') else name + '.txt')
+            with open(maze_file, 'w') as f:
+                f.write(''.join(''.join(row) + '\n' for row in maze))
+            t0 = time.perf_counter()
+            results[name] = benchmark_maze(maze, maze_file, start, seed, min_time)
+            print(f"{name}: {time.perf_counter() - t0:.1f} s")
+    return {
+        'meta': {
+            'seed': seed,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.3):
+    """
+    ベースラインと比べて劣化した項目を返す
+    （ops_per_sec が tolerance 以上低下、peak_kib が tolerance 以上増加、nodes が増加）
+
+    戻り値：
+        劣化の説明の文字列のリスト
+    """
+    regressions = []
+    for case, benches in current['results'].items():
+        for name, now in benches.items():
+            before = baseline['results'].get(case, {}).get(name)
+            if before is None:
+                continue
+            label = f"{case} / {name}"
+            if now['ops_per_sec'] < before['ops_per_sec'] * (1 - tolerance):
+                regressions.append(f"{label}: ops/sec {before['ops_per_sec']:.1f} → {now['ops_per_sec']:.1f}")
+            if now['peak_kib'] > before['peak_kib'] * (1 + tolerance):
+                regressions.append(f"{label}: peak {before['peak_kib']:.1f} KiB → {now['peak_kib']:.1f} KiB")
+            if now['nodes'] > before['nodes']:
+                regressions.append(f"{label}: nodes {before['nodes']} → {now['nodes']}")
+    return regressions
+
+
+def print_results(current, baseline=None):
+    """結果を表形式で表示する（ベースラインがあれば比も表示する）"""
+    print(f"{'maze':24s} {'benchmark':22s} {'ops/sec':>12s} {'peak KiB':>10s} {'nodes':>10s}")
+    for case, benches in current['results'].items():
+        for name, r in benches.items():
+            line = f"{case:24s} {name:22s} {r['ops_per_sec']:12.1f} {r['peak_kib']:10.1f} {r['nodes']:10d}"
+            before = baseline['results'].get(case, {}).get(name) if baseline else None
+            if before:
+                line += f"  (x{r['ops_per_sec'] / before['ops_per_sec']:.2f})"
+            print(line)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('save', 'compare'):
+        print("Usage: python benchmark.py save|compare [baseline.json] [max_size]")
+        sys.exit(1)
+    command = sys.argv[1]
+    baseline_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BASELINE
+    max_size = int(sys.argv[3]) if len(sys.argv) > 3 else MAZE_SIZES[-1]
+
+    current = run_benchmarks(max_size)
+    if command == 'save':
+        print_results(current)
+        directory = os.path.dirname(baseline_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"Baseline saved to {baseline_file}")
+        return
+
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print_results(current, baseline)
+    regressions = compare(current, baseline)
+    if regressions:
+        print(f"### {len(regressions)} 件の劣化 ###")
+        for r in regressions:
+            print(f"  {r}")
+        sys.exit(1)
+    print("劣化はありません．")
+
+
+if __name__ == '__main__':
+    main()
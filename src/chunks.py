@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+chunks.py
+
+移動履歴を「行動のチャンク」（思考時間で区切られた一続きの移動）に分割し、
+チャンクごとの特徴をまとめた表を作るスクリプト（note.txt の「行動のチャンク」「長い所と短い所の分析」）．
+
+【区切り方】
+- 閾値：待ち時間が threshold_ms 以上の移動から新しいチャンクを始める（既定は 500 ms，maze_replay と同じ）
+- auto：履歴ごとに log(待ち時間) を 2 群に分ける閾値（群間分散が最大になる点，大津の方法）を求めて区切る
+
+【チャンクの特徴】
+    pause_ms    : チャンクの最初の移動の直前の待ち時間
+    n_moves     : 移動回数
+    duration_ms : 最初の移動から最後の移動までの時間
+    turns       : チャンク内で移動方向が変わった回数
+    corridors   : 通った通路（上下左右に連続する数字マスの直線）の数
+    cost        : 移動コストの合計
+    start, end  : チャンクの最初と最後の座標
+
+履歴ごとに配列演算（cumsum / reduceat）だけで計算するので、コーパス全体でもすぐに終わる．
+
+使い方：
+    python src/chunks.py [exp_data ディレクトリ] [閾値(ms) or auto] [出力 CSV]
+"""
+
+import os
+import sys
+import csv
+
+import numpy as np
+
+from corpus import (PAUSE_THRESHOLD_MS, load_maze, find_start, load_move_history, reconstruct_positions,
+                    think_times, log_scale_cutoff, iter_corpus)
+from distance_field import maze_to_cost_grid
+
+CHUNK_DTYPE = np.dtype([
+    ('chunk', np.int32), ('start_move', np.int32), ('pause_ms', np.int64), ('n_moves', np.int32),
+    ('duration_ms', np.int64), ('turns', np.int32), ('corridors', np.int32), ('cost', np.int32),
+    ('start_row', np.int32), ('start_col', np.int32), ('end_row', np.int32), ('end_col', np.int32),
+])
+
+
+def corridor_labels(cost_grid):
+    """
+    横方向・縦方向の通路（壁で区切られた数字マスの直線）に番号を付ける
+
+    戻り値：
+        (horizontal, vertical)．それぞれ cost_grid と同じ形の配列で、壁は -1．
+        縦の通路の番号は横の通路の番号の続きから始まる
+    """
+    def label_rows(open_cells, offset):
+        # 行ごとに、左隣が壁（または端）の数字マスから新しい通路を始める
+        starts = open_cells.copy()
+        starts[:, 1:] &= ~open_cells[:, :-1]
+        labels = np.cumsum(starts.ravel()).reshape(open_cells.shape) - 1 + offset
+        labels[~open_cells] = -1
+        return labels, offset + int(starts.sum())
+
+    open_cells = cost_grid >= 0
+    horizontal, n_horizontal = label_rows(open_cells, 0)
+    vertical, _ = label_rows(open_cells.T, n_horizontal)
+    return horizontal, vertical.T
+
+
+def otsu_threshold(waits):
+    """
+    log(待ち時間) を 2 群に分けたときに群間分散が最大になる閾値（ms）を返す
+    待ち時間がすべて同じ場合は、最初の移動以外では区切らない閾値を返す
+    """
+    log_waits = np.sort(np.log(np.maximum(waits, 1).astype(float)))
+    n = len(log_waits)
+    if n < 2 or log_waits[0] == log_waits[-1]:
+        return float(np.max(waits, initial=0)) + 1
+    k = np.arange(1, n)
+    cumsum = np.cumsum(log_waits)[:-1]
+    mean_low = cumsum / k
+    mean_high = (log_waits.sum() - cumsum) / (n - k)
+    between = k * (n - k) * (mean_low - mean_high) ** 2
+    # 同じ値の間では区切れないので、値が変わる位置だけを候補にする
+    between[log_waits[1:] == log_waits[:-1]] = -1
+    best = int(np.argmax(between))
+    return float(np.exp((log_waits[best] + log_waits[best + 1]) / 2))
+
+
+def segment_history(maze, codes, start_time, timestamps, threshold_ms=PAUSE_THRESHOLD_MS):
+    """
+    1つの移動履歴をチャンクに分割し、特徴の表（CHUNK_DTYPE の構造化配列）を返す
+    threshold_ms に "auto" を渡すと otsu_threshold で区切る
+    """
+    cost_grid = maze_to_cost_grid(maze)
+    waits = think_times(start_time, timestamps)
+    if threshold_ms == "auto":
+        threshold_ms = otsu_threshold(waits)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=CHUNK_DTYPE)
+    positions = reconstruct_positions(find_start(maze), codes)
+
+    # 最初の移動と、待ち時間が閾値以上の移動からチャンクを始める
+    boundary = waits >= threshold_ms
+    boundary[0] = True
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n) - 1
+    chunk_of_move = np.cumsum(boundary) - 1
+
+    # 方向転換（チャンクの最初の移動は数えない）
+    turn = np.zeros(n, dtype=np.int32)
+    turn[1:] = codes[1:] != codes[:-1]
+    turn[boundary] = 0
+
+    # 移動先のマスのコスト
+    cost = cost_grid[positions[1:, 0], positions[1:, 1]]
+
+    # 通った通路：上下の移動は縦の通路、左右の移動は横の通路（移動元のマスで判定）
+    horizontal, vertical = corridor_labels(cost_grid)
+    corridor = np.where(codes >= 2, horizontal[positions[:-1, 0], positions[:-1, 1]],
+                        vertical[positions[:-1, 0], positions[:-1, 1]])
+    n_corridors = int(max(horizontal.max(), vertical.max())) + 1
+    pairs = np.unique(chunk_of_move.astype(np.int64) * n_corridors + corridor)
+
+    table = np.zeros(len(starts), dtype=CHUNK_DTYPE)
+    table['chunk'] = np.arange(len(starts))
+    table['start_move'] = starts
+    table['pause_ms'] = waits[starts]
+    table['n_moves'] = ends - starts + 1
+    table['duration_ms'] = timestamps[ends] - timestamps[starts]
+    table['turns'] = np.add.reduceat(turn, starts)
+    table['corridors'] = np.bincount(pairs // n_corridors, minlength=len(starts))
+    table['cost'] = np.add.reduceat(cost, starts)
+    table['start_row'], table['start_col'] = positions[starts, 0], positions[starts, 1]
+    table['end_row'], table['end_col'] = positions[ends + 1, 0], positions[ends + 1, 1]
+    return table
+
+
+def segment_corpus(data_dir="exp_data", threshold_ms=PAUSE_THRESHOLD_MS, prefix="move_history"):
+    """
+    コーパス全体をチャンクに分割する
+
+    戻り値：
+        (names, tables)．tables[i] は names[i] の移動履歴のチャンクの表
+    """
+    names = []
+    tables = []
+    for maze_file, history_file in iter_corpus(data_dir, prefix):
+        start_time, codes, timestamps = load_move_history(history_file)
+        names.append(os.path.basename(history_file))
+        tables.append(segment_history(load_maze(maze_file), codes, start_time, timestamps, threshold_ms))
+    return names, tables
+
+
+def save_chunks(names, tables, output_file):
+    """チャンクの表を 1 つの CSV（先頭の列は移動履歴のファイル名）に書き出す"""
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['history'] + list(CHUNK_DTYPE.names))
+        for name, table in zip(names, tables):
+            for row in table.tolist():
+                writer.writerow([name] + list(row))
+
+
+def compare_pauses(table, threshold_ms=PAUSE_THRESHOLD_MS, k=1.0):
+    """
+    直前の待ちが長いチャンクと短いチャンクの特徴の平均を比べる
+    （長い・短いの境目は corpus.log_scale_cutoff．最初のチャンクは除く）
+
+    戻り値：
+        (cutoff_ms, {'long': {特徴: 平均}, 'short': {特徴: 平均}})
+    """
+    table = table[table['chunk'] > 0]
+    cutoff = log_scale_cutoff(table['pause_ms'], threshold_ms, k)
+    groups = {'long': table[table['pause_ms'] >= cutoff], 'short': table[table['pause_ms'] < cutoff]}
+    summary = {}
+    for group, rows in groups.items():
+        summary[group] = {'count': len(rows)}
+        for field in ['pause_ms', 'n_moves', 'duration_ms', 'turns', 'corridors', 'cost']:
+            summary[group][field] = float(rows[field].mean()) if len(rows) else float('nan')
+    return cutoff, summary
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    threshold = sys.argv[2] if len(sys.argv) > 2 else str(PAUSE_THRESHOLD_MS)
+    threshold_ms = threshold if threshold == "auto" else float(threshold)
+    output_file = sys.argv[3] if len(sys.argv) > 3 else os.path.join(data_dir, "chunks.csv")
+
+    names, tables = segment_corpus(data_dir, threshold_ms)
+    save_chunks(names, tables, output_file)
+    for name, table in zip(names, tables):
+        print(f"{name}: chunks={len(table)}, moves/chunk={table['n_moves'].mean():.2f}, "
+              f"turns/chunk={table['turns'].mean():.2f}, corridors/chunk={table['corridors'].mean():.2f}")
+    print(f"Chunk table saved to {output_file}")
+
+    cutoff, summary = compare_pauses(np.concatenate(tables))
+    print(f"### 直前の待ちが長いチャンク（>= {cutoff:.0f} ms）と短いチャンクの比較 ###")
+    for group in ['long', 'short']:
+        s = summary[group]
+        print(f"{group:5s}: count={s['count']}, pause={s['pause_ms']:.0f} ms, moves={s['n_moves']:.2f}, "
+              f"turns={s['turns']:.2f}, corridors={s['corridors']:.2f}, cost={s['cost']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+corpus.py
+
+exp_data 以下の迷路ファイル・移動履歴ファイルを解析用に読み込むための補助モジュール．
+
+- 迷路ファイルは 2次元リスト（game.py などと同じ形式）として読み込む（maze_core.read_maze_file, find_start）
+- 移動履歴は方向コード（0:up, 1:down, 2:left, 3:right）とタイムスタンプの NumPy 配列として読み込む
+- 方向コードの累積和で各ステップの座標を復元する
+- move_history_N.txt と generated_maze_N.txt のようにサフィックスで履歴と迷路を対応付ける
+"""
+
+import os
+import re
+
+import numpy as np
+
+from maze_core import read_maze_file as load_maze, find_start  # noqa: F401（解析用スクリプトはここから読み込む）
+
+# 方向コードと移動量（行, 列）
+DIRECTIONS = ['up', 'down', 'left', 'right']
+DIRECTION_CODES = {d: i for i, d in enumerate(DIRECTIONS)}
+DELTAS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int64)
+
+# 思考時間の区切り（maze_game.save_history の # カウントと同じ 500 ms）
+PAUSE_THRESHOLD_MS = 500
+
+
+def load_move_history(history_file):
+    """
+    移動履歴ファイルを読み込む
+
+    戻り値：
+        start_time : 開始時刻（ms）
+        codes      : 方向コードの配列（int8）
+        timestamps : 各移動の時刻の配列（int64, ms）
+    """
+    codes = []
+    timestamps = []
+    with open(history_file, 'r', encoding='utf-8') as f:
+        lines = [line.split() for line in f if line.strip()]
+    if not lines or lines[0][0] != '_':
+        raise ValueError(f"Replay file does not contain a start_time: {history_file}")
+    start_time = int(lines[0][1])
+    for tokens in lines[1:]:
+        direction, timestamp_ms = tokens[0], tokens[1]
+        codes.append(DIRECTION_CODES[direction])
+        timestamps.append(int(timestamp_ms))
+    return start_time, np.array(codes, dtype=np.int8), np.array(timestamps, dtype=np.int64)
+
+
+def reconstruct_positions(start, codes):
+    """
+    方向コードの累積和から各ステップの座標を復元する
+    （記録されている移動は全て有効な移動なので壁判定は不要）
+
+    戻り値：
+        (len(codes) + 1, 2) の配列．positions[m] は m 手目を指す直前の座標
+    """
+    positions = np.empty((len(codes) + 1, 2), dtype=np.int64)
+    positions[0] = start
+    np.cumsum(DELTAS[codes], axis=0, out=positions[1:])
+    positions[1:] += start
+    return positions
+
+
+def think_times(start_time, timestamps):
+    """各移動の直前の待ち時間（ms）を返す"""
+    return np.diff(timestamps, prepend=start_time)
+
+
+def pause_decision_points(positions, waits, threshold_ms=PAUSE_THRESHOLD_MS):
+    """
+    待ち時間が threshold_ms 以上だった移動の直前の座標を意思決定ポイントとして返す
+    （maze_replay が理由入力ウィンドウを出す位置と同じ）
+    """
+    idx = np.flatnonzero(waits >= threshold_ms)
+    return [tuple(int(v) for v in positions[i]) for i in idx]
+
+
+def log_scale_cutoff(waits, threshold_ms=PAUSE_THRESHOLD_MS, k=1.0):
+    """
+    threshold_ms 以上の待ち時間を対数スケールで見たときの「長い待ち」の下限（ms）を返す
+    （log(待ち時間) の平均 + k × 標準偏差．note.txt の「0.5から先は対数スケールで考える」）
+    threshold_ms 以上の待ちが無ければ threshold_ms を返す
+    """
+    long_waits = waits[waits >= threshold_ms]
+    if len(long_waits) == 0:
+        return float(threshold_ms)
+    log_waits = np.log(long_waits.astype(float))
+    return float(max(threshold_ms, np.exp(log_waits.mean() + k * log_waits.std())))
+
+
+def pause_indices(waits, threshold_ms=PAUSE_THRESHOLD_MS, log_k=None):
+    """
+    待ち時間が区切り以上だった移動の番号を返す
+    log_k を指定した場合は、区切りを log_scale_cutoff(waits, threshold_ms, log_k) にする
+    """
+    if log_k is not None:
+        threshold_ms = log_scale_cutoff(waits, threshold_ms, log_k)
+    return np.flatnonzero(waits >= threshold_ms)
+
+
+def _suffix(filename):
+    """move_history_3.txt → '_3'，move_history.txt → '' のようにサフィックスを返す"""
+    m = re.search(r'(_\d+)?\.txt$', filename)
+    return (m.group(1) or '') if m else ''
+
+
+def find_maze_for_history(history_file, maze_dir="exp_data/maze"):
+    """移動履歴と同じサフィックスの generated_maze ファイルを返す（無ければ None）"""
+    maze_file = os.path.join(maze_dir, f"generated_maze{_suffix(os.path.basename(history_file))}.txt")
+    return maze_file if os.path.isfile(maze_file) else None
+
+
+def find_reason_log_for_history(history_file, reason_dir="exp_data/reasons"):
+    """
+    移動履歴と同じサフィックスの operation_reason_log ファイルを返す（無ければ None）
+    JSON Lines 形式（.jsonl）があればそちらを優先する
+    """
+    base = os.path.join(reason_dir, f"operation_reason_log{_suffix(os.path.basename(history_file))}")
+    for ext in ('.jsonl', '.txt'):
+        if os.path.isfile(base + ext):
+            return base + ext
+    return None
+
+
+def iter_corpus(data_dir="exp_data", prefix="move_history"):
+    """
+    data_dir 以下の (迷路ファイル, 移動履歴ファイル) の組をファイル名順に返す
+    prefix="agent_move_history" とすればエージェントの履歴を対象にできる
+    """
+    history_dir = os.path.join(data_dir, "move_history")
+    maze_dir = os.path.join(data_dir, "maze")
+    pairs = []
+    for filename in sorted(os.listdir(history_dir)):
+        if not re.fullmatch(rf"{prefix}(_\d+)?\.txt", filename):
+            continue
+        history_file = os.path.join(history_dir, filename)
+        maze_file = find_maze_for_history(history_file, maze_dir)
+        if maze_file is not None:
+            pairs.append((maze_file, history_file))
+    return pairs
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+decision_points.py
+
+移動履歴だけから意思決定ポイントを取り出し、MazeAgent が読める形式で書き出す．
+
+agent.load_decision_points_from_file が読む理由ログ（Coordinates: の行）は、maze_replay で 1 つずつ
+理由を入力しないと作られない．ここでは理由の入力を待たずに、
+
+- 方向コードの移動量の累積和で各手の直前の座標を求め（corpus.reconstruct_positions）
+- 直前の待ち時間（corpus.think_times）が閾値以上の手を選び（corpus.pause_indices．
+  閾値は maze_replay が理由入力ウィンドウを出すのと同じ 500 ms．log_k を指定すれば対数スケールの区切り）
+- その手の方向・時刻・待ち時間・座標を reason_log と同じ項目（operation・reason は空）で
+
+exp_data/decision_points/decision_points_N.jsonl に書き出す．exp_data/move_history 以下の全ての履歴を一度に処理する．
+書き出したファイルは agent.load_decision_points_from_file（.jsonl）でそのまま読めるので、
+注釈の無い履歴でもエージェントを当てはめられる．座標の入った理由ログがある履歴では、その座標との一致も表示する．
+
+使い方：
+    python src/decision_points.py [exp_data ディレクトリ] [閾値 ms] [log_k]
+"""
+
+import os
+import sys
+
+from corpus import (DIRECTIONS, PAUSE_THRESHOLD_MS, load_maze, find_start, load_move_history,
+                    reconstruct_positions, think_times, pause_indices, find_reason_log_for_history, iter_corpus)
+from reason_log import load_reason_log, write_jsonl
+
+DECISION_POINT_DIR = os.path.join("exp_data", "decision_points")
+
+
+def extract_decision_points(start, start_time, codes, timestamps, threshold_ms=PAUSE_THRESHOLD_MS, log_k=None):
+    """
+    1つの移動履歴から、待ち時間が区切り以上だった手のエントリ（reason_log と同じ項目の辞書）のリストを返す
+    """
+    positions = reconstruct_positions(start, codes)
+    waits = think_times(start_time, timestamps)
+    idx = pause_indices(waits, threshold_ms, log_k)
+    return [{
+        'direction': DIRECTIONS[int(codes[i])],
+        'timestamp_ms': int(timestamps[i]),
+        'wait_time_s': round(float(waits[i]) / 1000.0, 3),
+        'coordinates': [int(v) for v in positions[i]],
+        'operation': '',
+        'reason': '',
+    } for i in idx]
+
+
+def output_path(history_file, out_dir=DECISION_POINT_DIR):
+    """move_history_N.txt → out_dir/decision_points_N.jsonl"""
+    name = os.path.splitext(os.path.basename(history_file))[0].replace("move_history", "decision_points", 1)
+    return os.path.join(out_dir, name + ".jsonl")
+
+
+def extract_corpus(data_dir="exp_data", out_dir=None, threshold_ms=PAUSE_THRESHOLD_MS, log_k=None):
+    """
+    data_dir 以下の全ての人間の移動履歴から意思決定ポイントを取り出して書き出す
+
+    戻り値：
+        [(移動履歴ファイル, 書き出したファイル, エントリのリスト, 理由ログの座標の配列 or None), …]
+    """
+    out_dir = os.path.join(data_dir, "decision_points") if out_dir is None else out_dir
+    os.makedirs(out_dir, exist_ok=True)
+    results = []
+    for maze_file, history_file in iter_corpus(data_dir):
+        start = find_start(load_maze(maze_file))
+        start_time, codes, timestamps = load_move_history(history_file)
+        entries = extract_decision_points(start, start_time, codes, timestamps, threshold_ms, log_k)
+        out_file = output_path(history_file, out_dir)
+        write_jsonl(entries, out_file)
+        reason_log = find_reason_log_for_history(history_file, os.path.join(data_dir, "reasons"))
+        annotated = load_reason_log(reason_log)['coordinates'] if reason_log is not None else None
+        results.append((history_file, out_file, entries, annotated))
+    return results
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    threshold_ms = float(sys.argv[2]) if len(sys.argv) > 2 else PAUSE_THRESHOLD_MS
+    log_k = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    results = extract_corpus(data_dir, threshold_ms=threshold_ms, log_k=log_k)
+    if not results:
+        print(f"{data_dir} に迷路と移動履歴の組がありません．")
+        sys.exit(1)
+    for history_file, out_file, entries, annotated in results:
+        line = f"{os.path.basename(history_file)}: {len(entries)} 個 → {out_file}"
+        if annotated is not None and len(annotated):
+            found = {tuple(e['coordinates']) for e in entries}
+            marked = {tuple(int(v) for v in p) for p in annotated}
+            both = len(found & marked)
+            line += (f"（理由ログ {len(marked)} 個と一致 {both}，"
+                     f"適合率 {both / max(len(found), 1):.0%}，再現率 {both / max(len(marked), 1):.0%}）")
+        print(line)
+    total = sum(len(entries) for _, _, entries, _ in results)
+    print(f"{len(results)} 個の履歴から {total} 個の意思決定ポイントを書き出しました．")
+
+
+if __name__ == '__main__':
+    main()
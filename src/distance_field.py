@@ -0,0 +1,357 @@
+"""
+distance_field.py
+
+迷路上の全セル間の最短経路（MazeAgent.bfs_path と同じ重み付き最短路）をまとめて計算する．
+
+- 移動コストは「移動先セルの数字」の和（スタートのセルは含まない）
+- コストが同じ経路同士ではステップ数が少ないものを優先する（bfs_path のヒープ順と同じ）
+- 各ゴールから逆向きにダイクストラ法を 1 回ずつ行い、
+    dist[s, t]     : s から t への総コスト
+    steps[s, t]    : そのときの移動ステップ数
+    next_hop[s, t] : s から t へ向かうときの次のセル
+  を (rows*cols, rows*cols) の NumPy 配列として持つ
+- 到達不能なセルの組は dist = UNREACHABLE, next_hop = -1 とする
+- 計算結果は迷路の内容のハッシュごとに exp_data/cache/distance_fields 以下へ .npy で保存し、
+  2回目以降はメモリマップで読み込むだけにする（ダイクストラ法は最初の 1 回のみ）
+- cost_grid を渡すと、迷路の数字の代わりにその（整数の）コストの配列で最短経路を求める
+  （perceived_cost の「見た目のコスト」など．キャッシュのキーには配列の内容も含める）
+- 表は (セル数)^2 の大きさになるので、セル数が DENSE_MAX_CELLS を超える迷路では全体を作らず、
+  LazyDistanceFields が同じ dist[s, t] などの添字で引かれたときに必要な列（ゴールごとの逆向きダイクストラ法）
+  や行（スタートごとのダイクストラ法）だけを計算し、最近使ったものを LAZY_CACHE_BYTES まで LRU で覚えておく
+- キャッシュの場所は作業ディレクトリによらず、リポジトリ直下の exp_data/cache 以下とする
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from collections import OrderedDict
+from heapq import heappush, heappop
+
+import numpy as np
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+# 方向（corpus.DIRECTIONS と同じ順番）
+DIRECTION_NAMES = ['up', 'down', 'left', 'right']
+NEIGHBOR_DELTAS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def maze_to_cost_grid(maze):
+    """迷路の 2次元リストを、数字セルはそのコスト・それ以外は -1 の配列に変換する"""
+    return np.array([[int(c) if c.isdigit() else -1 for c in row] for row in maze], dtype=np.int32)
+
+
+class DistanceFields:
+    """1つの迷路についての全セル間の最短経路表"""
+
+    def __init__(self, cost_grid, dist, steps, next_hop):
+        self.cost_grid = cost_grid
+        self.rows, self.cols = cost_grid.shape
+        self.cell_cost = cost_grid.ravel()
+        self.dist = dist
+        self.steps = steps
+        self.next_hop = next_hop
+
+    def index(self, pos):
+        """(row, col) をセル番号に変換する"""
+        return pos[0] * self.cols + pos[1]
+
+    def position(self, index):
+        """セル番号を (row, col) に変換する"""
+        return divmod(int(index), self.cols)
+
+    def cost(self, a, b):
+        """a から b への総コストとステップ数を返す（到達不能なら (None, None)）"""
+        d = self.dist[self.index(a), self.index(b)]
+        if d == UNREACHABLE:
+            return None, None
+        return int(d), int(self.steps[self.index(a), self.index(b)])
+
+    def route(self, a, b):
+        """
+        a から b への最短経路を bfs_path と同じ形式で返す
+
+        戻り値：
+            (path, steps, cost)．到達不能の場合は (None, None, None)
+        """
+        cost, steps = self.cost(a, b)
+        if cost is None:
+            return None, None, None
+        names = dict(zip(NEIGHBOR_DELTAS, DIRECTION_NAMES))
+        path = []
+        cur, goal = self.index(a), self.index(b)
+        while cur != goal:
+            nxt = int(self.next_hop[cur, goal])
+            (r0, c0), (r1, c1) = self.position(cur), self.position(nxt)
+            path.append(names[(r1 - r0, c1 - c0)])
+            cur = nxt
+        return path, steps, cost
+
+
+def _neighbor_lists(cost_grid):
+    """各セルの隣接セル（数字セルのみ）のリスト"""
+    rows, cols = cost_grid.shape
+    neighbors = [[] for _ in range(rows * cols)]
+    for r in range(rows):
+        for c in range(cols):
+            if cost_grid[r, c] < 0:
+                continue
+            for dr, dc in NEIGHBOR_DELTAS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols and cost_grid[nr, nc] >= 0:
+                    neighbors[r * cols + c].append(nr * cols + nc)
+    return neighbors
+
+
+def _dijkstra(source, neighbors, cell_cost, reverse):
+    """
+    source からの (総コスト, ステップ数) の辞書を返す
+    reverse=True なら source へ向かう向き（v → u の辺のコストは移動先 v のコスト）、
+    False なら source から出る向き（u → v の辺のコストは移動先 v のコスト）
+    """
+    best = {source: (0, 0)}
+    heap = [(0, 0, source)]
+    while heap:
+        d, s, v = heappop(heap)
+        if best[v] < (d, s):
+            continue
+        if reverse:
+            cand = (d + int(cell_cost[v]), s + 1)
+        for u in neighbors[v]:
+            if not reverse:
+                cand = (d + int(cell_cost[u]), s + 1)
+            if u not in best or cand < best[u]:
+                best[u] = cand
+                heappush(heap, (cand[0], cand[1], u))
+    return best
+
+
+def _fill_next_hop(cost_grid, dist, steps, next_hop):
+    """
+    dist, steps（(セル数, ゴール数) の配列）から、next_hop のまだ -1 の要素を埋める
+    次の一歩は、最短（コスト・ステップ数）となる隣接セルのうち方向名が辞書順で最小のもの
+    （bfs_path のヒープが (cost, steps, pos, path) の順で比較するのと同じ経路になる）
+    """
+    rows, cols = cost_grid.shape
+    cell_cost = cost_grid.ravel()
+    grid_idx = np.arange(rows * cols).reshape(rows, cols)
+    for name in sorted(DIRECTION_NAMES):
+        dr, dc = NEIGHBOR_DELTAS[DIRECTION_NAMES.index(name)]
+        src = grid_idx[max(0, -dr):rows - max(0, dr), max(0, -dc):cols - max(0, dc)].ravel()
+        dst = src + dr * cols + dc
+        ok = (cell_cost[src] >= 0) & (cell_cost[dst] >= 0)
+        src, dst = src[ok], dst[ok]
+        d_src, d_dst = dist[src], dist[dst].astype(np.int64)
+        optimal = ((d_src != UNREACHABLE) & (d_dst != UNREACHABLE)
+                   & (d_dst + cell_cost[dst][:, None] == d_src)
+                   & (steps[dst].astype(np.int64) + 1 == steps[src])
+                   & (next_hop[src] < 0))
+        rows_idx, goal_idx = np.nonzero(optimal)
+        next_hop[src[rows_idx], goal_idx] = dst[rows_idx]
+
+
+def compute_distance_fields(maze, cost_grid=None):
+    """
+    迷路の 2次元リストから DistanceFields を計算する
+    cost_grid : 各マスに入るコストの整数配列（壁は負）．省略時は迷路の数字
+    """
+    if cost_grid is None:
+        cost_grid = maze_to_cost_grid(maze)
+    cost_grid = np.asarray(cost_grid, dtype=np.int32)
+    rows, cols = cost_grid.shape
+    n = rows * cols
+    cell_cost = cost_grid.ravel()
+    dist = np.full((n, n), UNREACHABLE, dtype=np.int32)
+    steps = np.full((n, n), UNREACHABLE, dtype=np.int32)
+    next_hop = np.full((n, n), -1, dtype=np.int32)
+
+    neighbors = _neighbor_lists(cost_grid)
+    for goal in np.flatnonzero(cell_cost >= 0):
+        # goal から逆向きに探索する
+        for u, (d, s) in _dijkstra(goal, neighbors, cell_cost, reverse=True).items():
+            dist[u, goal] = d
+            steps[u, goal] = s
+
+    next_hop[np.arange(n), np.arange(n)] = np.where(cell_cost >= 0, np.arange(n), -1)
+    _fill_next_hop(cost_grid, dist, steps, next_hop)
+    return DistanceFields(cost_grid, dist, steps, next_hop)
+
+
+# --- 大きな迷路用：必要な行・列だけ計算する表 ---
+
+# これより多くのセルを持つ迷路では全セル間の表を作らない（100x100 で各表 400 MB になる）
+DENSE_MAX_CELLS = 2500
+# LazyDistanceFields が覚えておく行・列の合計の大きさの目安
+LAZY_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class _LazyTable:
+    """dist / steps / next_hop の [s, t] の添字（整数または NumPy 配列の組）で引ける遅延計算の表"""
+
+    def __init__(self, fields, name):
+        self.fields = fields
+        self.name = name
+        n = fields.rows * fields.cols
+        self.shape = (n, n)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            # 行の取り出し：s から全てのセルへ
+            s = np.asarray(key)
+            key = (s[..., None], np.arange(self.shape[1]))
+        s, t = np.broadcast_arrays(np.asarray(key[0], dtype=np.int64), np.asarray(key[1], dtype=np.int64))
+        out = np.empty(s.shape, dtype=np.int32)
+        flat_s, flat_t, flat_out = s.ravel(), t.ravel(), out.reshape(-1)
+        # 行（スタートごと）と列（ゴールごと）のうち、計算する本数が少ない方で引く．next_hop は列のみ
+        by_row = self.name != 'next_hop' and len(np.unique(flat_s)) < len(np.unique(flat_t))
+        keys, other = (flat_s, flat_t) if by_row else (flat_t, flat_s)
+        order = np.argsort(keys, kind='stable')
+        uniq, first = np.unique(keys[order], return_index=True)
+        for k, lo, hi in zip(uniq, first, np.append(first[1:], len(order))):
+            table = self.fields.row(int(k)) if by_row else self.fields.column(int(k))
+            idx = order[lo:hi]
+            flat_out[idx] = table[self.name][other[idx]]
+        return out[()] if out.ndim == 0 else out
+
+
+class LazyDistanceFields(DistanceFields):
+    """
+    DistanceFields と同じ使い方で、引かれた行・列だけを計算する最短経路表（大きな迷路用）
+    列（ゴール t への dist, steps, next_hop）は t からの逆向きダイクストラ法、
+    行（スタート s からの dist, steps）は s からのダイクストラ法で求め、LRU で覚えておく
+    """
+
+    def __init__(self, cost_grid, cache_bytes=LAZY_CACHE_BYTES):
+        cost_grid = np.asarray(cost_grid, dtype=np.int32)
+        super().__init__(cost_grid, *(None,) * 3)
+        self.dist = _LazyTable(self, 'dist')
+        self.steps = _LazyTable(self, 'steps')
+        self.next_hop = _LazyTable(self, 'next_hop')
+        self.neighbors = _neighbor_lists(cost_grid)
+        self.capacity = max(8, cache_bytes // (3 * 4 * self.cell_cost.size))
+        self._columns = OrderedDict()
+        self._rows = OrderedDict()
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.capacity:
+            cache.popitem(last=False)
+        return value
+
+    def _arrays(self, best):
+        """{セル: (総コスト, ステップ数)} を dist, steps の配列の辞書にする"""
+        n = self.cell_cost.size
+        dist = np.full(n, UNREACHABLE, dtype=np.int32)
+        steps = np.full(n, UNREACHABLE, dtype=np.int32)
+        cells = np.fromiter(best.keys(), dtype=np.int64, count=len(best))
+        values = np.array(list(best.values()), dtype=np.int32).reshape(-1, 2)
+        dist[cells], steps[cells] = values[:, 0], values[:, 1]
+        return {'dist': dist, 'steps': steps}
+
+    def column(self, goal):
+        """ゴール goal への dist, steps, next_hop（各セル → goal）の辞書"""
+        if goal in self._columns:
+            self._columns.move_to_end(goal)
+            return self._columns[goal]
+        if self.cell_cost[goal] < 0:
+            best = {}
+        else:
+            best = _dijkstra(goal, self.neighbors, self.cell_cost, reverse=True)
+        column = self._arrays(best)
+        next_hop = np.full((self.cell_cost.size, 1), -1, dtype=np.int32)
+        if best:
+            next_hop[goal, 0] = goal
+            _fill_next_hop(self.cost_grid, column['dist'][:, None], column['steps'][:, None], next_hop)
+        column['next_hop'] = next_hop[:, 0]
+        return self._remember(self._columns, goal, column)
+
+    def row(self, source):
+        """スタート source からの dist, steps（source → 各セル）の辞書"""
+        if source in self._rows:
+            self._rows.move_to_end(source)
+            return self._rows[source]
+        if self.cell_cost[source] < 0:
+            best = {}
+        else:
+            best = _dijkstra(source, self.neighbors, self.cell_cost, reverse=False)
+        return self._remember(self._rows, source, self._arrays(best))
+
+
+# --- ディスクキャッシュ ---
+
+# 形式を変えたときは上げる（古いキャッシュを使わないようにする）
+CACHE_VERSION = 1
+# 作業ディレクトリによらず、リポジトリ直下の exp_data/cache に置く
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exp_data", "cache")
+DEFAULT_CACHE_DIR = os.path.join(CACHE_ROOT, "distance_fields")
+_ARRAY_NAMES = ['cost_grid', 'dist', 'steps', 'next_hop']
+
+_memory_cache = {}
+
+
+def maze_text(maze):
+    """迷路の 2次元リストを（ファイルと同じ）テキストに変換する"""
+    return '\n'.join(''.join(row) for row in maze)
+
+
+def maze_hash(maze):
+    """迷路の内容のハッシュ（キャッシュのキー）"""
+    return hashlib.sha256(f"v{CACHE_VERSION}\n{maze_text(maze)}".encode('utf-8')).hexdigest()[:16]
+
+
+def save_distance_fields(fields, directory):
+    """DistanceFields を directory に .npy として保存する（書き込み途中のものは見えないようにする）"""
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+    for name in _ARRAY_NAMES:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(fields, name))
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # 並列実行で先に他のプロセスが保存した場合はそちらを使う
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_cached_distance_fields(directory):
+    """保存済みの DistanceFields をメモリマップで読み込む（無ければ None）"""
+    paths = [os.path.join(directory, f"{name}.npy") for name in _ARRAY_NAMES]
+    if not all(os.path.isfile(path) for path in paths):
+        return None
+    arrays = [np.load(path, mmap_mode='r') for path in paths]
+    return DistanceFields(*arrays)
+
+
+def get_distance_fields(maze, cache_dir=DEFAULT_CACHE_DIR, cost_grid=None, dense=None):
+    """
+    迷路の DistanceFields を返す
+    メモリ → ディスク（cache_dir/<迷路内容のハッシュ>/*.npy，メモリマップで読み込み）の順に探し、
+    どちらにも無ければ計算してディスクに保存する．cache_dir=None ならディスクは使わない
+    cost_grid を渡した場合はそのコストで計算する（キーは <迷路のハッシュ>_<配列のハッシュ>）
+    dense=False、または省略時にセル数が DENSE_MAX_CELLS を超える場合は LazyDistanceFields を返す
+    （ディスクには保存しない）
+    """
+    key = maze_hash(maze)
+    if cost_grid is not None:
+        cost_grid = np.asarray(cost_grid, dtype=np.int32)
+        key += "_" + hashlib.sha256(cost_grid.tobytes()).hexdigest()[:12]
+    if dense is None:
+        dense = len(maze) * len(maze[0]) <= DENSE_MAX_CELLS
+    if not dense:
+        key += "_lazy"
+    if key in _memory_cache:
+        return _memory_cache[key]
+    fields = None
+    if not dense:
+        fields = LazyDistanceFields(maze_to_cost_grid(maze) if cost_grid is None else cost_grid)
+    elif cache_dir is not None:
+        directory = os.path.join(cache_dir, key)
+        fields = load_cached_distance_fields(directory)
+        if fields is None:
+            save_distance_fields(compute_distance_fields(maze, cost_grid), directory)
+            fields = load_cached_distance_fields(directory)
+    if fields is None:
+        fields = compute_distance_fields(maze, cost_grid)
+    _memory_cache[key] = fields
+    return fields
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+dwell_heatmap.py
+
+被験者が迷路のどこで迷っていたかを見るために、思考時間をマスに割り当ててヒートマップにする．
+
+- 各移動履歴の座標を方向コードの累積和で復元し（corpus.reconstruct_positions）、
+  m 手目の直前の待ち時間（corpus.think_times）を m 手目を指す直前のマスに割り当てる
+- 迷路ごとに (rows, cols) の配列へ次の 3 つを集計する
+    visits   : そのマスに居た回数（スタートを含む）
+    dwell_ms : そのマスで次の手を指すまでの待ち時間の合計
+    pauses   : 待ち時間が閾値（既定 500 ms）以上だった回数
+- コーパス全体を 1 回で集計する：全ての履歴のセル番号に迷路ごとのオフセットを足して 1 本の配列にし、
+  np.add.at を指標ごとに 1 回ずつ呼ぶ（マスごとの Python のループは使わない）
+- 迷路ごとに 3 枚並べたヒートマップ（壁は塗らない）を exp_data/heatmaps/<迷路名>_heatmap.png に、
+  配列を <迷路名>_heatmap.npz に保存する（人間以外の履歴は <迷路名>_<接頭辞>_heatmap）
+
+使い方：
+    python src/dwell_heatmap.py [exp_data ディレクトリ] [閾値 ms] [履歴の接頭辞（既定 move_history）]
+"""
+
+import os
+import sys
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from corpus import (PAUSE_THRESHOLD_MS, load_maze, find_start, load_move_history, reconstruct_positions,
+                    think_times, iter_corpus)
+from distance_field import maze_to_cost_grid
+
+METRICS = ['visits', 'dwell_ms', 'pauses']
+
+
+class MazeHeat:
+    """1つの迷路のマスごとの集計"""
+
+    def __init__(self, maze_file, maze, visits, dwell_ms, pauses, n_histories):
+        self.maze_file = maze_file
+        self.wall = maze_to_cost_grid(maze) < 0
+        self.visits = visits
+        self.dwell_ms = dwell_ms
+        self.pauses = pauses
+        self.n_histories = n_histories
+
+    def save(self, filename):
+        """配列を .npz で保存する"""
+        np.savez_compressed(filename, wall=self.wall, visits=self.visits, dwell_ms=self.dwell_ms,
+                            pauses=self.pauses, n_histories=self.n_histories)
+
+
+def accumulate_corpus(data_dir="exp_data", threshold_ms=PAUSE_THRESHOLD_MS, prefix="move_history"):
+    """
+    data_dir 以下の全ての移動履歴を迷路ごとに集計し、{迷路ファイル: MazeHeat} を返す
+    （同じ迷路の履歴が複数あれば足し合わせる）
+    """
+    mazes = {}
+    offsets = {}
+    total = 0
+    cells, waits, counts = [], [], {}
+    for maze_file, history_file in iter_corpus(data_dir, prefix):
+        if maze_file not in mazes:
+            mazes[maze_file] = load_maze(maze_file)
+            offsets[maze_file] = total
+            total += len(mazes[maze_file]) * len(mazes[maze_file][0])
+        maze = mazes[maze_file]
+        start_time, codes, timestamps = load_move_history(history_file)
+        positions = reconstruct_positions(find_start(maze), codes)
+        cells.append(offsets[maze_file] + positions[:, 0] * len(maze[0]) + positions[:, 1])
+        # 最後の位置（その後に手を指していない）は待ち時間 0 として visits だけ数える
+        waits.append(np.append(think_times(start_time, timestamps), 0))
+        counts[maze_file] = counts.get(maze_file, 0) + 1
+
+    cells = np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64)
+    waits = np.concatenate(waits) if waits else np.zeros(0, dtype=np.int64)
+    visits = np.zeros(total, dtype=np.int64)
+    dwell = np.zeros(total, dtype=np.int64)
+    pauses = np.zeros(total, dtype=np.int64)
+    np.add.at(visits, cells, 1)
+    np.add.at(dwell, cells, waits)
+    np.add.at(pauses, cells, (waits >= threshold_ms).astype(np.int64))
+
+    heats = {}
+    for maze_file, maze in mazes.items():
+        shape = (len(maze), len(maze[0]))
+        window = slice(offsets[maze_file], offsets[maze_file] + shape[0] * shape[1])
+        heats[maze_file] = MazeHeat(maze_file, maze, visits[window].reshape(shape), dwell[window].reshape(shape),
+                                    pauses[window].reshape(shape), counts[maze_file])
+    return heats
+
+
+def render(heat, filename):
+    """1つの迷路の 3 つの指標を並べたヒートマップを filename に保存する"""
+    titles = {'visits': "Visits", 'dwell_ms': "Dwell time (s)", 'pauses': "Pauses"}
+    fig, axes = plt.subplots(1, len(METRICS), figsize=(5 * len(METRICS), 5))
+    for ax, name in zip(axes, METRICS):
+        values = getattr(heat, name) / (1000.0 if name == 'dwell_ms' else 1)
+        image = ax.imshow(np.ma.masked_where(heat.wall, values), cmap='magma', interpolation='nearest')
+        ax.imshow(np.ma.masked_where(~heat.wall, heat.wall), cmap='Greys', vmin=0, vmax=1.5, interpolation='nearest')
+        ax.set_title(titles[name])
+        ax.set_xticks([])
+        ax.set_yticks([])
+        fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+    fig.suptitle(f"{os.path.basename(heat.maze_file)} ({heat.n_histories} histories)")
+    fig.tight_layout()
+    fig.savefig(filename, dpi=120)
+    plt.close(fig)
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    threshold_ms = float(sys.argv[2]) if len(sys.argv) > 2 else PAUSE_THRESHOLD_MS
+    prefix = sys.argv[3] if len(sys.argv) > 3 else "move_history"
+
+    heats = accumulate_corpus(data_dir, threshold_ms, prefix)
+    if not heats:
+        print(f"{data_dir} に迷路と移動履歴の組がありません．")
+        sys.exit(1)
+    out_dir = os.path.join(data_dir, "heatmaps")
+    os.makedirs(out_dir, exist_ok=True)
+    for maze_file, heat in heats.items():
+        name = os.path.splitext(os.path.basename(maze_file))[0]
+        if prefix != "move_history":
+            name += f"_{prefix}"
+        base = os.path.join(out_dir, name + "_heatmap")
+        heat.save(base + ".npz")
+        render(heat, base + ".png")
+        r, c = np.unravel_index(np.argmax(heat.dwell_ms), heat.dwell_ms.shape)
+        print(f"{os.path.basename(maze_file)}: 待ち時間の合計 {heat.dwell_ms.sum() / 1000:.1f} s，"
+              f"{heat.pauses.sum()} 回の迷い，最も長く迷ったマス ({r},{c}) {heat.dwell_ms[r, c] / 1000:.1f} s → {base}.png")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,145 +1,122 @@
 # maze_replay.py
-import pygame
 import time
 import sys
 from pathlib import Path
 import tkinter as tk
 import os
 
-pygame.init()
-
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-YELLOW = (255, 255, 0)
-RED = (255, 0, 0)
-CYAN = (0, 255, 255)
-GRAY = (192, 192, 192)
-
-TILE_SIZE = 40
-
-def generate_unique_filename(directory, filename):
-    """重複を避けるためのファイル名生成"""
-    os.makedirs(directory, exist_ok=True)  # ディレクトリが無ければ作成
-    base, ext = os.path.splitext(filename)
-    counter = 1
-    new_filename = os.path.join(directory, f"{base}{ext}")
-    while os.path.exists(new_filename):
-        new_filename = os.path.join(directory, f"{base}_{counter}{ext}")
-        counter += 1
-    return new_filename
-
-def ask_operation_and_reason_window(direction, wait_time, timestamp_ms):
+# src 直下の共通モジュールを読み込めるようにする
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from reason_log import ReasonLogWriter, unique_log_paths, read_entries, export_text
+from session_index import session_filename
+from corpus import DIRECTION_CODES, PAUSE_THRESHOLD_MS, reconstruct_positions, think_times, pause_indices
+from telemetry import SessionTelemetry, telemetry_path
+from maze_core import MazeCore, get_pygame, DIRECTION_DELTAS, BLACK, YELLOW
+import numpy as np
+
+class ReasonDialog:
     """
-    0.5秒以上待ちが発生した際に表示するウィンドウ。
-    1) 次にどんな操作をしたか
-    2) その操作の理由
-    を入力してもらうフォームを Tkinter で作成。
+    操作内容と理由を入力してもらうウィンドウ（Tkinter）。
 
-    OK ボタン押下までブロッキングし、押下後にウィンドウを閉じる。
+    Tk のルートは最初の 1 回だけ作って使い回し、
+    入力待ちの間も mainloop でブロックせずに Tk と pygame の両方のイベントを処理する。
+    そのため入力中も pygame のウィンドウは固まらず、次の区間を描画しておける。
     """
-    root = tk.Tk()
-    root.title("操作の記録")
 
-    label_op = tk.Label(
-        root, 
-        text=(
-            f"次の移動 ({direction}) が行われるまで {wait_time:.2f}秒待ちが発生しました。\n"
-            "1) 次にどんな操作をしたかを入力してください。"
+    def __init__(self):
+        self.root = None
+        self.result = None
+
+    def _build(self):
+        """ウィンドウを作る（最初の ask のときだけ呼ばれる）"""
+        self.root = tk.Tk()
+        self.root.title("操作の記録")
+        self.root.protocol("WM_DELETE_WINDOW", self._on_cancel)
+
+        self.label_op = tk.Label(self.root, justify=tk.LEFT)
+        self.label_op.pack(padx=10, pady=10)
+
+        self.text_box_op = tk.Text(self.root, width=50, height=3)
+        self.text_box_op.pack(padx=10, pady=5)
+
+        label_reason = tk.Label(self.root, text="2) その操作の理由を入力してください。")
+        label_reason.pack(padx=10, pady=10)
+
+        self.text_box_reason = tk.Text(self.root, width=50, height=5)
+        self.text_box_reason.pack(padx=10, pady=5)
+
+        submit_btn = tk.Button(self.root, text="OK", command=self._on_submit)
+        submit_btn.pack(pady=5)
+        self.root.withdraw()
+
+    def _on_submit(self):
+        self.result = (
+            self.text_box_op.get("1.0", tk.END).strip(),
+            self.text_box_reason.get("1.0", tk.END).strip(),
         )
-    )
-    label_op.pack(padx=10, pady=10)
-
-    text_box_op = tk.Text(root, width=50, height=3)
-    text_box_op.pack(padx=10, pady=5)
-
-    label_reason = tk.Label(root, text="2) その操作の理由を入力してください。")
-    label_reason.pack(padx=10, pady=10)
-
-    text_box_reason = tk.Text(root, width=50, height=5)
-    text_box_reason.pack(padx=10, pady=5)
-
-    container = {"operation": None, "reason": None}
-
-    def on_submit():
-        container["operation"] = text_box_op.get("1.0", tk.END).strip()
-        container["reason"] = text_box_reason.get("1.0", tk.END).strip()
-        root.destroy()
-
-    submit_btn = tk.Button(root, text="OK", command=on_submit)
-    submit_btn.pack(pady=5)
-
-    # ウィンドウを表示し、ユーザ入力を待つ (ブロッキング)
-    root.mainloop()
-
-    return container["operation"], container["reason"]
-
-# def save_operation_and_reason_with_metadata(filepath, operation, reason, direction, timestamp_ms, wait_time):
-#     """
-#     ユーザが入力した操作内容とその理由、およびメタデータをファイルに保存する。
-#     ここで、常に同じファイル（operation_reason_log.txt）に追記する。
-#     """
-# 
-#     # 'a' (append) モードで開いて、回答を追記していく
-#     with open(filepath, 'a', encoding='utf-8') as f:
-#         f.write(f"Direction: {direction}\n")
-#         f.write(f"Timestamp(ms): {timestamp_ms}\n")
-#         f.write(f"WaitTime(s): {wait_time:.3f}\n")
-#         f.write(f"Operation: {operation}\n")
-#         f.write(f"Reason: {reason}\n")
-#         f.write("-------\n")
-# 
-#     print(f"Operation and reason appended to {filepath}.")
-
-def save_operation_and_reason_with_metadata(filepath, operation, reason, direction, timestamp_ms, wait_time, coordinates):
-    """
-    ユーザが入力した操作内容とその理由、およびメタデータをファイルに保存する。
-    座標情報を追加
-    """
-    x, y = coordinates  # 座標のアンパック
-    with open(filepath, 'a', encoding='utf-8') as f:
-        f.write(f"Direction: {direction}\n")
-        f.write(f"Timestamp(ms): {timestamp_ms}\n")
-        f.write(f"WaitTime(s): {wait_time:.3f}\n")
-        f.write(f"Coordinates: ({x},{y})\n")  # 座標情報追加
-        f.write(f"Operation: {operation}\n")
-        f.write(f"Reason: {reason}\n")
-        f.write("-------\n")
-
-class MazeReplay:
-    def __init__(self, maze_file, replay_file):
-        if not pygame.get_init():
-            pygame.init()
 
+    def _on_cancel(self):
+        # ウィンドウを閉じた場合は未入力として扱う
+        self.result = ("", "")
+
+    def ask(self, direction, wait_time, timestamp_ms, on_idle, fps=30):
+        """
+        入力を求め、OK が押されるまで Tk と pygame のイベントを交互に処理する。
+        on_idle は待っている間に毎フレーム呼ばれ、False を返すと入力を打ち切る。
+
+        戻り値：
+            (operation, reason)。打ち切った場合は (None, None)
+        """
+        if self.root is None:
+            self._build()
+        self.label_op.config(text=(
+            f"次の移動 ({direction}) が行われるまで {wait_time:.2f}秒待ちが発生しました。\n"
+            "1) 次にどんな操作をしたかを入力してください。"
+        ))
+        self.text_box_op.delete("1.0", tk.END)
+        self.text_box_reason.delete("1.0", tk.END)
+        self.result = None
+        self.root.deiconify()
+        self.root.lift()
+        self.text_box_op.focus_set()
+
+        clock = get_pygame().time.Clock()
+        while self.result is None:
+            self.root.update()
+            if on_idle() is False:
+                self.root.withdraw()
+                return None, None
+            clock.tick(fps)
+
+        self.root.withdraw()
+        return self.result
+
+    def close(self):
+        """Tk のルートを破棄する"""
+        if self.root is not None:
+            self.root.destroy()
+            self.root = None
+
+class MazeReplay(MazeCore):
+    def __init__(self, maze_file, replay_file, session_id=None):
         self.load_maze(maze_file)
         self.load_replay(replay_file)
-        self.player_position = self.start
-        self.visited = set()
-        self.total_cost = 0
-        self.mark_explored()
-
-        self.font = pygame.font.Font(None, 24)
+        self.reset_player()
 
+        # 理由は JSON Lines でまとめて書き込み、終了時に従来のテキスト形式にも書き出す
         directory = "exp_data/reasons"
-        self.filepath = generate_unique_filename(directory, "operation_reason_log.txt")
-
-    def load_maze(self, maze_file):
-        with open(maze_file, 'r') as f:
-            self.maze = [list(line.strip()) for line in f.readlines()]
-        self.rows = len(self.maze)
-        self.cols = len(self.maze[0])
-        self.start = self.find_start()
-
-    def find_start(self):
-        for i, row in enumerate(self.maze):
-            for j, cell in enumerate(row):
-                if cell == '5':
-                    return (i, j)
-        raise ValueError("Start position not found in the maze file.")
+        if session_id is not None:
+            self.filepath = session_filename(directory, "operation_reason_log.jsonl", session_id)
+            self.text_filepath = session_filename(directory, "operation_reason_log.txt", session_id)
+        else:
+            self.filepath, self.text_filepath = unique_log_paths(directory)
+        self.reason_log = ReasonLogWriter(self.filepath)
 
     def load_replay(self, replay_file):
         if not Path(replay_file).is_file():
             raise FileNotFoundError(f"Replay file not found: {replay_file}")
         
+        self.replay_file = replay_file
         self.replay_data = []
         with open(replay_file, 'r') as f:
             lines = f.readlines()
@@ -153,124 +130,179 @@ class MazeReplay:
                 direction, timestamp_ms, *_ = line.strip().split()
                 self.replay_data.append((direction, int(timestamp_ms)))
 
-    def mark_explored(self):
-        """現在のマスと上下左右に伸びる連続した数字マスを探索済みにする"""
-        x, y = self.player_position
-        self.visited.add((x, y))
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            while 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny].isdigit():
-                self.visited.add((nx, ny))
-                nx += dx
-                ny += dy
-
-    def move(self, direction):
-        """プレイヤーを指定方向へ移動し、コストを加算する"""
+        # 待ち時間・座標を配列でも持っておく（pause_queue で一括して調べるため）
+        self.codes = np.array([DIRECTION_CODES[d] for d, _ in self.replay_data], dtype=np.int8)
+        self.timestamps = np.array([t for _, t in self.replay_data], dtype=np.int64)
+        self.waits = think_times(self.start_time, self.timestamps)
+        self.positions = reconstruct_positions(self.start, self.codes)
+
+    def pause_queue(self, threshold=0.5, log_k=None):
+        """
+        理由を入力してもらう移動（待ち時間が threshold 秒以上）を、再生前にまとめて求める
+        log_k を指定した場合は、threshold 秒以上の待ちのうち対数スケールで長いもの
+        （corpus.log_scale_cutoff）だけにする
+
+        戻り値：
+            [(移動の番号, 待ち時間（秒）, 方向, 時刻（ms）, 移動前の座標), ...]
+        """
+        indices = pause_indices(self.waits, threshold * 1000, log_k)
+        return [(int(i), float(self.waits[i]) / 1000.0, self.replay_data[i][0], self.replay_data[i][1],
+                 tuple(int(v) for v in self.positions[i]))
+                for i in indices]
+
+    def upcoming_segment(self, index, threshold=0.5, stops=None):
+        """
+        index 番目の移動から、次に threshold 秒以上の待ちが発生する直前までに通るマスを返す
+        （理由の入力中に、これから再生される区間を先に描画しておくため）
+        stops（移動の番号の集合）を渡した場合は、次の stops の直前までにする
+        """
         x, y = self.player_position
-        new_position = {
-            'up':    (x - 1, y),
-            'left':  (x, y - 1),
-            'down':  (x + 1, y),
-            'right': (x, y + 1)
-        }.get(direction, (x, y))
-
-        nx, ny = new_position
-        # 壁でない場合のみ移動
-        if 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny] != '#':
-            cost = int(self.maze[nx][ny]) if self.maze[nx][ny].isdigit() else 0
-            self.total_cost += cost
-            print(f"Moved {direction}. Cost: {cost}, Total Cost: {self.total_cost}")
-
-            self.player_position = new_position
-            self.mark_explored()
-
-    def draw_maze(self, screen):
-        """迷路とプレイヤー、探索状況を描画"""
-        for i, row in enumerate(self.maze):
-            for j, cell in enumerate(row):
-                x = j * TILE_SIZE
-                y = i * TILE_SIZE
-
-                if (i, j) == self.start:
-                    color = RED
-                elif (i, j) == self.player_position:
-                    color = YELLOW
-                elif (i, j) in self.visited:
-                    color = GRAY
-                elif cell.isdigit():
-                    color = CYAN
-                else:
-                    color = BLACK
-
-                pygame.draw.rect(screen, color, (x, y, TILE_SIZE, TILE_SIZE))
-                pygame.draw.rect(screen, WHITE, (x, y, TILE_SIZE, TILE_SIZE), 1)
-
-                # 数字セルの場合はコストを描画
-                if cell.isdigit():
-                    text = self.font.render(cell, True, WHITE if color == CYAN else BLACK)
-                    text_rect = text.get_rect(center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
-                    screen.blit(text, text_rect)
-
-    def draw_cost(self, screen, screen_height):
-        """画面下部に総コストを描画"""
-        pygame.draw.rect(screen, BLACK, (0, screen_height - 40, screen.get_width(), 40))
-        cost_text = self.font.render(f"Total Cost: {self.total_cost}", True, WHITE)
-        screen.blit(cost_text, (10, screen_height - 30))
-
-    def replay(self):
-        """リプレイを再生する"""
-        screen_width = self.cols * TILE_SIZE
-        screen_height = self.rows * TILE_SIZE + 40
+        cells = []
+        for j in range(index, len(self.replay_data)):
+            direction, timestamp_ms = self.replay_data[j]
+            if j > index and (j in stops if stops is not None else
+                              (timestamp_ms - self.replay_data[j - 1][1]) / 1000.0 >= threshold):
+                break
+            dx, dy = DIRECTION_DELTAS.get(direction, (0, 0))
+            if 0 <= x + dx < self.rows and 0 <= y + dy < self.cols and self.maze[x + dx][y + dy] != '#':
+                x, y = x + dx, y + dy
+                cells.append((x, y))
+        return cells
+
+    def draw_segment(self, screen, cells):
+        """upcoming_segment で求めたマスを枠線で描画"""
+        pygame = get_pygame()
+        for i, j in cells:
+            pygame.draw.rect(screen, YELLOW, self.viewport.tile_rect(i, j), 3)
+
+    def replay(self, threshold=0.5, log_k=None, jump=False):
+        """
+        リプレイを再生する
+        理由を入力してもらう移動は再生前に pause_queue(threshold, log_k) で決めておく．
+        jump=True なら待ちの区間を飛ばし、次に理由を入力する移動までそのまま進める
+        """
+        pygame = get_pygame()
+        self.init_rendering()
+        screen_width = self.viewport.width
+        screen_height = self.viewport.height + 40
         screen = pygame.display.set_mode((screen_width, screen_height))
         pygame.display.set_caption("Maze Replay")
 
         clock = pygame.time.Clock()
         running = True
+        dialog = ReasonDialog()
+        # 描画の遅れの記録（移動履歴と同じ名前 + _replay で保存する）
+        telemetry = SessionTelemetry(fps=30)
+        queue = self.pause_queue(threshold, log_k)
+        stops = {i for i, *_ in queue}
+        print(f"{len(queue)} pause point(s) to annotate.")
 
         for i, (direction, timestamp_ms) in enumerate(self.replay_data):
             if not running:
                 break
 
             # 前回の移動時刻 or start_time からの差分 (秒)
-            previous_timestamp = self.start_time if i == 0 else self.replay_data[i - 1][1]
-            wait_time = (timestamp_ms - previous_timestamp) / 1000.0
-
-            # 待機時間が 0.5秒以上ならば一時停止して操作内容・理由入力
-            if wait_time >= 0.5:
-                operation, reason = ask_operation_and_reason_window(direction, wait_time, timestamp_ms)
+            wait_time = float(self.waits[i]) / 1000.0
+
+            # 待ちの一覧に入っている移動ならば一時停止して操作内容・理由入力
+            if i in stops:
+                # 入力中も pygame のイベントを処理し、次に再生する区間を描画しておく
+                segment = self.upcoming_segment(i, stops=stops)
+
+                def on_idle():
+                    telemetry.frame_start()
+                    events = pygame.event.get()
+                    telemetry.events_polled(len(events))
+                    for event in events:
+                        if event.type == pygame.QUIT:
+                            return False
+                        if event.type == pygame.KEYDOWN:
+                            self.viewport.handle_key(event.key)
+                    telemetry.render_start()
+                    screen.fill(BLACK)
+                    self.draw_maze(screen)
+                    self.draw_segment(screen, segment)
+                    self.draw_cost(screen, screen_height)
+                    pygame.display.flip()
+                    telemetry.render_end()
+                    return True
+
+                operation, reason = dialog.ask(direction, wait_time, timestamp_ms, on_idle)
+                if operation is None:
+                    running = False
+                    break
                 if operation.strip() or reason.strip():
                     # 現在の座標を取得（移動前の位置）
                     current_coords = self.player_position
-                    save_operation_and_reason_with_metadata(
-                        self.filepath, 
-                        operation, 
-                        reason, 
-                        direction, 
-                        timestamp_ms, 
+                    self.reason_log.append(
+                        operation,
+                        reason,
+                        direction,
+                        timestamp_ms,
                         wait_time,
                         current_coords  # 座標情報を追加
                     )
 
+            # jump=True なら次の移動へすぐ進む（待ちの間の区間は見せない）
+            if jump:
+                self.move(direction)
+                continue
+
             # 実際に再生上は wait_time だけ停止
             start_time_loop = time.time()
 
             # 現在の状況を描画して表示
+            telemetry.frame_start()
+            telemetry.render_start()
             screen.fill(BLACK)
             self.draw_maze(screen)
             self.draw_cost(screen, screen_height)
             pygame.display.flip()
+            telemetry.render_end()
 
             # 指定の待機時間が経過するまでループ
             while time.time() - start_time_loop < wait_time:
-                for event in pygame.event.get():
+                telemetry.frame_start()
+                events = pygame.event.get()
+                telemetry.events_polled(len(events))
+                for event in events:
                     if event.type == pygame.QUIT:
                         running = False
                         break
+                    # 拡大・縮小したら描き直す
+                    if event.type == pygame.KEYDOWN and self.viewport.handle_key(event.key):
+                        telemetry.render_start()
+                        screen.fill(BLACK)
+                        self.draw_maze(screen)
+                        self.draw_cost(screen, screen_height)
+                        pygame.display.flip()
+                        telemetry.render_end()
                 clock.tick(30)
 
             # 移動を実行
             self.move(direction)
 
+        # 理由ログを書き込み、テキスト形式にも書き出す
+        self.reason_log.close()
+        if self.reason_log.count:
+            export_text(read_entries(self.filepath), self.text_filepath)
+
+        telemetry.frame_start()
+        telemetry.save(telemetry_path(self.replay_file, "_replay"))
+
         # 最後に少し待ってから終了
+        dialog.close()
         time.sleep(1)
         pygame.quit()
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python maze_replay.py <maze_file> <move_history_file> [threshold_s] [log_k] [jump]")
+        sys.exit(1)
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else PAUSE_THRESHOLD_MS / 1000.0
+    log_k = float(sys.argv[4]) if len(sys.argv) > 4 and sys.argv[4] != '-' else None
+    jump = len(sys.argv) > 5 and sys.argv[5] == 'jump'
+    MazeReplay(sys.argv[1], sys.argv[2]).replay(threshold, log_k, jump)
+
+if __name__ == '__main__':
+    main()
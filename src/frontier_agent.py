@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+frontier_agent.py
+
+意思決定ポイントのファイルを使わず、いちばん近い「探索の前線（frontier）」へ向かい続けて迷路を探索するエージェント．
+
+- 前線：探索済み（mark_explored で見えた）マスのうち、上下左右にまだ探索済みでない数字マスがあるもの．
+  前線のマスに立つと、その隣のまだ見えていないマスが見える
+- 前線の集合は mark_explored が新しく見えたマスの周りだけを調べて差分で更新する
+- 前線までの距離は「全ての前線のマスを始点とした多始点ダイクストラ法」の距離の場（探索済みのマスの上）として持ち、
+  前線の変化に合わせて差分で直す（迷路全体を毎回探索し直さない）
+    ・前線に加わったマス → 距離 0 の始点として周りへ緩和する
+    ・前線から外れたマス → その始点へ向かっていたマス（最短経路木の部分木）だけ距離を捨て、
+      部分木の外の隣から緩和し直す
+    ・新しく見えたマス → 隣の探索済みのマスから緩和する
+- 経路は探索済みのマスだけを通る．各マスで距離の場の「次のマス」へ 1 歩進み、
+  前線のマスに着いたら 1 区間とする（区間の順位付けは bfs_path と同じく（総コスト, ステップ数））
+- 時間消費は MazeAgent と同じ：区間ごとに leg_wait、前線が無くなったらゴール（既定はスタート）へ goal_wait の後に戻る
+- incremental=False にすると、毎歩いま居るマスから最も近い前線までダイクストラ法で探す（比較用．同じ距離になる）
+
+使い方：
+    python src/frontier_agent.py <迷路ファイル> [移動履歴の出力ファイル]
+"""
+
+import os
+import sys
+import time
+import random
+from heapq import heappush, heappop
+
+from agent import MazeAgent
+from corpus import load_maze, find_start
+from distance_field import NEIGHBOR_DELTAS
+
+INF = float('inf')
+
+
+class FrontierAgent(MazeAgent):
+    """いちばん近い探索の前線へ向かい続けるエージェント"""
+
+    def __init__(self, maze_file, start=None, goal=None, timing=None, seed=None, incremental=True):
+        """
+        maze_file   : 迷路ファイルのパス
+        start       : スタート位置．省略時は迷路の '5' のマス
+        goal        : 探索の後に戻る位置．省略時はスタート
+        timing      : 移動・待機時間のモデル（ThinkTimeModel）．省略時は既定値
+        seed        : 記録用の乱数の種（選択は決定的）
+        incremental : False なら距離の場を持たず、毎歩ダイクストラ法で最も近い前線を探す
+        """
+        if start is None:
+            start = find_start(load_maze(maze_file))
+        super().__init__(maze_file, [], start, goal if goal is not None else start, timing=timing, seed=seed)
+        self.incremental = incremental
+        n = self.rows * self.cols
+        self.enter_cost = [int(c) if c.isdigit() else -1 for row in self.maze for c in row]
+        # 重み = コスト × scale + ステップ数（(コスト, ステップ数) の辞書式順序を 1 つの数で表す）
+        self.scale = n + 1
+        self.neighbors = [[] for _ in range(n)]
+        for cell, cost in enumerate(self.enter_cost):
+            if cost < 0:
+                continue
+            r, c = divmod(cell, self.cols)
+            for dr, dc in NEIGHBOR_DELTAS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < self.rows and 0 <= nc < self.cols and self.enter_cost[nr * self.cols + nc] >= 0:
+                    self.neighbors[cell].append(nr * self.cols + nc)
+        self.move_names = {dr * self.cols + dc: name for name, (dr, dc) in
+                           zip(['up', 'down', 'left', 'right'], NEIGHBOR_DELTAS)}
+
+    def _reset_frontier(self):
+        n = self.rows * self.cols
+        self.explored = [False] * n
+        self.frontier = set()
+        self.dist = [INF] * n    # 探索済みのマスから最も近い前線までの重み
+        self.succ = [-1] * n     # そのときの次のマス
+        self.n_relaxed = 0       # 距離を更新した回数（差分更新の手間の目安）
+
+    def _weight(self, v):
+        """隣のマス v に入る重み"""
+        return self.enter_cost[v] * self.scale + 1
+
+    def mark_explored(self, pos):
+        """MazeAgent.mark_explored と同じマスを探索済みにし、前線と距離の場を差分で更新する"""
+        super().mark_explored(pos)
+        x, y = pos
+        cells = [x * self.cols + y]
+        for dx, dy in NEIGHBOR_DELTAS:
+            nx, ny = x + dx, y + dy
+            while 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny].isdigit():
+                cells.append(nx * self.cols + ny)
+                nx += dx
+                ny += dy
+        new_cells = [c for c in dict.fromkeys(cells) if not self.explored[c]]
+        if not new_cells:
+            return
+        for c in new_cells:
+            self.explored[c] = True
+        # 前線の変化：新しく見えたマスとその隣だけ調べ直す
+        added, removed = [], []
+        check = set(new_cells)
+        for c in new_cells:
+            check.update(v for v in self.neighbors[c] if self.explored[v])
+        for c in check:
+            is_frontier = any(not self.explored[v] for v in self.neighbors[c])
+            if is_frontier and c not in self.frontier:
+                self.frontier.add(c)
+                added.append(c)
+            elif not is_frontier and c in self.frontier:
+                self.frontier.discard(c)
+                removed.append(c)
+        if self.incremental:
+            self._update_field(added, removed, new_cells)
+
+    def _update_field(self, added, removed, new_cells):
+        """前線の追加・削除と新しく見えたマスに合わせて、距離の場を影響のあるマスだけ直す"""
+        dist, succ = self.dist, self.succ
+        # 外れた前線へ向かっていたマス（最短経路木の部分木）の距離を捨てる
+        invalid = list(removed)
+        for c in removed:
+            dist[c] = INF
+            succ[c] = -1
+        i = 0
+        while i < len(invalid):
+            v = invalid[i]
+            i += 1
+            for u in self.neighbors[v]:
+                if succ[u] == v:
+                    dist[u] = INF
+                    succ[u] = -1
+                    invalid.append(u)
+        heap = []
+        for c in added:
+            dist[c] = 0
+            succ[c] = -1
+            heappush(heap, (0, c))
+        # 距離を捨てたマス・新しく見えたマスは、部分木の外の探索済みの隣から緩和し直す
+        for u in invalid + new_cells:
+            if not self.explored[u] or dist[u] == 0:
+                continue
+            for v in self.neighbors[u]:
+                if self.explored[v] and dist[v] < INF:
+                    d = dist[v] + self._weight(v)
+                    if d < dist[u]:
+                        dist[u] = d
+                        succ[u] = v
+            if dist[u] < INF:
+                heappush(heap, (dist[u], u))
+        while heap:
+            d, v = heappop(heap)
+            if d > dist[v]:
+                continue
+            self.n_relaxed += 1
+            w = self._weight(v)
+            for u in self.neighbors[v]:
+                if self.explored[u] and d + w < dist[u]:
+                    dist[u] = d + w
+                    succ[u] = v
+                    heappush(heap, (d + w, u))
+
+    def _search_step(self, cell):
+        """cell から最も近い前線までダイクストラ法で探し、(重み, 次のマス) を返す（incremental=False 用）"""
+        best = {cell: 0}
+        first = {cell: -1}
+        heap = [(0, cell)]
+        while heap:
+            d, v = heappop(heap)
+            if d > best[v]:
+                continue
+            self.n_relaxed += 1
+            if v in self.frontier:
+                return d, first[v]
+            for u in self.neighbors[v]:
+                if self.explored[u]:
+                    nd = d + self._weight(u)
+                    if u not in best or nd < best[u]:
+                        best[u] = nd
+                        first[u] = u if v == cell else first[v]
+                        heappush(heap, (nd, u))
+        return INF, -1
+
+    def next_step(self):
+        """いま居るマスから最も近い前線へ向かう次のマス（前線が無ければ -1）"""
+        cell = self.current_pos[0] * self.cols + self.current_pos[1]
+        if not self.frontier:
+            return -1
+        if self.incremental:
+            return self.succ[cell]
+        return self._search_step(cell)[1]
+
+    def run(self):
+        """前線が無くなるまで最も近い前線へ向かい、最後にゴールへ戻る"""
+        self.rng = random.Random(self.seed)
+        self.current_pos = self.start
+        self.sim_time = 0
+        self.move_history = []
+        self.visit_order = []
+        self.total_cost = 0
+        self.visited = set()
+        self._reset_frontier()
+        self.mark_explored(self.current_pos)
+
+        steps = cost = 0
+        while self.frontier:
+            nxt = self.next_step()
+            if nxt < 0:
+                break  # 前線へ到達できない
+            cell = self.current_pos[0] * self.cols + self.current_pos[1]
+            arrived = nxt in self.frontier
+            self.simulate_path([self.move_names[nxt - cell]], self.enter_cost[nxt], 1, wait_after=False)
+            steps += 1
+            cost += self.enter_cost[nxt]
+            if arrived:
+                # 前線のマスに着いたら 1 区間とする
+                self.sim_time += round(self.timing.leg_wait(steps, cost))
+                self.visit_order.append(self.current_pos)
+                self.total_cost += cost
+                steps = cost = 0
+        self.total_cost += cost
+
+        path, steps, cost = self.bfs_path(self.current_pos, self.goal)
+        if path is None:
+            print("ゴールへ到達できませんでした．")
+            return
+        self.sim_time += round(self.timing.goal_wait(steps, cost))
+        self.simulate_path(path, cost, steps, wait_after=False)
+        self.total_cost += cost
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python frontier_agent.py <maze_file> [history_file]")
+        sys.exit(1)
+    maze_file = sys.argv[1]
+    history_file = sys.argv[2] if len(sys.argv) > 2 else None
+
+    for incremental in (True, False):
+        agent = FrontierAgent(maze_file, incremental=incremental)
+        t0 = time.perf_counter()
+        agent.run()
+        elapsed = time.perf_counter() - t0
+        n_open = sum(c.isdigit() for row in agent.maze for c in row)
+        name = "差分更新" if incremental else "毎歩探索"
+        print(f"{name}: {elapsed * 1000:.1f} ms, {len(agent.move_history)} 手, 総コスト {agent.total_cost}, "
+              f"{len(agent.visit_order)} 区間, 探索済み {len(agent.visited)}/{n_open}, 緩和 {agent.n_relaxed} 回")
+        if incremental and history_file:
+            directory = os.path.dirname(history_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            agent.save_move_history(history_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,14 @@
-import pygame
-import random
 import time
 import sys
-import os
 from pathlib import Path
 
-# Pygameの初期化
-pygame.init()
+from seeding import make_rng, record_seed
+from maze_core import MazeCore, get_pygame, generate_unique_filename, generate_game_maze, BLACK
 
-# 色の定義
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-YELLOW = (255, 255, 0)
-RED = (255, 0, 0)
-CYAN = (0, 255, 255)
-GRAY = (192, 192, 192)
-
-# マス目のサイズ
-TILE_SIZE = 40
-
-def generate_unique_filename(directory, filename):
-    """重複を避けるためのファイル名生成"""
-    os.makedirs(directory, exist_ok=True)  # ディレクトリが無ければ作成
-    base, ext = os.path.splitext(filename)
-    counter = 1
-    new_filename = os.path.join(directory, f"{base}{ext}")
-    while os.path.exists(new_filename):
-        new_filename = os.path.join(directory, f"{base}_{counter}{ext}")
-        counter += 1
-    return new_filename
-
-class MazeGame:
-    def __init__(self, maze_file=None):
+class MazeGame(MazeCore):
+    def __init__(self, maze_file=None, seed=None):
+        # 迷路生成用の乱数（seed は生成した迷路とともに記録する）
+        self.seed, self.rng = make_rng(seed)
         if maze_file and Path(maze_file).is_file():
             self.load_maze(maze_file)
         else:
@@ -40,52 +17,13 @@ class MazeGame:
             generated_filename = self.save_maze("generated_maze.txt")
             self.load_maze(generated_filename)
 
-        self.player_position = self.start
-        self.visited = set()  # 探索済みマスを記録
+        self.reset_player()
         self.move_history = []  # 移動履歴
         self.start_time_ms = int(time.time() * 1000)  # 記録開始時間（エポックミリ秒）
-        self.total_cost = 0  # 総コストの初期化
-        self.mark_explored()
-
-        # フォントの初期化
-        self.font = pygame.font.Font(None, 24)
-
-    def load_maze(self, maze_file):
-        with open(maze_file, 'r') as f:
-            self.maze = [list(line.strip()) for line in f.readlines()]
-        self.rows = len(self.maze)
-        self.cols = len(self.maze[0])
-        self.start = self.find_start()
-
-    def find_start(self):
-        for i, row in enumerate(self.maze):
-            for j, cell in enumerate(row):
-                if cell.isdigit() and cell == '5':  # '5' をスタート地点とする
-                    return (i, j)
-        raise ValueError("Start position not found in the maze file.")
 
     def generate_random_maze(self):
-        N = 9 * 2 - 1
-        self.maze = [['#' for _ in range(N)] for _ in range(N)]
-        K = random.randint(N, 2*N)
-
-        for _ in range(K):
-            d = random.randint(0, 1)
-            i = random.randint(0, (N - 1) // 2) * 2
-            j = random.randint(0, N - 1)
-            h = random.randint(3, 10)
-            w = str(random.randint(5, 9))
-
-            for k in range(max(j - h, 0), min(j + h, N - 1) + 1):
-                if d == 0:
-                    self.maze[i][k] = w
-                else:
-                    self.maze[k][i] = w
-
-        # スタート地点を設定
-        valid_positions = [(i, j) for i in range(N) for j in range(N) if self.maze[i][j].isdigit()]
-        self.start = random.choice(valid_positions)
-        self.maze[self.start[0]][self.start[1]] = '5'  # スタート地点を '5' に設定
+        """ランダムな迷路を生成し、スタート地点を '5' にする（保存は save_maze）"""
+        self.maze, self.start = generate_game_maze(self.rng)
 
     def save_maze(self, filename):
         """迷路を保存"""
@@ -94,43 +32,17 @@ class MazeGame:
         with open(filename, 'w') as f:
             for row in self.maze:
                 f.write(''.join(row) + '\n')
-        print(f"Generated maze saved to {filename}.")
+        record_seed(filename, self.seed, "MazeGame.generate_random_maze")
+        print(f"Generated maze saved to {filename} (seed={self.seed}).")
         return filename
 
-    def mark_explored(self):
-        """現在のマスから縦横に伸びるマスを探索済みにする"""
-        x, y = self.player_position
-        self.visited.add((x, y))
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            while 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny].isdigit():
-                self.visited.add((nx, ny))
-                nx += dx
-                ny += dy
-
     def move(self, direction):
-        x, y = self.player_position
-        new_position = {
-            'up': (x - 1, y),
-            'left': (x, y - 1),
-            'down': (x + 1, y),
-            'right': (x, y + 1)
-        }.get(direction, (x, y))
-
-        nx, ny = new_position
-        if 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny] != '#':
+        """移動できる場合は移動履歴に時刻を記録してから移動する"""
+        if self.target(direction) is not None:
             # 現在のエポックミリ秒を記録
             current_time_ms = int(time.time() * 1000)
             self.move_history.append((direction, current_time_ms))
-
-            # 移動コストを加算
-            cost = int(self.maze[nx][ny]) if self.maze[nx][ny].isdigit() else 0
-            self.total_cost += cost
-            print(f"Moved {direction}. Cost: {cost}, Total Cost: {self.total_cost}")
-
-            # プレイヤーを移動
-            self.player_position = new_position
-            self.mark_explored()
+        return super().move(direction)
 
     def save_history(self, filename):
         """移動履歴を保存"""
@@ -142,45 +54,12 @@ class MazeGame:
                 f.write(f'{direction} {timestamp_ms}\n')
         print(f"Move history saved to {filename}.")
 
-    
-    def is_goal_reached(self):
-        """ゴール条件をチェック"""
-        total_cells = sum(1 for row in self.maze for cell in row if cell.isdigit())
-        return self.player_position == self.start and len(self.visited) == total_cells
-
-    def draw_maze(self, screen):
-        """迷路を描画"""
-        for i, row in enumerate(self.maze):
-            for j, cell in enumerate(row):
-                x = j * TILE_SIZE
-                y = i * TILE_SIZE
-
-                # 背景色を決定
-                if (i, j) == self.start:
-                    color = RED  # ゴールは赤
-                elif (i, j) == self.player_position:
-                    color = YELLOW  # プレイヤーは黄色
-                elif (i, j) in self.visited:
-                    color = GRAY  # 探索済みマスは灰色
-                elif cell.isdigit():
-                    color = CYAN  # 未探索マスは青
-                else:
-                    color = BLACK  # 障害物は黒
-
-                # マスを描画
-                pygame.draw.rect(screen, color, (x, y, TILE_SIZE, TILE_SIZE))
-                pygame.draw.rect(screen, WHITE, (x, y, TILE_SIZE, TILE_SIZE), 1)
-
-                # 移動コストを表示
-                if cell.isdigit():
-                    text = self.font.render(cell, True, WHITE if color == CYAN else BLACK)
-                    text_rect = text.get_rect(center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
-                    screen.blit(text, text_rect)
-
     def play(self):
         """ゲームループ"""
-        screen_width = self.cols * TILE_SIZE
-        screen_height = self.rows * TILE_SIZE
+        pygame = get_pygame()
+        self.init_rendering()
+        screen_width = self.viewport.width
+        screen_height = self.viewport.height
         screen = pygame.display.set_mode((screen_width, screen_height))
         pygame.display.set_caption("Maze Game")
 
@@ -201,6 +80,8 @@ class MazeGame:
                         self.move('left')
                     elif event.key == pygame.K_RIGHT:
                         self.move('right')
+                    else:
+                        self.viewport.handle_key(event.key)
 
             # ゴール達成のチェック
             if self.is_goal_reached():
@@ -219,5 +100,6 @@ class MazeGame:
 
 if __name__ == '__main__':
     maze_file = sys.argv[1] if len(sys.argv) > 1 else None
-    game = MazeGame(maze_file)
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    game = MazeGame(maze_file, seed)
     game.play()
@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+hierarchical_planner.py
+
+「先にエリアの順番を決め、エリアの中で局所的な目標を決める」（note.txt の大体の計画とローカルな計画）
+という人間の計画の仕方をまねた、HPA* 風の階層的な計画器とエージェント．
+
+【抽象グラフ（AbstractGraph）】
+- 迷路を region_size × region_size のエリアに分ける
+- 隣り合うエリアの境界で、両側が数字マスになっている区間ごとに、その中央の 1 組のマスを入口とする
+- 同じエリアの入口同士は、エリアの中だけを通る最短路のコストで結ぶ（エリアごとのダイクストラ法）．
+  境界をまたぐ入口の組は 1 歩（移動先のマスのコスト）で結ぶ
+- 入口とそのコストは迷路の内容のハッシュとエリアの大きさごとにリポジトリ直下の exp_data/cache/hpa/ に保存し、2回目以降は読み込むだけにする
+
+【経路（route）】
+始点・終点をそれぞれのエリアの入口につないで抽象グラフ上でダイクストラ法を行い、
+得られた入口の列をエリアの中の最短路で具体的な経路に直す（同じエリアなら、エリアの中だけを通る経路とも比べる）．
+HPA* と同じく、最短路に近い経路を返す（最短とは限らない）．
+
+【エージェント（HierarchicalAgent）】
+1. スタートから到達できる数字マスを含むエリアについて、代表のマス同士の抽象グラフ上のコストを求め、
+   スタートのエリアから出発して戻ってくる巡回順を最近傍法 + 2-opt で決める
+2. 巡回順に、エリアの中のまだ探索済みでないマスのうち近いものを局所的な目標にして移動する．
+   移動は 1 マスずつで、MazeAgent.mark_explored と同じく上下左右に見える通路を探索済みにし、
+   目標が途中で見えたらそこで止まる．エリアの全てのマスが探索済みになったら次のエリアへ進む
+3. 最後にスタート（＝ゴール）へ戻る
+時間消費は MazeAgent と同じ ThinkTimeModel（1 マスの移動、局所的な目標ごとの待機、ゴール前の待機）．
+移動履歴は MazeAgent と同じ形式（"_ 0" に続けて "方向 時刻"）で書き出し、人間の移動履歴と比べられる．
+
+使い方：
+    python src/hierarchical_planner.py <迷路ファイル> [エリアの大きさ] [移動履歴の出力ファイル]
+    python src/hierarchical_planner.py corpus [exp_data ディレクトリ] [エリアの大きさ]
+        # exp_data の各迷路で計画し、hpa/hpa_move_history_N.txt に保存して人間の履歴と比べる
+"""
+
+import os
+import sys
+import time
+from heapq import heappush, heappop
+
+import numpy as np
+
+from corpus import (load_maze, find_start, load_move_history, reconstruct_positions, iter_corpus,
+                    DIRECTIONS, DELTAS)
+from distance_field import CACHE_ROOT, maze_to_cost_grid, maze_hash, NEIGHBOR_DELTAS
+from think_time_model import ThinkTimeModel
+
+HPA_CACHE_DIR = os.path.join(CACHE_ROOT, "hpa")
+INF = float('inf')
+
+
+def default_region_size(rows, cols):
+    """迷路の大きさに応じたエリアの大きさ（17×17 で 6、129×129 で 16 程度）"""
+    return max(6, int(round(max(rows, cols) / 8)))
+
+
+class AbstractGraph:
+    """エリア分割と、入口同士を結ぶ抽象グラフ"""
+
+    def __init__(self, maze, region_size=None, cache_dir=HPA_CACHE_DIR):
+        self.maze = maze
+        self.cost_grid = maze_to_cost_grid(maze)
+        self.rows, self.cols = self.cost_grid.shape
+        self.size = region_size if region_size is not None else default_region_size(self.rows, self.cols)
+        self.region_cols = (self.cols + self.size - 1) // self.size
+        self.n_regions = ((self.rows + self.size - 1) // self.size) * self.region_cols
+        # Python のリストにしておく（ダイクストラ法の内側で NumPy のスカラーを作らない）
+        self.cell_cost = self.cost_grid.ravel().tolist()
+        r, c = np.divmod(np.arange(self.rows * self.cols), self.cols)
+        self.region_of = ((r // self.size) * self.region_cols + c // self.size).tolist()
+        self.neighbor_list = self._neighbors()
+
+        cache_file = None
+        if cache_dir is not None:
+            cache_file = os.path.join(cache_dir, f"{maze_hash(maze)}_r{self.size}.npz")
+        if cache_file is not None and os.path.isfile(cache_file):
+            data = np.load(cache_file)
+            nodes, src, dst, cost = data['nodes'], data['src'], data['dst'], data['cost']
+        else:
+            nodes, src, dst, cost = self._build()
+            if cache_file is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.savez(cache_file, nodes=nodes, src=src, dst=dst, cost=cost)
+        self.nodes = nodes.tolist()
+        self.node_set = set(self.nodes)
+        self.edges = {v: [] for v in self.nodes}
+        for u, v, w in zip(src.tolist(), dst.tolist(), cost.tolist()):
+            self.edges[u].append((v, w))
+        self.region_nodes = {}
+        for v in self.nodes:
+            self.region_nodes.setdefault(self.region_of[v], []).append(v)
+        self._path_cache = {}
+
+    def _neighbors(self):
+        """各セルの隣の数字マス（数字マスでないセルは空）"""
+        result = []
+        for s in range(self.rows * self.cols):
+            if self.cell_cost[s] < 0:
+                result.append(())
+                continue
+            r, c = divmod(s, self.cols)
+            result.append(tuple(nr * self.cols + nc for dr, dc in NEIGHBOR_DELTAS
+                                for nr, nc in [(r + dr, c + dc)]
+                                if 0 <= nr < self.rows and 0 <= nc < self.cols and self.cell_cost[nr * self.cols + nc] >= 0))
+        return result
+
+    def _build(self):
+        """入口と、入口同士の辺（src, dst, cost）を求める"""
+        grid = self.cost_grid
+        size = self.size
+        pairs = []
+        # 横の境界（上のエリアの最下行と下のエリアの最上行）と縦の境界
+        for boundary in range(size, self.rows, size):
+            open_both = (grid[boundary - 1] >= 0) & (grid[boundary] >= 0)
+            for lo, hi in self._runs(open_both, size):
+                mid = (lo + hi) // 2
+                pairs.append(((boundary - 1) * self.cols + mid, boundary * self.cols + mid))
+        for boundary in range(size, self.cols, size):
+            open_both = (grid[:, boundary - 1] >= 0) & (grid[:, boundary] >= 0)
+            for lo, hi in self._runs(open_both, size):
+                mid = (lo + hi) // 2
+                pairs.append((mid * self.cols + boundary - 1, mid * self.cols + boundary))
+
+        nodes = sorted({v for pair in pairs for v in pair})
+        src, dst, cost = [], [], []
+        for a, b in pairs:
+            src += [a, b]
+            dst += [b, a]
+            cost += [self.cell_cost[b], self.cell_cost[a]]
+        by_region = {}
+        for v in nodes:
+            by_region.setdefault(self.region_of[v], []).append(v)
+        for members in by_region.values():
+            for a in members:
+                dist, _ = self.local_search(a, members)
+                for b in members:
+                    if b != a and b in dist:
+                        src.append(a)
+                        dst.append(b)
+                        cost.append(dist[b][0])
+        return (np.array(nodes, dtype=np.int64), np.array(src, dtype=np.int64),
+                np.array(dst, dtype=np.int64), np.array(cost, dtype=np.int64))
+
+    @staticmethod
+    def _runs(mask, size):
+        """mask が True の連続区間 [lo, hi] を、エリアの境目で区切って返す"""
+        runs = []
+        lo = None
+        for i, value in enumerate(mask.tolist() + [False]):
+            if value and lo is not None and i % size == 0:
+                runs.append((lo, i - 1))
+                lo = i
+            elif value and lo is None:
+                lo = i
+            elif not value and lo is not None:
+                runs.append((lo, i - 1))
+                lo = None
+        return runs
+
+    def local_search(self, source, targets=None, region=None):
+        """
+        source から、source と同じエリア（region を指定すればそのエリア）の中だけを通るダイクストラ法
+        targets を指定すれば、全て見つかった時点で止める
+
+        戻り値：
+            dist   : {セル: (コスト, ステップ数)}
+            parent : {セル: 1つ前のセル}
+        """
+        region = self.region_of[source] if region is None else region
+        region_of = self.region_of
+        cell_cost = self.cell_cost
+        remaining = set(targets) if targets is not None else None
+        dist = {source: (0, 0)}
+        parent = {}
+        heap = [(0, 0, source)]
+        while heap:
+            d, s, v = heappop(heap)
+            if dist[v] < (d, s):
+                continue
+            if remaining is not None:
+                remaining.discard(v)
+                if not remaining:
+                    break
+            for u in self.neighbor_list[v]:
+                if region_of[u] != region:
+                    continue
+                cand = (d + cell_cost[u], s + 1)
+                if u not in dist or cand < dist[u]:
+                    dist[u] = cand
+                    parent[u] = v
+                    heappush(heap, (cand[0], cand[1], u))
+        return dist, parent
+
+    @staticmethod
+    def _trace(parent, source, target):
+        cells = [target]
+        while cells[-1] != source:
+            cells.append(parent[cells[-1]])
+        cells.reverse()
+        return cells
+
+    def local_path(self, a, b):
+        """同じエリアの a から b へ、エリアの中だけを通る経路のセルの列（a, b を含む．無ければ None）"""
+        key = (a, b)
+        if key not in self._path_cache:
+            dist, parent = self.local_search(a, [b])
+            self._path_cache[key] = self._trace(parent, a, b) if b in dist else None
+        return self._path_cache[key]
+
+    def _entrance_costs(self, cell, reverse=False):
+        """
+        cell からエリアの入口へのコスト {入口: コスト}（reverse=True なら入口から cell へのコスト）
+        移動先のマスのコストを足すので、逆向きは「入口→cell」= 「cell→入口」− 入口のコスト ＋ cell のコスト
+        """
+        members = self.region_nodes.get(self.region_of[cell], [])
+        if not members:
+            return {}
+        dist, _ = self.local_search(cell, members)
+        costs = {}
+        for v in members:
+            if v in dist:
+                d = dist[v][0]
+                costs[v] = d - self.cell_cost[v] + self.cell_cost[cell] if reverse else d
+        return costs
+
+    def abstract_search(self, sources, goal_costs=None):
+        """
+        抽象グラフ上のダイクストラ法．sources は {入口: 初期コスト}
+        goal_costs（{入口: そこから終点までのコスト}）を指定すれば、終点までのコストが確定した時点で止める
+
+        戻り値：
+            dist   : {入口: コスト}
+            parent : {入口: 1つ前の入口}
+        """
+        dist = dict(sources)
+        parent = {}
+        heap = [(d, v) for v, d in sources.items()]
+        heap.sort()
+        best_goal = INF
+        while heap:
+            d, v = heappop(heap)
+            if d > dist.get(v, INF):
+                continue
+            if goal_costs is not None:
+                if d >= best_goal:
+                    break
+                if v in goal_costs:
+                    best_goal = min(best_goal, d + goal_costs[v])
+            for u, w in self.edges[v]:
+                nd = d + w
+                if nd < dist.get(u, INF):
+                    dist[u] = nd
+                    parent[u] = v
+                    heappush(heap, (nd, u))
+        return dist, parent
+
+    def route_cells(self, a, b):
+        """a から b への経路のセルの列（a, b を含む）とコストを返す（到達不能なら (None, None)）"""
+        if a == b:
+            return [a], 0
+        best_cells, best_cost = None, INF
+        if self.region_of[a] == self.region_of[b]:
+            local = self.local_path(a, b)
+            if local is not None:
+                best_cells, best_cost = local, sum(self.cell_cost[v] for v in local[1:])
+        sources = self._entrance_costs(a)
+        goal_costs = self._entrance_costs(b, reverse=True)
+        if sources and goal_costs:
+            dist, parent = self.abstract_search(sources, goal_costs)
+            end, end_cost = None, INF
+            for v, c in goal_costs.items():
+                if v in dist and dist[v] + c < end_cost:
+                    end, end_cost = v, dist[v] + c
+            if end is not None and end_cost < best_cost:
+                entrances = [end]
+                while entrances[-1] in parent:
+                    entrances.append(parent[entrances[-1]])
+                entrances.reverse()
+                cells = list(self.local_path(a, entrances[0]))
+                for u, v in zip(entrances, entrances[1:]):
+                    if self.region_of[u] == self.region_of[v]:
+                        cells += self.local_path(u, v)[1:]
+                    else:
+                        cells.append(v)
+                cells += self.local_path(entrances[-1], b)[1:]
+                best_cells, best_cost = cells, end_cost
+        if best_cells is None:
+            return None, None
+        return best_cells, best_cost
+
+    def route(self, a, b):
+        """
+        a から b への経路を MazeAgent.bfs_path と同じ形式で返す（a, b は (row, col)）
+
+        戻り値：
+            (path, steps, cost)．到達不能の場合は (None, None, None)
+        """
+        cells, cost = self.route_cells(a[0] * self.cols + a[1], b[0] * self.cols + b[1])
+        if cells is None:
+            return None, None, None
+        path = cells_to_moves(cells, self.cols)
+        return path, len(path), cost
+
+
+def cells_to_moves(cells, cols):
+    """隣り合うセルの列を移動方向のリストにする"""
+    names = {dr * cols + dc: name for name, (dr, dc) in zip(DIRECTIONS, NEIGHBOR_DELTAS)}
+    return [names[b - a] for a, b in zip(cells, cells[1:])]
+
+
+def solve_tour(cost, first=0):
+    """
+    コスト行列 cost の巡回路（first から出発して first に戻る）を最近傍法で作り、2-opt で改善する
+
+    戻り値：
+        訪れる順番（first から始まり、first は最後に含めない）
+    """
+    n = len(cost)
+    if n <= 2:
+        return [first] + [i for i in range(n) if i != first]
+    order = [first]
+    unvisited = set(range(n)) - {first}
+    while unvisited:
+        last = order[-1]
+        nxt = min(unvisited, key=lambda j: (cost[last, j], j))
+        order.append(nxt)
+        unvisited.remove(nxt)
+    # 2-opt（order[i..j] を反転する．コスト行列が非対称でも辺の向きを入れ替えた分を計算する）
+    sym = (cost + cost.T) / 2.0
+    improved = True
+    while improved:
+        improved = False
+        tour = np.array(order + [first])
+        for i in range(1, n - 1):
+            a, b = tour[i - 1], tour[i]
+            c, d = tour[i + 1:n], tour[i + 2:n + 1]
+            delta = sym[a, c] + sym[b, d] - sym[a, b] - sym[c, d]
+            if len(delta) and delta.min() < -1e-9:
+                j = i + 1 + int(delta.argmin())
+                order[i:j + 1] = order[i:j + 1][::-1]
+                improved = True
+                break
+    return order
+
+
+class HierarchicalAgent:
+    """エリアの巡回順を決めてから、エリアの中の局所的な目標を順に回るエージェント"""
+
+    def __init__(self, maze_file, start=None, region_size=None, timing=None, cache_dir=HPA_CACHE_DIR):
+        self.maze_file = maze_file
+        self.maze = load_maze(maze_file)
+        self.start = start if start is not None else find_start(self.maze)
+        self.timing = timing if timing is not None else ThinkTimeModel()
+        t0 = time.perf_counter()
+        self.graph = AbstractGraph(self.maze, region_size, cache_dir)
+        self.build_time = time.perf_counter() - t0
+        self.rows, self.cols = self.graph.rows, self.graph.cols
+        self.move_names = {dr * self.cols + dc: name for name, (dr, dc) in zip(DIRECTIONS, NEIGHBOR_DELTAS)}
+
+    def _reachable(self, source):
+        """source から到達できるセルの集合"""
+        seen = {source}
+        stack = [source]
+        while stack:
+            v = stack.pop()
+            for u in self.graph.neighbor_list[v]:
+                if u not in seen:
+                    seen.add(u)
+                    stack.append(u)
+        return seen
+
+    def plan_regions(self):
+        """
+        エリアの巡回順を決める
+
+        戻り値：
+            [エリア番号, …]（スタートのエリアから始まる）
+        """
+        graph = self.graph
+        start = self.start[0] * self.cols + self.start[1]
+        self.targets = {}
+        for v in self._reachable(start):
+            self.targets.setdefault(graph.region_of[v], []).append(v)
+        regions = sorted(self.targets)
+        # 代表のマス：エリアの中心に最も近いマス（スタートのエリアはスタート）
+        reps = []
+        for region in regions:
+            if region == graph.region_of[start]:
+                reps.append(start)
+                continue
+            rr, rc = divmod(region, graph.region_cols)
+            center = ((rr + 0.5) * graph.size, (rc + 0.5) * graph.size)
+            reps.append(min(self.targets[region],
+                            key=lambda v: (abs(v // self.cols - center[0]) + abs(v % self.cols - center[1]), v)))
+        # 代表のマス同士のコスト（抽象グラフ上）
+        n = len(regions)
+        cost = np.zeros((n, n))
+        into = [graph._entrance_costs(rep, reverse=True) for rep in reps]
+        for i, rep in enumerate(reps):
+            dist, _ = graph.abstract_search(graph._entrance_costs(rep))
+            for j in range(n):
+                if i == j:
+                    continue
+                best = min((dist[v] + c for v, c in into[j].items() if v in dist), default=INF)
+                cost[i, j] = best if best < INF else 1e9
+        first = regions.index(graph.region_of[start])
+        self.region_order = [regions[i] for i in solve_tour(cost, first)]
+        return self.region_order
+
+    def _mark(self, cell):
+        """cell から上下左右に見える通路を探索済みにする"""
+        r, c = divmod(cell, self.cols)
+        self.visited.add(cell)
+        for dr, dc in NEIGHBOR_DELTAS:
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < self.rows and 0 <= nc < self.cols and self.graph.cell_cost[nr * self.cols + nc] >= 0:
+                self.visited.add(nr * self.cols + nc)
+                nr += dr
+                nc += dc
+
+    def _walk(self, cells, target=None):
+        """cells（現在地を先頭に含む）に沿って移動する．target が見えた時点で止める．(steps, cost) を返す"""
+        steps = cost = 0
+        for a, b in zip(cells, cells[1:]):
+            move = self.move_names[b - a]
+            prev_move = self.move_history[-1][0] if self.move_history else None
+            self.sim_time += round(self.timing.move_time(move, prev_move))
+            self.move_history.append((move, self.sim_time))
+            self.current = b
+            steps += 1
+            cost += self.graph.cell_cost[b]
+            self._mark(b)
+            if target is not None and target in self.visited:
+                break
+        self.total_cost += cost
+        return steps, cost
+
+    def _next_target(self, region):
+        """エリアの中のまだ探索済みでないマスのうち、現在地から近いものと、そこへの経路のセルの列"""
+        graph = self.graph
+        remaining = [v for v in self.targets[region] if v not in self.visited]
+        if not remaining:
+            return None, None
+        if graph.region_of[self.current] == region:
+            dist, parent = graph.local_search(self.current)
+            inside = [v for v in remaining if v in dist]
+            if inside:
+                target = min(inside, key=lambda v: (dist[v], v))
+                return target, graph._trace(parent, self.current, target)
+        # エリアの外にいる（またはエリアの中で行き止まり）ので、近いマスへ抽象グラフで向かう
+        r, c = divmod(self.current, self.cols)
+        target = min(remaining, key=lambda v: (abs(v // self.cols - r) + abs(v % self.cols - c), v))
+        cells, _ = graph.route_cells(self.current, target)
+        return target, cells
+
+    def run(self):
+        """計画して巡回し、移動履歴を self.move_history に残す"""
+        t0 = time.perf_counter()
+        start = self.start[0] * self.cols + self.start[1]
+        self.current = start
+        self.sim_time = 0
+        self.total_cost = 0
+        self.move_history = []
+        self.visited = set()
+        self.n_legs = 0
+        self._mark(start)
+        for region in self.plan_regions():
+            while True:
+                target, cells = self._next_target(region)
+                if target is None:
+                    break
+                if cells is None:
+                    # 到達できない（起こらないはず）ので、このマスは諦める
+                    self.visited.add(target)
+                    continue
+                steps, cost = self._walk(cells, target)
+                self.sim_time += round(self.timing.leg_wait(steps, cost))
+                self.n_legs += 1
+        # スタート（ゴール）へ戻る
+        cells, cost = self.graph.route_cells(self.current, start)
+        if cells is not None and len(cells) > 1:
+            self.sim_time += round(self.timing.goal_wait(len(cells) - 1, cost))
+            self._walk(cells)
+        self.plan_time = time.perf_counter() - t0
+        self.coverage = len(self.visited) / sum(len(v) for v in self.targets.values())
+
+    def save_move_history(self, filename):
+        """移動履歴を MazeAgent.save_move_history と同じ形式で保存する"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write("_ 0\n")
+            for move, t in self.move_history:
+                f.write(f"{move} {t}\n")
+        print(f"移動履歴を {filename} に保存しました．")
+
+
+def history_stats(maze, codes):
+    """
+    移動の列（方向コード）から、総コスト・移動数・探索済みにしたマスの割合（スタートから到達できるマスに対して）を求める
+    """
+    start = find_start(maze)
+    positions = reconstruct_positions(start, codes)
+    cells = [start] + [tuple(p + DELTAS[d]) for p, d in zip(positions, codes)]
+    graph_cost = maze_to_cost_grid(maze)
+    rows, cols = graph_cost.shape
+    cost = int(sum(graph_cost[r, c] for r, c in cells[1:]))
+    seen = set()
+    for r, c in cells:
+        seen.add((r, c))
+        for dr, dc in NEIGHBOR_DELTAS:
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < rows and 0 <= nc < cols and graph_cost[nr, nc] >= 0:
+                seen.add((nr, nc))
+                nr += dr
+                nc += dc
+    reachable = {start}
+    stack = [start]
+    while stack:
+        r, c = stack.pop()
+        for dr, dc in NEIGHBOR_DELTAS:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols and graph_cost[nr, nc] >= 0 and (nr, nc) not in reachable:
+                reachable.add((nr, nc))
+                stack.append((nr, nc))
+    return {'cost': cost, 'moves': len(codes), 'coverage': len(seen & reachable) / len(reachable)}
+
+
+def run_corpus(data_dir="exp_data", region_size=None):
+    """
+    exp_data の各迷路で計画し、data_dir/hpa/hpa_move_history_N.txt に保存して人間の履歴と比べる
+    （move_history には書き込まない．人間の履歴を集める解析に混ざらないようにするため）
+    """
+    out_dir = os.path.join(data_dir, "hpa")
+    os.makedirs(out_dir, exist_ok=True)
+    rows = []
+    for maze_file, history_file in iter_corpus(data_dir):
+        agent = HierarchicalAgent(maze_file, region_size=region_size)
+        agent.run()
+        out = os.path.join(out_dir, "hpa_" + os.path.basename(history_file))
+        agent.save_move_history(out)
+        _, codes, _ = load_move_history(history_file)
+        human = history_stats(agent.maze, codes)
+        hpa = history_stats(agent.maze, np.array([DIRECTIONS.index(m) for m, _ in agent.move_history], dtype=np.int8))
+        rows.append((os.path.basename(history_file), human, hpa, agent.plan_time))
+    print(f"{'history':<22} {'human cost':>10} {'moves':>6} {'cover':>6} | {'hpa cost':>8} {'moves':>6} {'cover':>6} {'plan':>7}")
+    for name, human, hpa, plan_time in rows:
+        print(f"{name:<22} {human['cost']:>10} {human['moves']:>6} {human['coverage']:>6.1%} | "
+              f"{hpa['cost']:>8} {hpa['moves']:>6} {hpa['coverage']:>6.1%} {plan_time * 1000:>5.0f}ms")
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python hierarchical_planner.py <maze_file> [region_size] [history_file]")
+        print("       python hierarchical_planner.py corpus [exp_data] [region_size]")
+        sys.exit(1)
+    if sys.argv[1] == 'corpus':
+        data_dir = sys.argv[2] if len(sys.argv) > 2 else "exp_data"
+        region_size = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        run_corpus(data_dir, region_size)
+        return
+
+    maze_file = sys.argv[1]
+    region_size = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    agent = HierarchicalAgent(maze_file, region_size=region_size)
+    agent.run()
+    graph = agent.graph
+    print(f"迷路 {graph.rows}×{graph.cols}, エリア {graph.size}×{graph.size}（{len(agent.region_order)} 個）, "
+          f"入口 {len(graph.nodes)} 個")
+    print(f"抽象グラフ {agent.build_time * 1000:.0f} ms, 計画・巡回 {agent.plan_time * 1000:.0f} ms")
+    print(f"総コスト {agent.total_cost}, 移動 {len(agent.move_history)}, 時間 {agent.sim_time} ms, "
+          f"局所的な目標 {agent.n_legs} 個, 探索済み {agent.coverage:.1%}")
+    if len(sys.argv) > 3:
+        agent.save_move_history(sys.argv[3])
+
+
+if __name__ == '__main__':
+    main()
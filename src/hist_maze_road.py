@@ -3,30 +3,10 @@ import numpy as np
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 import os
+import sys
 
-def generate_random_maze(N=17):
-    """
-    ランダムな迷路を生成する関数
-    :param N: 迷路のサイズ (奇数)
-    :return: 迷路を表す2次元リスト
-    """
-    maze = [['#' for _ in range(N)] for _ in range(N)]
-    K = random.randint(N, 2 * N)
-
-    for _ in range(K):
-        d = random.randint(0, 1)
-        i = random.randint(0, (N - 1) // 2) * 2
-        j = random.randint(0, N - 1)
-        h = random.randint(3, 10)
-        w = str(random.randint(5, 9))
-
-        for k in range(max(j - h, 0), min(j + h, N - 1) + 1):
-            if d == 0:
-                maze[i][k] = w
-            else:
-                maze[k][i] = w
-
-    return maze
+from seeding import make_rng, spawn_seeds, record_seed
+from maze_core import generate_random_maze
 
 def count_apparent_paths(maze):
     """
@@ -84,13 +64,18 @@ def main():
     maze_size = 9 * 2 - 1  # 迷路のサイズ (奇数)
     path_counts = []
 
+    # 迷路ごとに親の seed から子の seed を決める（並列に生成しても同じ迷路になる）
+    seed, _ = make_rng(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print(f"seed = {seed}")
+    maze_seeds = spawn_seeds(seed, N)
+
     # 迷路生成とカウント
     mazes = []
-    for _ in tqdm(range(N)):
-        maze = generate_random_maze(maze_size)
+    for maze_seed in tqdm(maze_seeds):
+        maze = generate_random_maze(maze_size, random.Random(maze_seed))
         path_count = count_apparent_paths(maze)
         path_counts.append(path_count)
-        mazes.append((path_count, maze))
+        mazes.append((path_count, maze, maze_seed))
 
     # 四分位数を計算
     q25, q50, q75 = np.percentile(path_counts, [25, 50, 75])
@@ -104,16 +89,18 @@ def main():
     output_dir = "quartile_mazes"
     os.makedirs(output_dir, exist_ok=True)
     for q_idx, q in enumerate(quartiles, start=1):
-        selected = [maze for path_count, maze in mazes if path_count == q]
+        selected = [(maze, maze_seed) for path_count, maze, maze_seed in mazes if path_count == q]
         if len(selected) < 5:
             print(f"Warning: Less than 5 mazes found for Q{q_idx}. Found {len(selected)}.")
             selected = selected[:5]
         else:
             selected = selected[:5]
         
-        for i, maze in enumerate(selected):
+        for i, (maze, maze_seed) in enumerate(selected):
             filename = os.path.join(output_dir, f"maze_Q{q_idx}_{i+1}.txt")
             save_maze(maze, filename)
+            # 迷路自体の seed と、それを作った親の seed を記録する
+            record_seed(filename, maze_seed, "hist_maze_road.generate_random_maze", parent_seed=seed)
 
     # ヒストグラムをプロット
     plt.hist(path_counts, bins=range(min(path_counts), max(path_counts) + 1), edgecolor='black')
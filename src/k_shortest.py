@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+k_shortest.py
+
+2 マスの間の「コストの小さい順に k 本の（同じマスを 2 度通らない）経路」を Yen のアルゴリズムで求める．
+choose_decision_point は各候補への最短経路しか見ないので、選ばれなかった別ルートが
+どれだけ僅差だったかを調べるために使う．
+
+- 迷路を通路グラフに縮約してから探索する
+    ・分岐・行き止まり（隣接する数字マスが 2 個でないマス）を頂点、その間の 1 本道を辺とする
+    ・辺は通るマスの列を持ち、向きごとのコスト（移動先の数字の和）とステップ数を前計算しておく
+    ・問い合わせの始点・終点が 1 本道の途中にあるときは、その辺だけを分割して一時的な頂点にする
+- Yen のアルゴリズムの分岐（spur）経路の探索では、終点から逆向きに 1 回だけ求めた最短経路木を使い回す
+    ・分岐点からの木の経路が、除外した頂点・辺に触れていなければ、それがそのまま分岐経路になる
+    ・触れていれば、木の距離をヒューリスティックにした A* で探す（除外で距離は短くならないので許容的）
+- 経路の順序は bfs_path と同じく（総コスト, ステップ数）
+- cost_grid（perceived_cost.get_cost_field など）を渡せば、そのコストの場で順位付けする
+
+使い方：
+    python src/k_shortest.py <迷路ファイル> <始点 "x,y"> <終点 "x,y"> [k]
+    python src/k_shortest.py corpus [exp_data ディレクトリ] [k]
+      （人間の各履歴を 500 ms 以上の待ちで区間に分け、各区間の両端の間の上位 k 本と、人間の経路の順位を調べる）
+"""
+
+import sys
+import time
+from heapq import heappush, heappop
+
+import numpy as np
+
+from corpus import (DIRECTIONS, load_maze, find_start, load_move_history, reconstruct_positions,
+                    think_times, iter_corpus)
+from distance_field import maze_to_cost_grid, NEIGHBOR_DELTAS
+from perceived_cost import history_legs
+
+
+class CorridorGraph:
+    """迷路を分岐・行き止まりを頂点、1 本道を辺として縮約したグラフ"""
+
+    def __init__(self, maze, cost_grid=None):
+        """
+        maze      : 迷路の 2次元リスト
+        cost_grid : 各マスに入るコストの整数配列（壁は負）．省略時は迷路の数字
+        """
+        self.cost_grid = maze_to_cost_grid(maze) if cost_grid is None else np.asarray(cost_grid)
+        self.rows, self.cols = self.cost_grid.shape
+        self.cell_cost = [int(v) for v in self.cost_grid.ravel()]
+        # 重み = コスト × scale + ステップ数（(コスト, ステップ数) の辞書式順序を 1 つの整数で表す）
+        self.scale = self.rows * self.cols + 1
+        self.move_names = {dr * self.cols + dc: name for name, (dr, dc) in zip(DIRECTIONS, NEIGHBOR_DELTAS)}
+
+        self.neighbors = [[] for _ in range(self.rows * self.cols)]
+        for cell, cost in enumerate(self.cell_cost):
+            if cost < 0:
+                continue
+            r, c = divmod(cell, self.cols)
+            for dr, dc in NEIGHBOR_DELTAS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < self.rows and 0 <= nc < self.cols and self.cell_cost[nr * self.cols + nc] >= 0:
+                    self.neighbors[cell].append(nr * self.cols + nc)
+        self._contract()
+
+    def _contract(self):
+        """分岐・行き止まりを頂点にして 1 本道をたどり、辺を作る"""
+        open_cells = [cell for cell, cost in enumerate(self.cell_cost) if cost >= 0]
+        self.is_node = [False] * len(self.cell_cost)
+        for cell in open_cells:
+            self.is_node[cell] = len(self.neighbors[cell]) != 2
+        self.edge_cells = []           # 辺ごとのマスの列（両端の頂点を含む）
+        self.cell_edge = {}            # 1 本道の途中のマス → (辺番号, 列の中の位置)
+        self.adjacency = {}            # 頂点 → [(隣の頂点, 重み, 辺のキー, 通るマス（始点を除く）)]
+        self._direct = set()           # 隣り合う頂点の組（1 本道の無い辺を一方からだけ作るため）
+        covered = set()
+        for cell in open_cells:
+            if self.is_node[cell]:
+                self._walk_from(cell, covered)
+        # 分岐の無い輪になっている通路は、その中の 1 マスを頂点にする
+        for cell in open_cells:
+            if cell not in covered and not self.is_node[cell]:
+                self.is_node[cell] = True
+                self._walk_from(cell, covered)
+
+    def _walk_from(self, node, covered):
+        covered.add(node)
+        self.adjacency.setdefault(node, [])
+        for first in self.neighbors[node]:
+            if first in covered and not self.is_node[first]:
+                continue  # 反対側の頂点から既にたどった 1 本道
+            cells = [node]
+            prev, cur = node, first
+            while not self.is_node[cur]:
+                cells.append(cur)
+                covered.add(cur)
+                a, b = self.neighbors[cur]
+                prev, cur = cur, (b if a == prev else a)
+            cells.append(cur)
+            if cur == node and len(cells) == 2:
+                continue
+            if len(cells) == 2:
+                if (cur, node) in self._direct:
+                    continue
+                self._direct.add((node, cur))
+            edge = len(self.edge_cells)
+            self.edge_cells.append(cells)
+            for pos, inner in enumerate(cells[1:-1], start=1):
+                self.cell_edge[inner] = (edge, pos)
+            self._add_piece(('e', edge), cells, self.adjacency)
+
+    def _add_piece(self, key, cells, adjacency):
+        """マスの列 cells（両端が頂点）を辺 key として adjacency の両端に加える"""
+        forward = self._weight(cells[1:])
+        backward = self._weight(cells[:-1])
+        adjacency.setdefault(cells[0], []).append((cells[-1], forward, key, cells[1:]))
+        adjacency.setdefault(cells[-1], []).append((cells[0], backward, key, cells[-2::-1]))
+
+    def _weight(self, cells):
+        return sum(self.cell_cost[c] for c in cells) * self.scale + len(cells)
+
+    def _query_adjacency(self, cells):
+        """
+        cells（始点・終点）が 1 本道の途中にあれば、その辺を分割した隣接リストを返す
+        （変更の無い頂点は self.adjacency を参照する）
+        """
+        split = {}
+        for cell in cells:
+            if cell in self.cell_edge:
+                edge, pos = self.cell_edge[cell]
+                split.setdefault(edge, set()).add(pos)
+        if not split:
+            return self.adjacency
+        adjacency = {}
+        touched = set()
+        for edge, positions in split.items():
+            edge_cells = self.edge_cells[edge]
+            touched.update((edge_cells[0], edge_cells[-1]))
+        for node in touched:
+            adjacency[node] = [arc for arc in self.adjacency[node] if arc[2][0] != 'e' or arc[2][1] not in split]
+        for edge, positions in split.items():
+            edge_cells = self.edge_cells[edge]
+            cuts = [0] + sorted(positions) + [len(edge_cells) - 1]
+            for i, (a, b) in enumerate(zip(cuts[:-1], cuts[1:])):
+                for end in (edge_cells[a], edge_cells[b]):
+                    if end not in adjacency:
+                        adjacency[end] = list(self.adjacency.get(end, []))
+                self._add_piece(('s', edge, i), edge_cells[a:b + 1], adjacency)
+        return _Overlay(adjacency, self.adjacency)
+
+    def _reverse_tree(self, adjacency, target):
+        """target への最短経路木（各頂点の target までの重みと、次の頂点・辺）を求める"""
+        dist = {target: 0}
+        succ = {target: None}
+        heap = [(0, target)]
+        while heap:
+            d, node = heappop(heap)
+            if d > dist[node]:
+                continue
+            for prev, _, key, cells in adjacency.get(node, []):
+                # prev → node の重みは、逆向きの辺（node → prev）と同じ辺 key の反対向き
+                w = self._weight(cells[-2::-1] + [node])
+                if prev not in dist or d + w < dist[prev]:
+                    dist[prev] = d + w
+                    succ[prev] = (node, key)
+                    heappush(heap, (d + w, prev))
+        return dist, succ
+
+    def _spur_path(self, adjacency, source, target, dist, succ, blocked_nodes, blocked_keys):
+        """
+        source から target への、blocked_nodes を通らず source から blocked_keys の辺を使わない最短経路
+        戻り値：(重み, 頂点の列, 辺のキーの列) または None
+        """
+        # 最短経路木の経路がそのまま使えるか
+        if source in succ:
+            nodes, keys = [source], []
+            node = source
+            ok = True
+            while node != target:
+                node, key = succ[node]
+                if node in blocked_nodes or (len(keys) == 0 and key in blocked_keys):
+                    ok = False
+                    break
+                nodes.append(node)
+                keys.append(key)
+            if ok:
+                return dist[source], nodes, keys
+        # 木の距離をヒューリスティックにした A*
+        best = {source: 0}
+        parent = {source: None}
+        heap = [(dist.get(source, 0), 0, source)]
+        while heap:
+            f, g, node = heappop(heap)
+            if g > best[node]:
+                continue
+            if node == target:
+                nodes, keys = [node], []
+                while parent[node] is not None:
+                    node, key = parent[node]
+                    nodes.append(node)
+                    keys.append(key)
+                return g, nodes[::-1], keys[::-1]
+            for nxt, w, key, _ in adjacency.get(node, []):
+                if nxt in blocked_nodes or nxt not in dist or (node == source and key in blocked_keys):
+                    continue
+                ng = g + w
+                if nxt not in best or ng < best[nxt]:
+                    best[nxt] = ng
+                    parent[nxt] = (node, key)
+                    heappush(heap, (ng + dist[nxt], ng, nxt))
+        return None
+
+    def k_shortest(self, a, b, k=3):
+        """
+        a から b への（同じマスを 2 度通らない）経路を（総コスト, ステップ数）の小さい順に最大 k 本返す
+
+        戻り値：
+            [(path, steps, cost, turns), …]．path は bfs_path と同じ移動方向のリスト、turns は曲がった回数
+            a == b なら [([], 0, 0, 0)]，到達不能なら []
+        """
+        source, target = a[0] * self.cols + a[1], b[0] * self.cols + b[1]
+        if self.cell_cost[source] < 0 or self.cell_cost[target] < 0:
+            return []
+        if source == target:
+            return [([], 0, 0, 0)]
+        adjacency = self._query_adjacency([source, target])
+        dist, succ = self._reverse_tree(adjacency, target)
+        first = self._spur_path(adjacency, source, target, dist, succ, set(), set())
+        if first is None:
+            return []
+        found = [first]
+        candidates = []
+        seen = {tuple(first[2])}
+        while len(found) < k:
+            _, nodes, keys = found[-1]
+            root_weight = 0
+            for i in range(len(nodes) - 1):
+                spur = nodes[i]
+                root_nodes, root_keys = nodes[:i + 1], keys[:i]
+                blocked_keys = {p[2][i] for p in found if p[1][:i + 1] == root_nodes and p[2][:i] == root_keys}
+                spur_result = self._spur_path(adjacency, spur, target, dist, succ,
+                                              set(root_nodes[:-1]), blocked_keys)
+                if spur_result is not None:
+                    total_keys = tuple(root_keys) + tuple(spur_result[2])
+                    if total_keys not in seen:
+                        seen.add(total_keys)
+                        heappush(candidates, (root_weight + spur_result[0], len(candidates),
+                                              root_nodes[:-1] + spur_result[1], list(total_keys)))
+                root_weight += self._arc_weight(adjacency, nodes[i], keys[i], nodes[i + 1])
+            if not candidates:
+                break
+            weight, _, nodes, keys = heappop(candidates)
+            found.append((weight, nodes, keys))
+        return [self._route(adjacency, source, nodes, keys) for _, nodes, keys in found]
+
+    def _arc_weight(self, adjacency, node, key, nxt):
+        for other, w, arc_key, _ in adjacency[node]:
+            if arc_key == key and other == nxt:
+                return w
+        raise KeyError(key)
+
+    def _route(self, adjacency, source, nodes, keys):
+        """頂点と辺の列を (path, steps, cost, turns) にする"""
+        cells = [source]
+        for node, key, nxt in zip(nodes[:-1], keys, nodes[1:]):
+            for other, _, arc_key, arc_cells in adjacency[node]:
+                if arc_key == key and other == nxt:
+                    cells.extend(arc_cells)
+                    break
+        path = [self.move_names[b - a] for a, b in zip(cells[:-1], cells[1:])]
+        cost = sum(self.cell_cost[c] for c in cells[1:])
+        turns = sum(1 for p, q in zip(path[:-1], path[1:]) if p != q)
+        return path, len(path), cost, turns
+
+
+class _Overlay(dict):
+    """分割した頂点だけを差し替え、それ以外は元の隣接リストを返す辞書"""
+
+    def __init__(self, changed, base):
+        super().__init__(changed)
+        self.base = base
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.base.get(key, default)
+
+    def __getitem__(self, key):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.base[key]
+
+
+def analyse_corpus(data_dir="exp_data", k=3, threshold_ms=500):
+    """
+    人間の各履歴を待ちで区間に分け、区間の両端の間の上位 k 本の経路と、人間の経路の順位を求める
+
+    戻り値：
+        [(履歴ファイル名, 区間の始点, 終点, routes, 人間の経路の順位（上位 k 本に無ければ None）), …] と
+        1 回の問い合わせにかかった時間（秒）の配列
+    """
+    rows = []
+    elapsed = []
+    for maze_file, history_file in iter_corpus(data_dir):
+        maze = load_maze(maze_file)
+        graph = CorridorGraph(maze)
+        start = find_start(maze)
+        start_time, codes, timestamps = load_move_history(history_file)
+        positions = reconstruct_positions(start, codes)
+        for a, b in history_legs(positions, think_times(start_time, timestamps), threshold_ms):
+            p, q = tuple(int(v) for v in positions[a]), tuple(int(v) for v in positions[b])
+            t0 = time.perf_counter()
+            routes = graph.k_shortest(p, q, k)
+            elapsed.append(time.perf_counter() - t0)
+            human = [DIRECTIONS[c] for c in codes[a:b]]
+            rank = next((i for i, route in enumerate(routes) if route[0] == human), None)
+            rows.append((history_file, p, q, routes, rank))
+    return rows, np.array(elapsed)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'corpus':
+        data_dir = sys.argv[2] if len(sys.argv) > 2 else "exp_data"
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+        rows, elapsed = analyse_corpus(data_dir, k)
+        if not rows:
+            print(f"{data_dir} に区間がありません．")
+            return
+        ranks = [rank for *_, rank in rows]
+        gaps = [(routes[1][2] - routes[0][2]) / max(routes[0][2], 1) for *_, routes, _ in rows if len(routes) > 1]
+        print(f"{len(rows)} 区間，1 回あたり平均 {elapsed.mean() * 1000:.2f} ms（最大 {elapsed.max() * 1000:.2f} ms）")
+        for i in range(k):
+            print(f"  人間の経路が {i + 1} 番目 : {sum(r == i for r in ranks) / len(rows):.1%}")
+        print(f"  上位 {k} 本に無い     : {sum(r is None for r in ranks) / len(rows):.1%}")
+        if gaps:
+            print(f"1 番目と 2 番目のコストの差（1 番目に対する割合）: 中央値 {np.median(gaps):.1%}，"
+                  f"差が無いもの {np.mean(np.array(gaps) == 0):.1%}")
+        return
+
+    if len(sys.argv) < 4:
+        print("Usage: python k_shortest.py <maze_file> <x,y> <x,y> [k]")
+        print("       python k_shortest.py corpus [exp_data] [k]")
+        sys.exit(1)
+    maze = load_maze(sys.argv[1])
+    a = tuple(int(v) for v in sys.argv[2].split(','))
+    b = tuple(int(v) for v in sys.argv[3].split(','))
+    k = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+    t0 = time.perf_counter()
+    graph = CorridorGraph(maze)
+    t1 = time.perf_counter()
+    routes = graph.k_shortest(a, b, k)
+    t2 = time.perf_counter()
+    print(f"通路グラフ : {len(graph.adjacency)} 頂点, {len(graph.edge_cells)} 辺（{(t1 - t0) * 1000:.1f} ms）")
+    print(f"{a} → {b} の上位 {len(routes)} 本（{(t2 - t1) * 1000:.2f} ms）")
+    for i, (path, steps, cost, turns) in enumerate(routes, start=1):
+        print(f"  {i}: コスト {cost}, {steps} 歩, 曲がり {turns} 回")
+
+
+if __name__ == '__main__':
+    main()
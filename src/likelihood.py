@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+likelihood.py
+
+人間の移動履歴の各手が、MazeAgent.choose_decision_point のルールの下で
+どの程度起こりやすいかを評価する（対数尤度を求める）スクリプト．
+
+【モデル】
+- 各手の直前の位置 p で、まだ到達していない意思決定ポイントを候補とする
+  （残りが無ければゴール＝スタート地点を候補とする）
+- 各候補 t について、エージェントのルールで使う特徴量を求める
+    manhattan  : p と t のマンハッタン距離
+    cost       : p から t への重み付き最短路の総コスト
+    unexplored : その経路上に未探索セルがあるか
+- 候補の選択確率 π(t) は
+    ・ルール通りの選択（weights=None）：マンハッタン距離 → コスト → 未探索 の順に絞り込み、残りは一様
+    ・ソフトマックス（weights 指定）：score = -w_m*manhattan - w_c*cost + w_u*unexplored
+- t を選んだときの 1手目は、t への最短経路の最初の一歩になり得る方向から一様に選ぶ
+- 観測された方向の確率 = (1-ε) Σ_t π(t) P(d|t) + ε / (移動可能な方向数)
+
+特徴量は履歴ごとに 1 回だけ（距離表を使って配列演算で）計算するため、
+重みを変えた尤度の再計算は配列演算のみで済み、パラメータスイープを高速に行える．
+
+使い方：
+    python src/likelihood.py [exp_data ディレクトリ]
+"""
+
+import os
+import sys
+import time
+import itertools
+
+import numpy as np
+
+from agent import load_decision_points_from_file
+from corpus import (DELTAS, load_maze, find_start, load_move_history, reconstruct_positions,
+                    think_times, pause_decision_points, find_reason_log_for_history, iter_corpus)
+from distance_field import get_distance_fields, UNREACHABLE
+from perceived_cost import get_cost_field
+
+
+class HistoryFeatures:
+    """1つの移動履歴について、各手 × 各候補の特徴量をまとめたもの"""
+
+    def __init__(self, name, manhattan, cost, unexplored, candidate_mask, first_move_prob,
+                 valid_moves, observed):
+        self.name = name
+        self.manhattan = manhattan              # (M, K) int
+        self.cost = cost                        # (M, K) int
+        self.unexplored = unexplored            # (M, K) bool
+        self.candidate_mask = candidate_mask    # (M, K) bool：その手で候補になっているか
+        self.first_move_prob = first_move_prob  # (M, K) float：t を選んだとき観測方向を選ぶ確率
+        self.valid_moves = valid_moves          # (M,) int：移動可能な方向の数
+        self.observed = observed                # (M,) int8：観測された方向コード
+
+    def __len__(self):
+        return len(self.observed)
+
+
+def first_seen_steps(fields, positions):
+    """
+    各セルが何手目の時点で探索済み（mark_explored）になったかを返す
+    一度も見えていないセルは len(positions) とする
+    """
+    rows, cols = fields.rows, fields.cols
+    first_seen = np.full((rows, cols), len(positions), dtype=np.int64)
+    digit = fields.cost_grid >= 0
+    for m, (x, y) in enumerate(positions.tolist()):
+        first_seen[x, y] = min(first_seen[x, y], m)
+        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            nx, ny = x + dx, y + dy
+            while 0 <= nx < rows and 0 <= ny < cols and digit[nx, ny]:
+                if first_seen[nx, ny] > m:
+                    first_seen[nx, ny] = m
+                nx += dx
+                ny += dy
+    return first_seen.ravel()
+
+
+def extract_features(maze, codes, decision_points, start=None, name="", cost_grid=None):
+    """
+    1つの移動履歴について、各手の候補集合と特徴量を配列演算でまとめて求める
+
+    maze            : 迷路の 2次元リスト
+    codes           : 方向コードの配列（corpus.load_move_history）
+    decision_points : 意思決定ポイントのリスト of (row, col)
+    start           : スタート（兼ゴール）座標．省略時は迷路の '5'
+    cost_grid       : 経路のコストに使う各マスのコスト（perceived_cost.get_cost_field）．省略時は迷路の数字
+    """
+    fields = get_distance_fields(maze, cost_grid=cost_grid)
+    start = find_start(maze) if start is None else start
+    positions = reconstruct_positions(start, codes)
+    n_moves = len(codes)
+    cols = fields.cols
+
+    pos_idx = positions[:, 0] * cols + positions[:, 1]         # (M+1,)
+    # 候補：意思決定ポイント（重複は除く）＋ゴール
+    targets = list(dict.fromkeys(tuple(p) for p in decision_points))
+    target_pos = np.array(targets + [tuple(start)], dtype=np.int64).reshape(-1, 2)
+    target_idx = target_pos[:, 0] * cols + target_pos[:, 1]    # (K,)
+    n_targets = len(target_idx)
+    goal_col = n_targets - 1
+
+    cur = pos_idx[:n_moves]                                    # (M,)
+    step = np.arange(n_moves)
+
+    # 意思決定ポイントに初めて立った手（それ以降は候補から外れる）
+    on_target = pos_idx[:, None] == target_idx[None, :]        # (M+1, K)
+    reached_at = np.where(on_target.any(axis=0), on_target.argmax(axis=0), n_moves + 1)
+    remaining = step[:, None] < reached_at[None, :]
+    remaining[:, goal_col] = False
+    no_points_left = ~remaining.any(axis=1)
+    remaining[:, goal_col] = no_points_left
+
+    dist = fields.dist[cur[:, None], target_idx[None, :]].astype(np.int64)
+    reachable = dist != UNREACHABLE
+    candidate_mask = remaining & reachable & (cur[:, None] != target_idx[None, :])
+
+    manhattan = (np.abs(positions[:n_moves, None, 0] - target_pos[None, :, 0])
+                 + np.abs(positions[:n_moves, None, 1] - target_pos[None, :, 1]))
+
+    # 経路上の未探索セル：next_hop を全候補同時にたどり、各セルの探索時刻と比較する
+    first_seen = first_seen_steps(fields, positions)
+    walker = np.where(candidate_mask, cur[:, None], target_idx[None, :])
+    unexplored = np.zeros((n_moves, n_targets), dtype=bool)
+    active = walker != target_idx[None, :]
+    while active.any():
+        walker = np.where(active, fields.next_hop[walker, target_idx[None, :]], walker)
+        unexplored |= active & (first_seen[walker] > step[:, None])
+        active = walker != target_idx[None, :]
+
+    # 各方向の 1手目が t への最短経路の一歩目になっているか
+    nb_pos = positions[:n_moves, None, :] + DELTAS[None, :, :]  # (M, 4, 2)
+    inside = ((nb_pos[..., 0] >= 0) & (nb_pos[..., 0] < fields.rows)
+              & (nb_pos[..., 1] >= 0) & (nb_pos[..., 1] < cols))
+    nb_idx = np.where(inside, nb_pos[..., 0] * cols + nb_pos[..., 1], 0)
+    nb_valid = inside & (fields.cell_cost[nb_idx] >= 0)
+    nb_dist = fields.dist[nb_idx[:, :, None], target_idx[None, None, :]].astype(np.int64)
+    nb_steps = fields.steps[nb_idx[:, :, None], target_idx[None, None, :]].astype(np.int64)
+    cur_steps = fields.steps[cur[:, None], target_idx[None, :]].astype(np.int64)
+    optimal = (nb_valid[:, :, None]
+               & (nb_dist != UNREACHABLE)
+               & (nb_dist + fields.cell_cost[nb_idx][:, :, None] == dist[:, None, :])
+               & (nb_steps + 1 == cur_steps[:, None, :]))
+    n_optimal = optimal.sum(axis=1)                            # (M, K)
+    observed_optimal = optimal[step, codes.astype(np.int64), :]
+    first_move_prob = np.where(n_optimal > 0, observed_optimal / np.maximum(n_optimal, 1), 0.0)
+
+    return HistoryFeatures(name, manhattan, np.where(reachable, dist, 0), unexplored,
+                           candidate_mask, first_move_prob, nb_valid.sum(axis=1), codes)
+
+
+def rule_policy(features):
+    """
+    choose_decision_point と同じ絞り込みで各候補の選択確率 (M, K) を返す
+      1. マンハッタン距離最小 2. コスト最小 3. 未探索セルを含む経路を優先 4. 一様に選択
+    """
+    mask = features.candidate_mask
+    big = np.iinfo(np.int64).max
+    m = np.where(mask, features.manhattan, big)
+    mask = mask & (m == m.min(axis=1, keepdims=True))
+    c = np.where(mask, features.cost, big)
+    mask = mask & (c == c.min(axis=1, keepdims=True))
+    prefer = mask & features.unexplored
+    mask = np.where(prefer.any(axis=1, keepdims=True), prefer, mask)
+    counts = mask.sum(axis=1, keepdims=True)
+    return mask / np.maximum(counts, 1)
+
+
+def softmax_policy(features, w_manhattan, w_cost, w_unexplored):
+    """重み付きスコアのソフトマックスで各候補の選択確率 (M, K) を返す"""
+    score = (-w_manhattan * features.manhattan - w_cost * features.cost
+             + w_unexplored * features.unexplored)
+    score = np.where(features.candidate_mask, score, -np.inf)
+    top = score.max(axis=1, keepdims=True)
+    top = np.where(np.isfinite(top), top, 0.0)
+    weights = np.exp(score - top)
+    return weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-300)
+
+
+def log_likelihood(features, weights=None, epsilon=0.05):
+    """
+    各手の対数尤度 (M,) を返す
+    weights : None ならルール通りの選択，(w_manhattan, w_cost, w_unexplored) ならソフトマックス
+    epsilon : ルールから外れた手を説明するための一様ノイズの割合
+    """
+    if weights is None:
+        pi = rule_policy(features)
+    else:
+        pi = softmax_policy(features, *weights)
+    p_rule = (pi * features.first_move_prob).sum(axis=1)
+    p = (1 - epsilon) * p_rule + epsilon / np.maximum(features.valid_moves, 1)
+    return np.log(p)
+
+
+def load_history_features(maze_file, history_file, threshold_ms=500, cost_field=None, data_dir="exp_data"):
+    """
+    迷路ファイルと移動履歴ファイルから HistoryFeatures を作る
+    意思決定ポイントは対応する理由ログ（data_dir/reasons）の Coordinates から読み込み、
+    無ければ threshold_ms 以上待った位置を使う
+    cost_field を指定すると、その名前の perceived_cost のコストの場で経路のコストを求める
+    """
+    maze = load_maze(maze_file)
+    start = find_start(maze)
+    start_time, codes, timestamps = load_move_history(history_file)
+    decision_points = []
+    reason_log = find_reason_log_for_history(history_file, os.path.join(data_dir, "reasons"))
+    if reason_log is not None:
+        decision_points = load_decision_points_from_file(reason_log)
+    if not decision_points:
+        positions = reconstruct_positions(start, codes)
+        decision_points = pause_decision_points(positions, think_times(start_time, timestamps), threshold_ms)
+    cost_grid = get_cost_field(maze, cost_field) if cost_field is not None else None
+    return extract_features(maze, codes, decision_points, start, name=os.path.basename(history_file),
+                            cost_grid=cost_grid)
+
+
+def load_corpus_features(data_dir="exp_data", cost_field=None):
+    """exp_data 以下の全ての人間の移動履歴について HistoryFeatures を作る"""
+    return [load_history_features(maze_file, history_file, cost_field=cost_field, data_dir=data_dir)
+            for maze_file, history_file in iter_corpus(data_dir)]
+
+
+def sweep(features_list, grid, epsilon=0.05):
+    """
+    重みの組 grid（(w_manhattan, w_cost, w_unexplored) のリスト）それぞれについて
+    コーパス全体の対数尤度の合計を返す
+    """
+    return np.array([sum(log_likelihood(f, weights, epsilon).sum() for f in features_list)
+                     for weights in grid])
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+
+    t0 = time.time()
+    features_list = load_corpus_features(data_dir)
+    print(f"特徴量の計算: {len(features_list)} ファイル, {time.time() - t0:.2f} 秒")
+
+    print("### ルール通りの選択 ###")
+    for f in features_list:
+        ll = log_likelihood(f)
+        print(f"{f.name}: moves={len(f)}, total={ll.sum():.2f}, mean={ll.mean():.3f}")
+
+    grid = list(itertools.product([0.0, 0.5, 1.0, 2.0], [0.0, 0.05, 0.1, 0.2], [0.0, 1.0, 2.0]))
+    t0 = time.time()
+    totals = sweep(features_list, grid)
+    best = int(np.argmax(totals))
+    print(f"### ソフトマックス重みのスイープ: {len(grid)} 通り, {time.time() - t0:.2f} 秒 ###")
+    print(f"best (w_manhattan, w_cost, w_unexplored) = {grid[best]}, total = {totals[best]:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+maze_core.py
+
+ゲーム・リプレイ（game.py, replay.py, exp/maze_game.py, exp/maze_replay.py）で共通の処理をまとめたモジュール．
+
+- 迷路ファイルの読み込み、スタート地点（'5' のマス）の検索、重複しないファイル名の生成
+- ランダム迷路の生成（generate_random_maze．hist_maze_road もこれを使う）と、
+  17×17 のゲーム用の迷路の生成（スタート地点を '5' にする）
+- MazeCore：迷路・プレイヤーの位置・探索済みマス・総コストを持ち、移動と探索済みの更新、描画を行う基底クラス
+    ・mark_explored は各マスから上下左右に伸びる通路のマスを初回に求めてキャッシュし、以降は set.update だけで済ませる
+    ・描画は viewport.Viewport の表示範囲に入るマスだけを行う
+- pygame は描画するときに初めて import・初期化する（get_pygame）．
+  迷路の読み込みや移動だけを使う解析用のスクリプトは SDL を読み込まずに起動できる
+"""
+
+import os
+import random
+
+# 色の定義
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+YELLOW = (255, 255, 0)
+RED = (255, 0, 0)
+CYAN = (0, 255, 255)
+GRAY = (192, 192, 192)
+
+# マス目のサイズ
+TILE_SIZE = 40
+
+# 移動方向と移動量（行, 列）
+DIRECTION_DELTAS = {
+    'up': (-1, 0),
+    'left': (0, -1),
+    'down': (1, 0),
+    'right': (0, 1),
+}
+
+_pygame = None
+
+
+def get_pygame():
+    """
+    pygame を（初めて呼ばれたときに）import して返す．
+    pygame.quit() の後に呼ばれた場合（ゲームの後に同じプロセスでリプレイする場合）は初期化し直す
+    """
+    global _pygame
+    if _pygame is None:
+        import pygame
+        _pygame = pygame
+    if not _pygame.get_init():
+        _pygame.init()
+    return _pygame
+
+
+def generate_unique_filename(directory, filename):
+    """重複を避けるためのファイル名生成"""
+    os.makedirs(directory, exist_ok=True)  # ディレクトリが無ければ作成
+    base, ext = os.path.splitext(filename)
+    counter = 1
+    new_filename = os.path.join(directory, f"{base}{ext}")
+    while os.path.exists(new_filename):
+        new_filename = os.path.join(directory, f"{base}_{counter}{ext}")
+        counter += 1
+    return new_filename
+
+
+def read_maze_file(maze_file):
+    """迷路ファイルを読み込み、2次元リストとして返す"""
+    with open(maze_file, 'r', encoding='utf-8') as f:
+        return [list(line.strip()) for line in f if line.strip()]
+
+
+def find_start(maze):
+    """'5' のマス（最初に見つかったもの）をスタート地点として返す"""
+    for i, row in enumerate(maze):
+        for j, cell in enumerate(row):
+            if cell == '5':
+                return (i, j)
+    raise ValueError("Start position not found in the maze file.")
+
+
+def generate_random_maze(N=17, rng=None):
+    """
+    ランダムな迷路を生成する関数
+    :param N: 迷路のサイズ (奇数)
+    :param rng: 使用する random.Random（省略時は seed なしの新しい乱数）
+    :return: 迷路を表す2次元リスト
+    """
+    if rng is None:
+        rng = random.Random()
+    maze = [['#' for _ in range(N)] for _ in range(N)]
+    K = rng.randint(N, 2 * N)
+
+    for _ in range(K):
+        d = rng.randint(0, 1)
+        i = rng.randint(0, (N - 1) // 2) * 2
+        j = rng.randint(0, N - 1)
+        h = rng.randint(3, 10)
+        w = str(rng.randint(5, 9))
+
+        for k in range(max(j - h, 0), min(j + h, N - 1) + 1):
+            if d == 0:
+                maze[i][k] = w
+            else:
+                maze[k][i] = w
+
+    return maze
+
+
+def generate_game_maze(rng, N=9 * 2 - 1):
+    """
+    ゲーム用のランダムな迷路を generate_random_maze で生成し、
+    数字マスの 1 つを rng で選んでスタート地点 '5' にする
+
+    戻り値：
+        (maze, start)
+    """
+    maze = generate_random_maze(N, rng)
+
+    # スタート地点を設定
+    valid_positions = [(i, j) for i in range(N) for j in range(N) if maze[i][j].isdigit()]
+    start = rng.choice(valid_positions)
+    maze[start[0]][start[1]] = '5'  # スタート地点を '5' に設定
+    return maze, start
+
+
+class MazeCore:
+    """
+    迷路と、プレイヤーの位置・探索済みマス・総コストを持つ基底クラス
+    （ゲーム・リプレイのクラスはこれを継承し、load_maze の後に reset_player を呼ぶ）
+    """
+
+    def load_maze(self, maze_file):
+        self.set_maze(read_maze_file(maze_file))
+
+    def set_maze(self, maze):
+        """迷路（2次元リスト）を設定する"""
+        self.maze = maze
+        self.rows = len(self.maze)
+        self.cols = len(self.maze[0])
+        self.start = self.find_start()
+        self.n_open = sum(1 for row in self.maze for cell in row if cell.isdigit())
+        self._explored_cache = {}
+
+    def find_start(self):
+        return find_start(self.maze)
+
+    def reset_player(self):
+        """プレイヤーをスタート地点に置き、探索済みマス・総コストを初期化する"""
+        self.player_position = self.start
+        self.visited = set()  # 探索済みマスを記録
+        self.total_cost = 0  # 総コストの初期化
+        self.mark_explored()
+
+    def explored_cells(self, position):
+        """position と、そこから上下左右に連続する数字マス（キャッシュする）"""
+        cells = self._explored_cache.get(position)
+        if cells is None:
+            x, y = position
+            found = [position]
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                nx, ny = x + dx, y + dy
+                while 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny].isdigit():
+                    found.append((nx, ny))
+                    nx += dx
+                    ny += dy
+            cells = self._explored_cache[position] = tuple(found)
+        return cells
+
+    def mark_explored(self):
+        """現在のマスから縦横に伸びるマスを探索済みにする"""
+        self.visited.update(self.explored_cells(self.player_position))
+
+    def target(self, direction):
+        """direction へ移動した先のマスを返す（壁・迷路の外なら None）"""
+        x, y = self.player_position
+        dx, dy = DIRECTION_DELTAS.get(direction, (0, 0))
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny] != '#':
+            return (nx, ny)
+        return None
+
+    def move(self, direction):
+        """
+        プレイヤーを指定方向へ移動し、コストを加算する（壁でない場合のみ）
+
+        戻り値：
+            移動したマスのコスト．移動できなかった場合は None
+        """
+        new_position = self.target(direction)
+        if new_position is None:
+            return None
+        nx, ny = new_position
+        cost = int(self.maze[nx][ny]) if self.maze[nx][ny].isdigit() else 0
+        self.total_cost += cost
+        print(f"Moved {direction}. Cost: {cost}, Total Cost: {self.total_cost}")
+
+        self.player_position = new_position
+        self.mark_explored()
+        return cost
+
+    def is_goal_reached(self):
+        """ゴール条件（スタート地点に戻り、全ての数字マスを探索済みにした）をチェック"""
+        return self.player_position == self.start and len(self.visited) == self.n_open
+
+    # --- 描画 ---
+
+    def init_rendering(self, max_width=1280, max_height=800):
+        """
+        描画の準備（pygame の初期化、フォント、表示範囲、全体図）．
+        ウィンドウを作る前に呼ぶ．2 回目以降は何もしない
+        """
+        if getattr(self, 'viewport', None) is not None:
+            return
+        pygame = get_pygame()
+        from viewport import Viewport, Minimap, GlyphCache
+
+        self.font = pygame.font.Font(None, 24)
+        self.glyphs = GlyphCache(self.font)
+        # 表示範囲（大きな迷路ではプレイヤーを中心にスクロールし、右上に全体図を出す）
+        self.viewport = Viewport(self.rows, self.cols, TILE_SIZE, max_width, max_height)
+        self.minimap = Minimap(self.maze)
+
+    def draw_maze(self, screen):
+        """迷路とプレイヤー、探索状況を描画（表示範囲に入るマスだけ）"""
+        self.init_rendering()
+        pygame = get_pygame()
+        viewport = self.viewport
+        viewport.follow(self.player_position)
+        row0, row1, col0, col1 = viewport.visible_cells()
+        for i in range(row0, row1):
+            row = self.maze[i]
+            for j in range(col0, col1):
+                cell = row[j]
+                x, y, w, h = viewport.tile_rect(i, j)
+
+                # 背景色を決定
+                if (i, j) == self.start:
+                    color = RED  # ゴールは赤
+                elif (i, j) == self.player_position:
+                    color = YELLOW  # プレイヤーは黄色
+                elif (i, j) in self.visited:
+                    color = GRAY  # 探索済みマスは灰色
+                elif cell.isdigit():
+                    color = CYAN  # 未探索マスは青
+                else:
+                    color = BLACK  # 障害物は黒
+
+                # マスを描画
+                pygame.draw.rect(screen, color, (x, y, w, h))
+                pygame.draw.rect(screen, WHITE, (x, y, w, h), 1)
+
+                # 移動コストを表示（小さく縮小したときは省略）
+                if cell.isdigit() and w >= 16:
+                    text = self.glyphs.get(cell, WHITE if color == CYAN else BLACK)
+                    text_rect = text.get_rect(center=(x + w // 2, y + h // 2))
+                    screen.blit(text, text_rect)
+
+        # 迷路がウィンドウに収まらないときは全体図を出す
+        if not viewport.fits():
+            self.minimap.update(self.visited, self.start)
+            self.minimap.draw(screen, viewport, self.player_position)
+
+    def draw_cost(self, screen, screen_height):
+        """画面下部に総コストを描画"""
+        self.init_rendering()
+        pygame = get_pygame()
+        pygame.draw.rect(screen, BLACK, (0, screen_height - 40, screen.get_width(), 40))
+        cost_text = self.font.render(f"Total Cost: {self.total_cost}", True, WHITE)
+        screen.blit(cost_text, (10, screen_height - 30))
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+multi_agent.py
+
+同じ迷路の上で N 体のエージェントを同時に巡回させる離散イベントシミュレータ．
+
+- 各エージェントは MazeAgent と同じ規則（choose_decision_point のルール 1〜4）で次の意思決定ポイントを選び、
+  MazeAgent と同じ時間消費（ThinkTimeModel）で移動・待機する
+- 探索済みマス（visited）は全エージェントで共有する．ルール 3（経路上に未探索マスがあるか）は共有の visited で判定する
+- 意思決定ポイントは選んだ時点でそのエージェントが確保（claim）し、他のエージェントの候補から外す．
+  到着した時点で巡回済みになる．確保できる候補が無くなったエージェントはゴールへ向かう
+- イベント（1マスの移動・意思決定）はシミュレーション時刻順のヒープで処理する．
+  同じ時刻のイベントはエージェントの番号順に処理するので、seed が同じなら結果も同じになる
+- エージェントの状態（位置・時刻・コスト・直前の移動方向など）は NumPy 配列で持ち、
+  経路は distance_field の全セル間の最短経路表から引く（ダイクストラ法は迷路ごとに 1 回のみ）
+- N=1 のときは MazeAgent(use_distance_cache=True, seed=同じ seed).run() と同じ移動履歴になる
+
+結果として、全マスを探索済みにした時刻（カバー時間）・全意思決定ポイントを巡回した時刻・
+全員がゴールに着いた時刻と、エージェントごとのコスト・巡回数・初めて探索したマス数（分担）を返す．
+
+使い方：
+    python src/multi_agent.py <迷路ファイル> <意思決定ポイントのファイル or "x,y; x,y; …"> [エージェント数] [seed]
+"""
+
+import os
+import sys
+import random
+from heapq import heappush, heappop
+
+import numpy as np
+
+from agent import load_decision_points_from_file, parse_coordinate
+from corpus import load_maze, find_start, DIRECTIONS, DIRECTION_CODES
+from distance_field import get_distance_fields, UNREACHABLE, NEIGHBOR_DELTAS
+from think_time_model import ThinkTimeModel
+from seeding import make_rng
+
+# イベントの種類
+STEP = 0    # 経路に沿って 1 マス移動する
+DECIDE = 1  # 次の意思決定ポイント（またはゴール）を選ぶ
+
+# 区間の種類
+LEG_POINT = 0
+LEG_GOAL = 1
+
+
+class MultiAgentSimulator:
+    """N 体のエージェントの巡回を同時にシミュレートする"""
+
+    def __init__(self, maze_file, decision_points, n_agents=2, starts=None, goal=None, timing=None,
+                 seed=None, record_history=True):
+        """
+        maze_file       : 迷路ファイルのパス
+        decision_points : 意思決定ポイントの座標（リスト of (row, col)）
+        n_agents        : エージェント数
+        starts          : 各エージェントのスタート位置のリスト．省略時は全員迷路の '5' のマス
+        goal            : ゴール位置．省略時は迷路の '5' のマス（実験と同じ）
+        timing          : 移動・待機時間のモデル（ThinkTimeModel）．省略時は既定値
+        seed            : 候補が同点のときのランダム選択に使う乱数の種（全エージェントで 1 つの乱数列を使う）
+        record_history  : True なら各エージェントの移動履歴 [(方向, 時刻), …] を self.move_history に残す
+        """
+        self.maze_file = maze_file
+        self.maze = load_maze(maze_file)
+        self.rows = len(self.maze)
+        self.cols = len(self.maze[0])
+        origin = find_start(self.maze)
+        self.starts = list(starts) if starts is not None else [origin] * n_agents
+        if len(self.starts) != n_agents:
+            raise ValueError("starts の数がエージェント数と一致しません．")
+        self.goal = goal if goal is not None else origin
+        self.n_agents = n_agents
+        self.decision_points = [tuple(p) for p in decision_points]
+        self.timing = timing if timing is not None else ThinkTimeModel()
+        self.seed, self.rng = make_rng(seed)
+        self.record_history = record_history
+
+        self.fields = get_distance_fields(self.maze)
+        self.cell_cost = np.asarray(self.fields.cell_cost)
+        # カバー時間の対象は、いずれかのスタートから到達できる数字マス
+        start_index = [self.fields.index(p) for p in self.starts]
+        self.n_open = int((np.asarray(self.fields.dist[start_index]) != UNREACHABLE).any(axis=0).sum())
+        self.point_index = np.array([self.fields.index(p) for p in self.decision_points], dtype=np.int64)
+        self.point_rows = np.array([p[0] for p in self.decision_points], dtype=np.int64)
+        self.point_cols = np.array([p[1] for p in self.decision_points], dtype=np.int64)
+        self._explored_cache = {}
+
+    # --- 共有の探索済みマス ---
+
+    def explored_cells(self, cell):
+        """セル番号 cell と、そこから上下左右に連続する数字マスのセル番号の配列（キャッシュする）"""
+        cells = self._explored_cache.get(cell)
+        if cells is None:
+            x, y = divmod(cell, self.cols)
+            found = [cell]
+            for dx, dy in NEIGHBOR_DELTAS:
+                nx, ny = x + dx, y + dy
+                while 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny].isdigit():
+                    found.append(nx * self.cols + ny)
+                    nx += dx
+                    ny += dy
+            cells = self._explored_cache[cell] = np.array(found, dtype=np.int64)
+        return cells
+
+    def mark_explored(self, agent, cell, t):
+        """agent が cell に着いたときに縦横に伸びるマスを探索済みにする（初めて探索したマスは agent の分担にする）"""
+        cells = self.explored_cells(cell)
+        new = cells[self.explored_by[cells] < 0]
+        if len(new) == 0:
+            return
+        self.explored_by[new] = agent
+        self.explored_at[new] = t
+        self.n_visited += len(new)
+        self.cells_explored[agent] += len(new)
+        if self.n_visited == self.n_open and self.coverage_time is None:
+            self.coverage_time = t
+
+    # --- 意思決定 ---
+
+    def tied_candidates(self, agent):
+        """
+        MazeAgent.tied_candidates と同じルール 1〜3 で、agent が確保できる候補を絞り込む
+        （巡回済み・他のエージェントが確保済みのポイントは除く．ルール 3 は共有の visited で判定する）
+
+        戻り値：
+            [(ポイントの番号, path, steps, cost), …]（decision_points の順）
+        """
+        here = int(self.pos[agent])
+        dist = np.asarray(self.fields.dist[here, self.point_index])
+        available = (self.point_owner < 0) & (dist != UNREACHABLE)
+        if not available.any():
+            return []
+        row, col = divmod(here, self.cols)
+        m_dist = np.abs(self.point_rows - row) + np.abs(self.point_cols - col)
+        # (1) マンハッタン距離が最小の候補群
+        available &= m_dist == m_dist[available].min()
+        # (2) 経路の総コストが最小の候補群
+        available &= dist == dist[available].min()
+        filtered = []
+        for k in np.flatnonzero(available):
+            path, steps, cost = self.fields.route(self.fields.position(here), self.decision_points[k])
+            filtered.append((int(k), path, steps, cost, self._has_new(here, path)))
+        # (3) 未探索セルを通る経路があれば優先
+        if any(c[4] for c in filtered):
+            filtered = [c for c in filtered if c[4]]
+        return [c[:4] for c in filtered]
+
+    def _has_new(self, cell, path):
+        """cell から path に沿って進むときに、まだ誰も探索していないマスを通るか"""
+        x, y = divmod(cell, self.cols)
+        for move in path:
+            dx, dy = NEIGHBOR_DELTAS[DIRECTION_CODES[move]]
+            x, y = x + dx, y + dy
+            if self.explored_by[x * self.cols + y] < 0:
+                return True
+        return False
+
+    # --- イベント ---
+
+    def _start_leg(self, agent, t, kind, path, steps, cost):
+        """agent に区間（path）を割り当て、最初の 1 マス目の移動をヒープに入れる"""
+        self.path[agent] = path
+        self.path_step[agent] = 0
+        self.leg_kind[agent] = kind
+        self.leg_steps[agent] = steps
+        self.leg_cost[agent] = cost
+        if path:
+            prev = self.prev_move[agent]
+            t += round(self.timing.move_time(path[0], DIRECTIONS[prev] if prev >= 0 else None))
+            heappush(self.events, (t, agent, STEP))
+        else:
+            self._finish_leg(agent, t)
+
+    def _finish_leg(self, agent, t):
+        """区間の終点に着いた"""
+        self.cost[agent] += self.leg_cost[agent]
+        if self.leg_kind[agent] == LEG_GOAL:
+            self.finish_time[agent] = t
+            return
+        # 意思決定ポイントを巡回済みにし、待機してから次を選ぶ
+        k = self.target[agent]
+        self.point_done_at[k] = t
+        self.target[agent] = -1
+        self.n_points[agent] += 1
+        self.visit_order[agent].append(self.decision_points[k])
+        t += round(self.timing.leg_wait(int(self.leg_steps[agent]), int(self.leg_cost[agent])))
+        heappush(self.events, (t, agent, DECIDE))
+
+    def _decide(self, agent, t):
+        tied = self.tied_candidates(agent)
+        if tied:
+            # (4) 複数あればランダムに選択
+            k, path, steps, cost = self.rng.choice(tied)
+            self.point_owner[k] = agent
+            self.target[agent] = k
+            self._start_leg(agent, t, LEG_POINT, path, steps, cost)
+            return
+        # 確保できる意思決定ポイントが無いのでゴールへ向かう（移動前に待機）
+        path, steps, cost = self.fields.route(self.fields.position(int(self.pos[agent])), self.goal)
+        if path is None:
+            self.finish_time[agent] = -1  # ゴールへ到達できない
+            return
+        t += round(self.timing.goal_wait(steps, cost))
+        self._start_leg(agent, t, LEG_GOAL, path, steps, cost)
+
+    def _step(self, agent, t):
+        i = int(self.path_step[agent])
+        path = self.path[agent]
+        move = path[i]
+        dx, dy = NEIGHBOR_DELTAS[DIRECTION_CODES[move]]
+        self.pos[agent] += dx * self.cols + dy
+        self.prev_move[agent] = DIRECTION_CODES[move]
+        self.n_moves[agent] += 1
+        if self.record_history:
+            self.move_history[agent].append((move, t))
+        self.mark_explored(agent, int(self.pos[agent]), t)
+        self.path_step[agent] = i + 1
+        if i + 1 < len(path):
+            t += round(self.timing.move_time(path[i + 1], move))
+            heappush(self.events, (t, agent, STEP))
+        else:
+            self._finish_leg(agent, t)
+
+    def run(self):
+        """
+        シミュレーションを実行し、結果の辞書（summary と同じ）を返す
+        全員がゴールに着く（またはゴールへ到達できない）まで続ける
+        """
+        n = self.n_agents
+        # 同じ seed なら同じ選択になるよう run の開始時に初期化する
+        self.rng = random.Random(self.seed)
+        # エージェントの状態
+        self.pos = np.array([self.fields.index(s) for s in self.starts], dtype=np.int64)
+        self.prev_move = np.full(n, -1, dtype=np.int8)
+        self.cost = np.zeros(n, dtype=np.int64)
+        self.n_moves = np.zeros(n, dtype=np.int64)
+        self.n_points = np.zeros(n, dtype=np.int64)
+        self.cells_explored = np.zeros(n, dtype=np.int64)
+        self.target = np.full(n, -1, dtype=np.int64)
+        self.finish_time = np.full(n, -1, dtype=np.int64)
+        self.leg_kind = np.zeros(n, dtype=np.int8)
+        self.leg_steps = np.zeros(n, dtype=np.int64)
+        self.leg_cost = np.zeros(n, dtype=np.int64)
+        self.path_step = np.zeros(n, dtype=np.int64)
+        self.path = [[] for _ in range(n)]
+        self.move_history = [[] for _ in range(n)]
+        self.visit_order = [[] for _ in range(n)]
+        # 共有の状態
+        self.explored_by = np.full(self.rows * self.cols, -1, dtype=np.int64)
+        self.explored_at = np.full(self.rows * self.cols, -1, dtype=np.int64)
+        self.n_visited = 0
+        self.coverage_time = None
+        self.point_owner = np.full(len(self.decision_points), -1, dtype=np.int64)
+        self.point_done_at = np.full(len(self.decision_points), -1, dtype=np.int64)
+        self.events = []
+
+        for agent in range(n):
+            self.mark_explored(agent, int(self.pos[agent]), 0)
+            heappush(self.events, (0, agent, DECIDE))
+        while self.events:
+            t, agent, kind = heappop(self.events)
+            if kind == STEP:
+                self._step(agent, t)
+            else:
+                self._decide(agent, t)
+        return self.summary()
+
+    def summary(self):
+        """
+        結果の辞書を返す
+            coverage_time : 到達できる全ての数字マスを探索済みにした時刻（ms，届かなければ None）
+            coverage      : 探索済みにしたマスの割合
+            points_time   : 全ての意思決定ポイントを巡回した時刻（ms，巡回できなければ None）
+            makespan      : 全員がゴールに着いた時刻（ms）
+            total_cost    : 全エージェントのコストの和
+            agents        : エージェントごとの辞書のリスト
+                            （cost, cost_share, moves, points, cells_explored, finish_time, visit_order）
+        """
+        total_cost = int(self.cost.sum())
+        done = self.point_done_at >= 0
+        agents = []
+        for a in range(self.n_agents):
+            agents.append({
+                'start': self.starts[a],
+                'cost': int(self.cost[a]),
+                'cost_share': float(self.cost[a]) / total_cost if total_cost else 0.0,
+                'moves': int(self.n_moves[a]),
+                'points': int(self.n_points[a]),
+                'cells_explored': int(self.cells_explored[a]),
+                'finish_time': int(self.finish_time[a]) if self.finish_time[a] >= 0 else None,
+                'visit_order': list(self.visit_order[a]),
+            })
+        return {
+            'n_agents': self.n_agents,
+            'coverage_time': self.coverage_time,
+            'coverage': self.n_visited / self.n_open if self.n_open else 0.0,
+            'points_time': int(self.point_done_at.max()) if len(done) and done.all() else None,
+            'makespan': int(self.finish_time.max()),
+            'total_cost': total_cost,
+            'agents': agents,
+        }
+
+
+def print_summary(summary):
+    """summary の内容を表示する"""
+    def ms(value):
+        return f"{value} ms" if value is not None else "-"
+
+    print(f"### エージェント数 {summary['n_agents']} ###")
+    print(f"カバー時間（全マス探索済み）: {ms(summary['coverage_time'])}（探索済み {summary['coverage']:.1%}）")
+    print(f"全意思決定ポイント巡回      : {ms(summary['points_time'])}")
+    print(f"全員ゴール                  : {ms(summary['makespan'])}")
+    print(f"総コスト                    : {summary['total_cost']}")
+    print(f"{'agent':>5} {'cost':>7} {'share':>6} {'moves':>6} {'points':>6} {'cells':>6} {'finish':>9}")
+    for a, s in enumerate(summary['agents']):
+        finish = s['finish_time'] if s['finish_time'] is not None else '-'
+        print(f"{a:>5} {s['cost']:>7} {s['cost_share']:>6.1%} {s['moves']:>6} {s['points']:>6} "
+              f"{s['cells_explored']:>6} {finish:>9}")
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python multi_agent.py <maze_file> <decision_point_file or \"x,y; x,y\"> [n_agents] [seed]")
+        sys.exit(1)
+    maze_file = sys.argv[1]
+    if os.path.isfile(sys.argv[2]):
+        decision_points = load_decision_points_from_file(sys.argv[2])
+    else:
+        decision_points = [parse_coordinate(s) for s in sys.argv[2].split(';') if s.strip()]
+    n_agents = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    simulator = MultiAgentSimulator(maze_file, decision_points, n_agents, seed=seed)
+    summary = simulator.run()
+    print(f"seed={simulator.seed}")
+    print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
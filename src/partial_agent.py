@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+partial_agent.py
+
+迷路の全体を知らない（部分観測の）エージェント．
+
+MazeAgent は最初から迷路全体を知っているものとして経路を計画するが、被験者が知っているのは
+mark_explored で見えたマス（いま居るマスから上下左右に伸びる通路と、その先の壁）だけである
+（note.txt の「大体の計画とローカルな計画」）．PartialMazeAgent は見えたマスだけを地図として持ち、
+まだ見えていないマスは「通れて、コストは最小（unknown_cost，既定 5）」と楽観的に仮定して計画する．
+
+- 経路の計画には D* Lite を使う．意思決定ポイント・ゴールごとに 1 つの DStarLite を持ち、
+  新しく見えたマスで地図が変わったときは、そのマスの周りの頂点だけを更新して再計算する（差分の再計画）．
+  ダイクストラ法を見えるたびにやり直すことはしない
+- 地図の変化は 1 本のログに追記し、各 DStarLite は使われるときに未反映の分だけを取り込む
+- 移動中に地図が変わったら、その区間の目的地までの経路を現在地から計画し直して進む．
+  いま居るマスの上下左右は常に見えているので、壁に入ろうとすることはない
+- 意思決定の規則（tied_candidates・choose_decision_point）と時間消費は MazeAgent と同じ．
+  区間のコスト・待機時間には、実際に通ったマスのコスト・ステップ数を使う
+- 迷路全体を最初から見せた場合（full_knowledge=True）は、経路とそのコストが MazeAgent と同じになる
+  （D* Lite の距離の下限には unknown_cost と迷路の最小のコストの小さい方を使う）
+
+使い方：
+    python src/partial_agent.py <迷路ファイル> <意思決定ポイントのファイル or "x,y; x,y; …"> [seed]
+"""
+
+import os
+import sys
+import math
+import time
+from heapq import heappush, heappop
+
+import numpy as np
+
+from agent import MazeAgent, load_decision_points_from_file, parse_coordinate
+from corpus import load_maze, find_start
+from distance_field import DIRECTION_NAMES, NEIGHBOR_DELTAS
+
+INF = math.inf
+
+
+class DStarLite:
+    """
+    1 つの目的地への D* Lite（目的地から逆向きに探索し、現在地が動いても探索結果を使い回す）
+
+    belief[セル番号] はそのマスに入るコスト（壁・迷路の外は INF）．
+    辺 s → s' の重みは belief[s'] * scale + 1 で、s が壁なら INF（bfs_path と同じく移動先のマスのコストを足し、
+    コストが同じ経路同士ではステップ数の少ないものを優先する．scale はどの経路のステップ数よりも大きい）
+    """
+
+    def __init__(self, belief, rows, cols, goal, start, min_cost=5):
+        self.belief = belief
+        self.rows = rows
+        self.cols = cols
+        self.goal = goal
+        self.start = start
+        self.last = start
+        self.min_cost = min_cost
+        self.scale = rows * cols + 1
+        self.km = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.queue = []
+        self.queued = {}   # セル番号 → キュー内での key（古いエントリは取り出すときに捨てる）
+        self.applied = 0   # 反映済みの地図の変化ログの長さ
+        self.expansions = 0
+        self._push(goal)
+
+    def neighbors(self, s):
+        r, c = divmod(s, self.cols)
+        result = []
+        for dr, dc in NEIGHBOR_DELTAS:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < self.rows and 0 <= nc < self.cols:
+                result.append(nr * self.cols + nc)
+        return result
+
+    def h(self, a, b):
+        """a と b の間の重みの下限（マンハッタン距離 × 最小コストの 1 マスの重み）"""
+        ar, ac = divmod(a, self.cols)
+        br, bc = divmod(b, self.cols)
+        return (abs(ar - br) + abs(ac - bc)) * (self.min_cost * self.scale + 1)
+
+    def edge(self, s, t):
+        if self.belief[s] == INF:
+            return INF
+        return self.belief[t] * self.scale + 1
+
+    def key(self, s):
+        m = min(self.g.get(s, INF), self.rhs.get(s, INF))
+        return (m + self.h(self.start, s) + self.km, m)
+
+    def _push(self, s):
+        k = self.key(s)
+        self.queued[s] = k
+        heappush(self.queue, (k, s))
+
+    def update_vertex(self, s):
+        if s != self.goal:
+            self.rhs[s] = min((self.edge(s, t) + self.g.get(t, INF) for t in self.neighbors(s)), default=INF)
+        if self.g.get(s, INF) != self.rhs.get(s, INF):
+            self._push(s)
+        else:
+            self.queued.pop(s, None)
+
+    def cells_changed(self, cells):
+        """cells のマスのコストが変わった（s → cell の辺と cell → s の辺が変わる）"""
+        for v in cells:
+            self.update_vertex(v)
+            for u in self.neighbors(v):
+                self.update_vertex(u)
+
+    def move_start(self, start):
+        """現在地を start に移す"""
+        if start != self.start:
+            self.km += self.h(self.last, start)
+            self.last = start
+            self.start = start
+
+    def compute(self):
+        """現在地の g が正しくなるまで探索を進める"""
+        start = self.start
+        while self.queue:
+            k_old, u = self.queue[0]
+            if self.queued.get(u) != k_old:
+                heappop(self.queue)  # 古いエントリ
+                continue
+            if not (k_old < self.key(start) or self.rhs.get(start, INF) != self.g.get(start, INF)):
+                break
+            heappop(self.queue)
+            del self.queued[u]
+            self.expansions += 1
+            k_new = self.key(u)
+            g_u, rhs_u = self.g.get(u, INF), self.rhs.get(u, INF)
+            if k_old < k_new:
+                self._push(u)
+            elif g_u > rhs_u:
+                self.g[u] = rhs_u
+                for s in self.neighbors(u):
+                    self.update_vertex(s)
+            else:
+                self.g[u] = INF
+                self.update_vertex(u)
+                for s in self.neighbors(u):
+                    self.update_vertex(s)
+
+    def route(self):
+        """
+        現在地から目的地への（いまの地図での）最短経路を返す
+        （コスト, ステップ数）が同じ次の一歩が複数あるときは、方向名の辞書順で選ぶ（distance_field と同じ）
+
+        戻り値：
+            (path, steps, cost)．到達不能の場合は (None, None, None)
+        """
+        self.compute()
+        s = self.start
+        weight = self.g.get(s, INF) if s != self.goal else 0
+        if weight == INF:
+            return None, None, None
+        path = []
+        while s != self.goal:
+            best = None
+            for name, (dr, dc) in sorted(zip(DIRECTION_NAMES, NEIGHBOR_DELTAS)):
+                r, c = divmod(s, self.cols)
+                nr, nc = r + dr, c + dc
+                if not (0 <= nr < self.rows and 0 <= nc < self.cols):
+                    continue
+                t = nr * self.cols + nc
+                total = self.edge(s, t) + (self.g.get(t, INF) if t != self.goal else 0)
+                if total == INF:
+                    continue
+                candidate = (total, name, t)
+                if best is None or candidate < best:
+                    best = candidate
+            if best is None or len(path) > self.rows * self.cols:
+                return None, None, None  # 探索結果が一貫しない（起こらないはず）
+            path.append(best[1])
+            s = best[2]
+        return path, len(path), int((weight - len(path)) / self.scale)
+
+
+class PartialMazeAgent(MazeAgent):
+    """見えたマスだけを地図にして D* Lite で計画するエージェント"""
+
+    def __init__(self, maze_file, decision_points, start, goal, timing=None, seed=None,
+                 unknown_cost=5, full_knowledge=False):
+        """
+        unknown_cost   : まだ見えていないマスに仮定するコスト（小さいほど楽観的．既定は最小のコスト 5）
+        full_knowledge : True なら最初から迷路全体を見えているものとする（MazeAgent と比べるため）
+        その他の引数は MazeAgent と同じ
+        """
+        super().__init__(maze_file, decision_points, start, goal, timing=timing, seed=seed)
+        self.unknown_cost = unknown_cost
+        self.full_knowledge = full_knowledge
+        # D* Lite の距離の下限に使う 1 マスのコスト．迷路の最小のコストより大きいと下限にならない
+        self.min_cost = min([float(unknown_cost)] + [int(c) for row in self.maze for c in row if c.isdigit()])
+
+    def _reset_knowledge(self):
+        """地図（belief）と計画器をまっさらにする"""
+        n = self.rows * self.cols
+        self.belief = np.full(n, float(self.unknown_cost))
+        self.known = np.zeros(n, dtype=bool)
+        self.change_log = []
+        self.planners = {}
+        if self.full_knowledge:
+            self.reveal([(i, j) for i in range(self.rows) for j in range(self.cols)])
+
+    def reveal(self, cells):
+        """cells のマスを見えたことにし、地図が変わったマスを変化ログに追記する"""
+        for i, j in cells:
+            s = i * self.cols + j
+            if self.known[s]:
+                continue
+            self.known[s] = True
+            cell = self.maze[i][j]
+            cost = float(int(cell)) if cell.isdigit() else INF
+            if cost != self.belief[s]:
+                self.belief[s] = cost
+                self.change_log.append(s)
+
+    def mark_explored(self, pos):
+        """
+        MazeAgent.mark_explored と同じマスを探索済みにし、見えたマス（通路と、その先で視線を遮る壁）を地図に加える
+        """
+        super().mark_explored(pos)
+        x, y = pos
+        seen = [pos]
+        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            nx, ny = x + dx, y + dy
+            while 0 <= nx < self.rows and 0 <= ny < self.cols:
+                seen.append((nx, ny))
+                if not self.maze[nx][ny].isdigit():
+                    break
+                nx += dx
+                ny += dy
+        self.reveal(seen)
+
+    def planner(self, goal):
+        """goal への DStarLite（無ければ作る）に未反映の地図の変化を取り込んで返す"""
+        g = goal[0] * self.cols + goal[1]
+        planner = self.planners.get(g)
+        if planner is None:
+            planner = self.planners[g] = DStarLite(self.belief, self.rows, self.cols, g,
+                                                   self.current_pos[0] * self.cols + self.current_pos[1],
+                                                   min_cost=self.min_cost)
+            planner.applied = len(self.change_log)
+        elif planner.applied < len(self.change_log):
+            planner.cells_changed(set(self.change_log[planner.applied:]))
+            planner.applied = len(self.change_log)
+        return planner
+
+    def bfs_path(self, start, goal):
+        """いまの地図での start から goal への最短経路（D* Lite で差分を再計画する）"""
+        planner = self.planner(goal)
+        planner.move_start(start[0] * self.cols + start[1])
+        return planner.route()
+
+    def simulate_path(self, path, path_cost, path_steps, wait_after=True):
+        """
+        path の終点へ移動する．途中で地図が変わったら、現在地から終点までを計画し直して進む
+        区間の待機時間・総コストには、実際に通ったマスのステップ数・コストを使う
+        （run が足す計画時のコストとの差を total_cost に足しておく）
+        途中で終点へ到達できないと分かった場合は、待機せずに False を返す（着いたら True）
+        """
+        dest = self.current_pos
+        for move in path:
+            dx, dy = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1), 'right': (0, 1)}[move]
+            dest = (dest[0] + dx, dest[1] + dy)
+        steps = cost = 0
+        remaining = list(path)
+        while self.current_pos != dest:
+            version = len(self.change_log)
+            move = remaining.pop(0)
+            prev_move = self.move_history[-1][0] if self.move_history else None
+            self.sim_time += round(self.timing.move_time(move, prev_move))
+            self.move_history.append((move, self.sim_time))
+            dx, dy = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1), 'right': (0, 1)}[move]
+            self.current_pos = (self.current_pos[0] + dx, self.current_pos[1] + dy)
+            steps += 1
+            cost += self.cell_cost(self.current_pos)
+            self.mark_explored(self.current_pos)
+            if len(self.change_log) != version and self.current_pos != dest:
+                self.n_replans += 1
+                remaining, _, _ = self.bfs_path(self.current_pos, dest)
+                if remaining is None:
+                    # 目的地へ到達できないことが分かった
+                    self.total_cost += cost - path_cost
+                    return False
+        self.total_cost += cost - path_cost
+        if wait_after:
+            self.sim_time += round(self.timing.leg_wait(steps, cost))
+        return True
+
+    def run(self):
+        self._reset_knowledge()
+        self.n_replans = 0
+        super().run()
+
+
+def compare(maze_file, decision_points, seed=None):
+    """
+    同じ seed で MazeAgent（全体を知っている）と PartialMazeAgent を実行し、結果と計算時間を返す
+    """
+    start = goal = find_start(load_maze(maze_file))
+    results = {}
+    for name, agent in [('full', MazeAgent(maze_file, decision_points, start, goal, seed=seed)),
+                        ('partial', PartialMazeAgent(maze_file, decision_points, start, goal, seed=seed))]:
+        t0 = time.perf_counter()
+        agent.run()
+        elapsed = time.perf_counter() - t0
+        results[name] = {
+            'seed': agent.seed,
+            'total_cost': agent.total_cost,
+            'sim_time': agent.sim_time,
+            'moves': len(agent.move_history),
+            'visit_order': agent.visit_order,
+            'elapsed_s': elapsed,
+            'replans': getattr(agent, 'n_replans', 0),
+        }
+    return results
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python partial_agent.py <maze_file> <decision_point_file or \"x,y; x,y\"> [seed]")
+        sys.exit(1)
+    maze_file = sys.argv[1]
+    if os.path.isfile(sys.argv[2]):
+        decision_points = load_decision_points_from_file(sys.argv[2])
+    else:
+        decision_points = [parse_coordinate(s) for s in sys.argv[2].split(';') if s.strip()]
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    results = compare(maze_file, decision_points, seed)
+    print(f"seed={results['full']['seed']}")
+    print(f"{'':>8} {'cost':>6} {'time':>8} {'moves':>6} {'replans':>8} {'elapsed':>9}")
+    for name, r in results.items():
+        print(f"{name:>8} {r['total_cost']:>6} {r['sim_time']:>8} {r['moves']:>6} {r['replans']:>8} "
+              f"{r['elapsed_s'] * 1000:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+patrol.py
+
+意思決定ポイントを巡回したら終わるシミュレーションではなく、迷路を長時間（数百万ステップ）巡回し続ける
+連続パトロールのシミュレータ．
+
+- 各マスについて「最後に見た時刻」last_seen を NumPy 配列で持つ．
+  見える範囲は MazeAgent.mark_explored と同じ（いま居るマスから上下左右に伸びる通路）で、
+  1 マス移動するごとにその範囲の last_seen を現在時刻にする
+- マスのアイドル時間（idleness）＝ 現在時刻 − last_seen．次の 2 つを最小化したい指標とする
+    平均アイドル時間 : アイドル時間をマスと時間について平均したもの
+                       （last_seen が更新されるたびに、その間隔 g について g^2/2 を積分に足していく）
+    最悪アイドル時間 : あるマスが見られなかった時間の最大値
+- 時間は ThinkTimeModel.move_time（既定 1 マス 20 ms）で進める（パトロール中は意思決定の待機をしない）
+- 方策（IdlenessGreedyPolicy）：いま見えていないマスのうちアイドル時間が最大のもの（同じなら最短コストで近いもの、
+  さらに同じならランダム）を目標にし、distance_field の最短経路で向かう．
+  目標のマスが途中で（通路の先に）見えたら、その時点で次の目標を選び直す
+- 移動履歴はメモリに溜めず、指定すればファイルに 1 行ずつ書き出す．
+  指標は log_every ステップごとに CSV に追記する
+
+出力（exp_data/patrol/ 以下）：
+    <迷路名>_patrol.csv : log_every ステップごとの指標
+                          （step, time_ms, cost, mean_idle_ms, max_idle_ms, avg_idleness_ms, worst_idleness_ms）
+    <迷路名>_patrol.npz : マスごとの last_seen, 最大の間隔（max_gap）, 見た回数（visits）, アイドル時間の積分（idle_integral）
+
+使い方：
+    python src/patrol.py <迷路ファイル> [ステップ数] [seed] [移動履歴の出力ファイル]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from corpus import load_maze, find_start, DIRECTIONS
+from distance_field import get_distance_fields, UNREACHABLE, NEIGHBOR_DELTAS
+from think_time_model import ThinkTimeModel
+from seeding import make_rng, record_seed
+
+PATROL_DIR = os.path.join("exp_data", "patrol")
+
+METRIC_COLUMNS = ['step', 'time_ms', 'cost', 'mean_idle_ms', 'max_idle_ms', 'avg_idleness_ms', 'worst_idleness_ms']
+
+
+class IdlenessGreedyPolicy:
+    """アイドル時間が最大のマス（同じなら近いもの）を目標にする方策"""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose_target(self, patrol, cell, t):
+        """
+        cell に居る時刻 t の次の目標のセル番号を返す（候補が無ければ None）
+        いま見えているマスは候補から外す
+        """
+        idle = np.where(patrol.candidate_mask, t - patrol.last_seen, -1)
+        idle[patrol.visible(cell)] = -1
+        best = idle.max()
+        if best < 0:
+            return None
+        candidates = np.flatnonzero(idle == best)
+        if len(candidates) > 1:
+            dist = np.asarray(patrol.fields.dist[cell, candidates])
+            candidates = candidates[dist == dist.min()]
+        return int(candidates[0]) if len(candidates) == 1 else int(self.rng.choice(list(candidates)))
+
+
+class Patrol:
+    """1 体のエージェントの連続パトロール"""
+
+    def __init__(self, maze_file, start=None, timing=None, policy=None, seed=None):
+        """
+        maze_file : 迷路ファイルのパス
+        start     : スタート位置．省略時は迷路の '5' のマス
+        timing    : 移動時間のモデル（ThinkTimeModel）．省略時は既定値
+        policy    : 目標を選ぶ方策（choose_target(patrol, cell, t) を持つもの）．省略時は IdlenessGreedyPolicy
+        seed      : 方策の同点のランダム選択に使う乱数の種
+        """
+        self.maze_file = maze_file
+        self.maze = load_maze(maze_file)
+        self.rows = len(self.maze)
+        self.cols = len(self.maze[0])
+        self.start = start if start is not None else find_start(self.maze)
+        self.timing = timing if timing is not None else ThinkTimeModel()
+        self.seed, self.rng = make_rng(seed)
+        self.policy = policy if policy is not None else IdlenessGreedyPolicy(self.rng)
+
+        self.fields = get_distance_fields(self.maze)
+        start_index = self.fields.index(self.start)
+        # スタートから到達できる数字マスだけを対象にする
+        self.candidate_mask = np.asarray(self.fields.dist[start_index]) != UNREACHABLE
+        self.n_cells = int(self.candidate_mask.sum())
+        self._visible_cache = {}
+        # 移動方向（セル番号の差 → 方向名）
+        self.step_names = {dr * self.cols + dc: name for name, (dr, dc) in zip(DIRECTIONS, NEIGHBOR_DELTAS)}
+
+    def visible(self, cell):
+        """セル番号 cell から見えるマス（cell と上下左右に連続する数字マス）のセル番号の配列（キャッシュする）"""
+        cells = self._visible_cache.get(cell)
+        if cells is None:
+            x, y = divmod(cell, self.cols)
+            found = [cell]
+            for dx, dy in NEIGHBOR_DELTAS:
+                nx, ny = x + dx, y + dy
+                while 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny].isdigit():
+                    found.append(nx * self.cols + ny)
+                    nx += dx
+                    ny += dy
+            cells = self._visible_cache[cell] = np.array(found, dtype=np.int64)
+        return cells
+
+    def observe(self, cell, t):
+        """cell から見えるマスの last_seen を t にし、アイドル時間の積分・最大の間隔を更新する"""
+        cells = self.visible(cell)
+        gap = t - self.last_seen[cells]
+        self.idle_integral[cells] += gap * gap / 2.0
+        self.max_gap[cells] = np.maximum(self.max_gap[cells], gap)
+        self.last_seen[cells] = t
+        self.visits[cells] += 1
+
+    def metrics(self, t):
+        """時刻 t での指標（METRIC_COLUMNS の step, cost 以外）を返す"""
+        mask = self.candidate_mask
+        idle = t - self.last_seen[mask]
+        # まだ閉じていない（最後に見てから今までの）区間も含める
+        integral = self.idle_integral[mask].sum() + (idle.astype(float) ** 2).sum() / 2.0
+        return {
+            'time_ms': int(t),
+            'mean_idle_ms': float(idle.mean()),
+            'max_idle_ms': int(idle.max()),
+            'avg_idleness_ms': integral / (self.n_cells * t) if t > 0 else 0.0,
+            'worst_idleness_ms': int(max(self.max_gap[mask].max(), idle.max())),
+        }
+
+    def _path_cells(self, cell, target):
+        """cell から target への最短経路のセル番号のリスト（cell は含まない）"""
+        next_hop = self.fields.next_hop
+        cells = []
+        while cell != target:
+            cell = int(next_hop[cell, target])
+            cells.append(cell)
+        return cells
+
+    def run(self, n_steps, log_every=10000, metrics_file=None, history_file=None):
+        """
+        n_steps ステップだけパトロールし、最後の指標の辞書を返す
+
+        metrics_file : log_every ステップごとの指標を書き出す CSV（None なら書き出さない）
+        history_file : 移動履歴（"_ 0" に続けて "方向 時刻" の行）を書き出すファイル（None なら書き出さない）
+        """
+        n = self.rows * self.cols
+        self.last_seen = np.zeros(n, dtype=np.int64)
+        self.max_gap = np.zeros(n, dtype=np.int64)
+        self.idle_integral = np.zeros(n, dtype=float)
+        self.visits = np.zeros(n, dtype=np.int64)
+        self.total_cost = 0
+        self.n_decisions = 0
+        cell_cost = np.asarray(self.fields.cell_cost)
+
+        metrics_out = open(metrics_file, 'w', encoding='utf-8') if metrics_file else None
+        history_out = open(history_file, 'w', encoding='utf-8') if history_file else None
+        try:
+            if metrics_out:
+                metrics_out.write(','.join(METRIC_COLUMNS) + '\n')
+            if history_out:
+                history_out.write("_ 0\n")
+
+            cell = self.fields.index(self.start)
+            t = 0
+            prev_move = None
+            self.observe(cell, t)
+            route = []
+            target = None
+            step = 0
+            while step < n_steps:
+                # 目標が無い・着いた・途中で見えた場合は選び直す
+                if not route or self.last_seen[target] == t:
+                    target = self.policy.choose_target(self, cell, t)
+                    self.n_decisions += 1
+                    if target is None:
+                        break  # 見えていないマスが無い（迷路全体が 1 本の通路から見える）
+                    route = self._path_cells(cell, target)
+                    route.reverse()
+                nxt = route.pop()
+                move = self.step_names[nxt - cell]
+                t += round(self.timing.move_time(move, prev_move))
+                prev_move = move
+                cell = nxt
+                self.total_cost += int(cell_cost[cell])
+                self.observe(cell, t)
+                step += 1
+                if history_out:
+                    history_out.write(f"{move} {t}\n")
+                if metrics_out and step % log_every == 0:
+                    self._write_metrics(metrics_out, step, t)
+            if metrics_out and step % log_every != 0:
+                self._write_metrics(metrics_out, step, t)
+        finally:
+            if metrics_out:
+                metrics_out.close()
+            if history_out:
+                history_out.close()
+        if history_file:
+            record_seed(history_file, self.seed, "patrol.Patrol")
+
+        self.steps = step
+        self.time_ms = t
+        result = self.metrics(t)
+        result.update({'step': step, 'cost': self.total_cost, 'decisions': self.n_decisions})
+        return result
+
+    def _write_metrics(self, out, step, t):
+        row = self.metrics(t)
+        row.update({'step': step, 'cost': self.total_cost})
+        out.write(','.join(f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c])
+                           for c in METRIC_COLUMNS) + '\n')
+
+    def save_cells(self, filename):
+        """マスごとの last_seen・最大の間隔・見た回数・アイドル時間の積分を .npz で保存する"""
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        shape = (self.rows, self.cols)
+        np.savez_compressed(filename, last_seen=self.last_seen.reshape(shape), max_gap=self.max_gap.reshape(shape),
+                            visits=self.visits.reshape(shape), idle_integral=self.idle_integral.reshape(shape),
+                            mask=self.candidate_mask.reshape(shape), time_ms=self.time_ms, steps=self.steps)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python patrol.py <maze_file> [n_steps] [seed] [history_file]")
+        sys.exit(1)
+    maze_file = sys.argv[1]
+    n_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    history_file = sys.argv[4] if len(sys.argv) > 4 else None
+
+    os.makedirs(PATROL_DIR, exist_ok=True)
+    base = os.path.join(PATROL_DIR, os.path.splitext(os.path.basename(maze_file))[0] + "_patrol")
+    patrol = Patrol(maze_file, seed=seed)
+    t0 = time.perf_counter()
+    result = patrol.run(n_steps, metrics_file=base + ".csv", history_file=history_file)
+    elapsed = time.perf_counter() - t0
+    patrol.save_cells(base + ".npz")
+
+    print(f"seed={patrol.seed}, {result['step']} steps in {elapsed:.1f} s ({result['decisions']} decisions)")
+    print(f"シミュレーション時間 : {result['time_ms']} ms, 総コスト {result['cost']}")
+    print(f"平均アイドル時間     : {result['avg_idleness_ms']:.1f} ms")
+    print(f"最悪アイドル時間     : {result['worst_idleness_ms']} ms")
+    print(f"指標を {base}.csv、マスごとの値を {base}.npz に保存しました．")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+perceived_cost.py
+
+経路を選ぶときに使う「見た目のコスト」の場（マスごとのコストの配列）を作り、キャッシュする．
+
+note.txt の agent_3 では、99999 を通る方が総コストは小さいのに、人間は「安く見えた」下の 66666 を選んでいた．
+bfs_path が使う真のコスト（移動先の数字の和）以外に、人間がどう見積もっているかの仮説を
+マスごとのコストの配列として用意し、MazeAgent（cost_field=名前）や likelihood（cost_field=名前）に渡して比べる．
+
+- 場は整数の配列で、単位は「コスト × COST_SCALE」．壁は -1
+  （distance_field の全セル間の最短経路表をそのまま使えるように整数にしている）
+    true        : 迷路の数字そのもの
+    run_mean    : そのマスを含む通路（上下左右に連続する数字マスのうち長い方向）の数字の平均
+    salient_min : 同じ通路の中で最も小さい数字（安い数字が目に付く）
+    contrast    : 数字 − 4（5→1, 9→5．数字の違いを長さより重く見る）
+- 曲がる回数を嫌う仮説は、場ではなく 1 回曲がるごとの加算（turn_penalty）として
+  MazeAgent.bfs_path と compare_routes の探索で扱う．turn_penalty も場と同じ「コスト × COST_SCALE」の単位
+  （turn_penalty=10 は 1 回曲がるごとにマスの数字 1 つ分を足す）．
+  全セル間の最短経路表は使えないので、MazeAgent(use_distance_cache=True) とは併用できない
+- 場は配列演算で一度に作り、迷路の内容のハッシュごとにリポジトリ直下の
+  exp_data/cache/cost_fields/<ハッシュ>/<名前>.npy に保存する
+- 曲がるときの加算を含む最小コスト（turn_aware_costs）は、(迷路, 場, 加算, 始点) ごとにメモリに覚えておく
+
+compare_routes は人間の移動履歴を 500 ms 以上の待ちで区間に分け、各仮説について
+「区間の経路がその仮説での最短経路になっている割合」と「最短に対する超過の平均」を求める．
+main はさらに likelihood のルール通りの選択モデルの 1 手あたりの対数尤度も並べて表示する．
+
+使い方：
+    python src/perceived_cost.py [exp_data ディレクトリ] [曲がるときの加算（カンマ区切り, 例: 10,20）]
+"""
+
+import os
+import sys
+import time
+from heapq import heappush, heappop
+
+import numpy as np
+
+from corpus import (load_maze, find_start, load_move_history, reconstruct_positions, think_times,
+                    pause_indices, iter_corpus)
+from distance_field import (CACHE_ROOT, get_distance_fields, maze_to_cost_grid, maze_hash, UNREACHABLE,
+                            NEIGHBOR_DELTAS)
+
+# 場の値の単位（コスト 1 = COST_SCALE）
+COST_SCALE = 10
+COST_FIELD_CACHE_DIR = os.path.join(CACHE_ROOT, "cost_fields")
+
+_memory_cache = {}
+_turn_memory_cache = {}
+
+
+def _horizontal_runs(cost_grid):
+    """
+    横方向に連続する数字マス（通路）ごとの長さ・数字の合計・最小値を、各マスの位置に並べて返す
+    壁のマスはいずれも 0
+    """
+    rows, cols = cost_grid.shape
+    digit = cost_grid >= 0
+    left = np.zeros_like(digit)
+    left[:, 1:] = digit[:, :-1]
+    run_id = np.cumsum((digit & ~left).ravel()) - 1
+    idx = np.flatnonzero(digit.ravel())
+    ids = run_id[idx]
+    values = cost_grid.ravel()[idx]
+    n_runs = int(ids.max()) + 1 if len(ids) else 0
+    length = np.bincount(ids, minlength=n_runs)
+    total = np.bincount(ids, weights=values, minlength=n_runs)
+    minimum = np.full(n_runs, np.iinfo(np.int32).max, dtype=np.int64)
+    np.minimum.at(minimum, ids, values)
+
+    out = []
+    for per_run in (length, total, minimum):
+        arr = np.zeros(rows * cols, dtype=float)
+        arr[idx] = per_run[ids]
+        out.append(arr.reshape(rows, cols))
+    return out
+
+
+def _along_corridor(cost_grid, statistic):
+    """
+    各マスについて、そのマスを含む横・縦の通路のうち長い方の statistic(長さ, 合計, 最小) を返す
+    （長さが同じなら横と縦の平均）
+    """
+    h = _horizontal_runs(cost_grid)
+    v = [a.T for a in _horizontal_runs(cost_grid.T)]
+    h_value, v_value = statistic(*h), statistic(*v)
+    h_len, v_len = h[0], v[0]
+    return np.where(h_len > v_len, h_value, np.where(v_len > h_len, v_value, (h_value + v_value) / 2))
+
+
+def _to_field(cost_grid, values):
+    """コスト（実数）を COST_SCALE 倍した整数の場にする（壁は -1）"""
+    field = np.rint(np.asarray(values, dtype=float) * COST_SCALE).astype(np.int32)
+    return np.where(cost_grid >= 0, np.maximum(field, 0), -1).astype(np.int32)
+
+
+def true_field(cost_grid):
+    """迷路の数字そのもの"""
+    return _to_field(cost_grid, cost_grid)
+
+
+def run_mean_field(cost_grid):
+    """通路の数字の平均"""
+    return _to_field(cost_grid, _along_corridor(cost_grid, lambda length, total, minimum:
+                                                total / np.maximum(length, 1)))
+
+
+def salient_min_field(cost_grid):
+    """通路の中で最も小さい数字"""
+    return _to_field(cost_grid, _along_corridor(cost_grid, lambda length, total, minimum: minimum))
+
+
+def contrast_field(cost_grid):
+    """数字 − 4（最も安い 5 を 1 とする）"""
+    return _to_field(cost_grid, cost_grid - 4)
+
+
+COST_FIELDS = {
+    'true': true_field,
+    'run_mean': run_mean_field,
+    'salient_min': salient_min_field,
+    'contrast': contrast_field,
+}
+
+
+def get_cost_field(maze, name, cache_dir=COST_FIELD_CACHE_DIR):
+    """
+    迷路の名前 name の場（(rows, cols) の int32 配列）を返す
+    メモリ → ディスク（cache_dir/<迷路のハッシュ>/<名前>.npy）の順に探し、無ければ作って保存する
+    cache_dir=None ならディスクは使わない
+    """
+    if name not in COST_FIELDS:
+        raise ValueError(f"未知のコストの場です: {name}（{', '.join(COST_FIELDS)} のいずれか）")
+    key = (maze_hash(maze), name)
+    if key in _memory_cache:
+        return _memory_cache[key]
+    path = os.path.join(cache_dir, key[0], f"{name}.npy") if cache_dir is not None else None
+    if path is not None and os.path.isfile(path):
+        field = np.load(path)
+    else:
+        field = COST_FIELDS[name](maze_to_cost_grid(maze))
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, field)
+            os.replace(tmp_path, path)
+    _memory_cache[key] = field
+    return field
+
+
+def turn_aware_costs(field, source, turn_penalty):
+    """
+    セル番号 source から各セルへの、場のコスト＋曲がるごとに turn_penalty（場と同じ単位）を足した最小コストを返す
+    （状態を（セル, 最後に動いた方向）にしたダイクストラ法．最初の一歩は曲がりに数えない．到達不能は UNREACHABLE）
+    """
+    rows, cols = field.shape
+    cell_cost = field.ravel()
+    n = rows * cols
+    best = np.full((n, len(NEIGHBOR_DELTAS)), UNREACHABLE, dtype=np.int64)
+    heap = [(0, source, -1)]
+    done = {}
+    while heap:
+        d, cell, last = heappop(heap)
+        if (cell, last) in done:
+            continue
+        done[(cell, last)] = d
+        if last >= 0:
+            best[cell, last] = min(best[cell, last], d)
+        r, c = divmod(cell, cols)
+        for k, (dr, dc) in enumerate(NEIGHBOR_DELTAS):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols:
+                nxt = nr * cols + nc
+                if cell_cost[nxt] >= 0 and (nxt, k) not in done:
+                    nd = d + int(cell_cost[nxt]) + (turn_penalty if 0 <= last != k else 0)
+                    heappush(heap, (nd, nxt, k))
+    costs = best.min(axis=1)
+    costs[source] = 0
+    return costs
+
+
+def history_legs(positions, waits, threshold_ms=500):
+    """
+    threshold_ms 以上の待ちで移動履歴を区切った区間 (開始の手, 終わりの手) のリストを返す
+    （positions[a] から positions[b] まで．同じマスに戻る区間は除く）
+    """
+    bounds = [0] + [int(m) for m in pause_indices(waits, threshold_ms) if m > 0] + [len(waits)]
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:])
+            if b > a and tuple(positions[a]) != tuple(positions[b])]
+
+
+def compare_routes(maze, codes, timestamps, start_time, names=None, turn_penalties=(0,), threshold_ms=500):
+    """
+    1つの移動履歴の各区間について、仮説（場の名前, 曲がるときの加算）ごとの
+    人間の経路のコストと、その仮説での最短経路のコストを求める（曲がるときの加算は場と同じ単位）
+
+    戻り値：
+        {(name, turn_penalty): (人間の経路のコストの配列, 最短経路のコストの配列)}
+    """
+    names = list(COST_FIELDS) if names is None else names
+    start = find_start(maze)
+    positions = reconstruct_positions(start, codes)
+    legs = history_legs(positions, think_times(start_time, timestamps), threshold_ms)
+    cols = len(maze[0])
+    pos_idx = positions[:, 0] * cols + positions[:, 1]
+    a = np.array([leg[0] for leg in legs], dtype=np.int64)
+    b = np.array([leg[1] for leg in legs], dtype=np.int64)
+    # 区間 [a, b) の中で曲がった回数（区間の最初の一歩は数えない）
+    turned = np.zeros(len(codes) + 1, dtype=np.int64)
+    turned[2:] = np.cumsum(codes[1:] != codes[:-1])
+    turns = turned[b] - turned[np.minimum(a + 1, b)]
+
+    digest = maze_hash(maze)
+    result = {}
+    for name in names:
+        field = get_cost_field(maze, name)
+        cum = np.concatenate([[0], np.cumsum(field.ravel()[pos_idx[1:]].astype(np.int64))])
+        along = cum[b] - cum[a]
+        fields = get_distance_fields(maze, cost_grid=field) if 0 in turn_penalties else None
+        for turn_penalty in turn_penalties:
+            human = along + turn_penalty * turns
+            if turn_penalty == 0:
+                best = np.asarray(fields.dist[pos_idx[a], pos_idx[b]]).astype(np.int64)
+            else:
+                best = np.empty(len(legs), dtype=np.int64)
+                for i, (s, t) in enumerate(zip(pos_idx[a], pos_idx[b])):
+                    key = (digest, name, turn_penalty, int(s))
+                    if key not in _turn_memory_cache:
+                        _turn_memory_cache[key] = turn_aware_costs(field, int(s), turn_penalty)
+                    best[i] = _turn_memory_cache[key][t]
+            result[(name, turn_penalty)] = (human, best)
+    return result
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    turn_penalties = [0] + [int(v) for v in sys.argv[2].split(',') if v.strip()] if len(sys.argv) > 2 else [0]
+    names = list(COST_FIELDS)
+    pairs = iter_corpus(data_dir)
+    if not pairs:
+        print(f"{data_dir} に迷路と移動履歴の組がありません．")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    human = {}
+    best = {}
+    for maze_file, history_file in pairs:
+        maze = load_maze(maze_file)
+        start_time, codes, timestamps = load_move_history(history_file)
+        for key, (h, b) in compare_routes(maze, codes, timestamps, start_time, names, turn_penalties).items():
+            human.setdefault(key, []).append(h)
+            best.setdefault(key, []).append(b)
+    route_time = time.perf_counter() - t0
+
+    # ルール通りの選択モデルの対数尤度（場ごと．曲がりの加算は扱わない）
+    from likelihood import load_corpus_features, log_likelihood
+    t0 = time.perf_counter()
+    loglik = {}
+    for name in names:
+        features = load_corpus_features(data_dir, cost_field=name)
+        values = np.concatenate([log_likelihood(f) for f in features])
+        loglik[name] = float(values.mean()) if len(values) else float('nan')
+    likelihood_time = time.perf_counter() - t0
+
+    print(f"{len(pairs)} 個の履歴，{sum(len(h) for h in human[(names[0], 0)])} 区間"
+          f"（経路の比較 {route_time:.2f} s，尤度 {likelihood_time:.2f} s）")
+    print(f"{'仮説':<24}{'最短と一致':>10}{'超過の平均':>12}{'対数尤度/手':>14}")
+    for name in names:
+        for turn_penalty in turn_penalties:
+            h = np.concatenate(human[(name, turn_penalty)])
+            b = np.concatenate(best[(name, turn_penalty)])
+            ok = b != UNREACHABLE
+            match = float((h[ok] <= b[ok]).mean()) if ok.any() else float('nan')
+            excess = float(((h[ok] - b[ok]) / np.maximum(b[ok], 1)).mean()) if ok.any() else float('nan')
+            label = name if turn_penalty == 0 else f"{name}+turn{turn_penalty}"
+            ll = f"{loglik[name]:.3f}" if turn_penalty == 0 else "-"
+            print(f"{label:<24}{match:>10.1%}{excess:>12.1%}{ll:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+reason_log.py
+
+リプレイ中に入力された操作内容・理由のログ（operation_reason_log）を扱うモジュール．
+
+- 1回の入力を 1 行の JSON（JSON Lines 形式，拡張子 .jsonl）として保存する
+    {"direction": "down", "timestamp_ms": 1737698784840, "wait_time_s": 2.959,
+     "coordinates": [0, 2], "operation": "...", "reason": "..."}
+- ReasonLogWriter は入力をメモリにためておき、flush_every 件ごとにまとめて書き込み、
+  セッション終了時（close）に fsync する．ファイルは最初に入力を書き込むときに作る（入力が無ければ作らない）
+- load_reason_log は .jsonl と従来のテキスト形式（Direction: … / ------- 区切り）の両方を読み、
+  座標・待ち時間などを NumPy 配列で返す
+- export_text で従来のテキスト形式に書き出せる
+
+使い方：
+    python src/reason_log.py export <log.jsonl> [out.txt]   # テキスト形式に書き出す
+    python src/reason_log.py convert <log.txt> [out.jsonl]  # テキスト形式から変換する
+"""
+
+import os
+import sys
+import json
+
+import numpy as np
+
+# 従来のテキスト形式の見出し
+_TEXT_KEYS = {
+    'Direction': 'direction',
+    'Timestamp(ms)': 'timestamp_ms',
+    'WaitTime(s)': 'wait_time_s',
+    'Coordinates': 'coordinates',
+    'Operation': 'operation',
+    'Reason': 'reason',
+}
+
+
+def unique_log_paths(directory, base="operation_reason_log"):
+    """
+    .jsonl と .txt（書き出し用）のどちらも存在しない base{_n} を探し、2つのパスを返す
+    """
+    os.makedirs(directory, exist_ok=True)
+    counter = 0
+    while True:
+        name = base if counter == 0 else f"{base}_{counter}"
+        jsonl_path = os.path.join(directory, f"{name}.jsonl")
+        text_path = os.path.join(directory, f"{name}.txt")
+        if not os.path.exists(jsonl_path) and not os.path.exists(text_path):
+            return jsonl_path, text_path
+        counter += 1
+
+
+class ReasonLogWriter:
+    """操作内容・理由をためておき、まとめて JSON Lines として書き込む"""
+
+    def __init__(self, filepath, flush_every=10):
+        self.filepath = filepath
+        self.flush_every = flush_every
+        self.buffer = []
+        self.count = 0
+        self.written = False
+
+    def append(self, operation, reason, direction, timestamp_ms, wait_time, coordinates):
+        """1回分の入力を追加する"""
+        x, y = coordinates
+        self.buffer.append({
+            'direction': direction,
+            'timestamp_ms': int(timestamp_ms),
+            'wait_time_s': round(float(wait_time), 3),
+            'coordinates': [int(x), int(y)],
+            'operation': operation,
+            'reason': reason,
+        })
+        self.count += 1
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self, sync=False):
+        """ためておいた入力をファイルに追記する（sync=True なら fsync まで行う）"""
+        if not self.buffer and (not sync or not self.written):
+            # まだ何も書いていなければ空のファイルを作らない
+            return
+        self.written = True
+        with open(self.filepath, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.buffer))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.buffer = []
+
+    def close(self):
+        """セッション終了時に呼ぶ．残りを書き込んで fsync する"""
+        self.flush(sync=True)
+        if self.count:
+            print(f"{self.count} operation(s) and reason(s) saved to {self.filepath}.")
+        else:
+            print("No operation or reason was entered; no log file was written.")
+
+
+def _read_text_entries(filepath):
+    """従来のテキスト形式のログを読み、エントリの辞書のリストを返す"""
+    entries = []
+    entry = {}
+    last_key = None
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('-------'):
+                if entry:
+                    entries.append(entry)
+                entry = {}
+                last_key = None
+                continue
+            key, sep, value = line.partition(':')
+            if sep and key in _TEXT_KEYS:
+                last_key = _TEXT_KEYS[key]
+                entry[last_key] = value.strip()
+            elif last_key in ('operation', 'reason'):
+                # 操作内容・理由が複数行にわたる場合
+                entry[last_key] += '\n' + line
+    if entry:
+        entries.append(entry)
+
+    for entry in entries:
+        if 'timestamp_ms' in entry:
+            entry['timestamp_ms'] = int(entry['timestamp_ms'])
+        if 'wait_time_s' in entry:
+            entry['wait_time_s'] = float(entry['wait_time_s'])
+        if 'coordinates' in entry:
+            x, y = entry['coordinates'].strip('()').split(',')
+            entry['coordinates'] = [int(x), int(y)]
+    return entries
+
+
+def read_entries(filepath):
+    """ログ（.jsonl またはテキスト形式）を読み、エントリの辞書のリストを返す"""
+    if filepath.endswith('.jsonl'):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return _read_text_entries(filepath)
+
+
+def load_reason_log(filepath):
+    """
+    ログを読み込み、各項目を配列として返す
+
+    戻り値：
+        dict
+            coordinates  : (N, 2) int の座標（＝意思決定ポイント）
+            wait_time_s  : (N,) float
+            timestamp_ms : (N,) int64
+            direction, operation, reason : 長さ N のリスト
+        座標の無い古い形式のエントリは除く
+    """
+    entries = [e for e in read_entries(filepath) if 'coordinates' in e]
+    return {
+        'coordinates': np.array([e['coordinates'] for e in entries], dtype=np.int64).reshape(-1, 2),
+        'wait_time_s': np.array([e.get('wait_time_s', np.nan) for e in entries], dtype=float),
+        'timestamp_ms': np.array([e.get('timestamp_ms', -1) for e in entries], dtype=np.int64),
+        'direction': [e.get('direction') for e in entries],
+        'operation': [e.get('operation', '') for e in entries],
+        'reason': [e.get('reason', '') for e in entries],
+    }
+
+
+def export_text(entries, text_path):
+    """エントリを従来のテキスト形式で書き出す"""
+    with open(text_path, 'w', encoding='utf-8') as f:
+        for e in entries:
+            f.write(f"Direction: {e['direction']}\n")
+            f.write(f"Timestamp(ms): {e['timestamp_ms']}\n")
+            f.write(f"WaitTime(s): {e['wait_time_s']:.3f}\n")
+            if 'coordinates' in e:
+                x, y = e['coordinates']
+                f.write(f"Coordinates: ({x},{y})\n")
+            f.write(f"Operation: {e['operation']}\n")
+            f.write(f"Reason: {e['reason']}\n")
+            f.write("-------\n")
+
+
+def write_jsonl(entries, jsonl_path):
+    """エントリを JSON Lines 形式で書き出す"""
+    with open(jsonl_path, 'w', encoding='utf-8') as f:
+        for e in entries:
+            f.write(json.dumps(e, ensure_ascii=False) + '\n')
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'convert'):
+        print("Usage: python reason_log.py export <log.jsonl> [out.txt]")
+        print("       python reason_log.py convert <log.txt> [out.jsonl]")
+        sys.exit(1)
+    command, src = sys.argv[1], sys.argv[2]
+    base = os.path.splitext(src)[0]
+    entries = read_entries(src)
+    if command == 'export':
+        dst = sys.argv[3] if len(sys.argv) > 3 else base + '.txt'
+        export_text(entries, dst)
+    else:
+        dst = sys.argv[3] if len(sys.argv) > 3 else base + '.jsonl'
+        write_jsonl(entries, dst)
+    print(f"{len(entries)} entries written to {dst}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+seeding.py
+
+乱数の種（seed）の扱いをまとめた補助モジュール．
+
+- 迷路生成やエージェントは、グローバルな random ではなく random.Random(seed) を受け取って使う
+- seed を指定しなかった場合も OS の乱数から seed を決めて記録するので、後から同じ結果を再現できる
+- 並列実行する場合は spawn_seeds で親の seed から子の seed を決める．
+  子の seed は実行順・並列数によらないため、並列実行と逐次実行の結果をビット単位で比較できる
+- 生成物と seed の対応は exp_data/seed_log.jsonl に 1 行ずつ追記する
+"""
+
+import os
+import json
+import time
+import random
+
+import numpy as np
+
+SEED_LOG = os.path.join("exp_data", "seed_log.jsonl")
+
+
+def new_seed():
+    """OS の乱数から 32bit の seed を作る"""
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def make_rng(seed=None):
+    """(seed, random.Random(seed)) を返す．seed が None なら新しく作る"""
+    if seed is None:
+        seed = new_seed()
+    return seed, random.Random(seed)
+
+
+def spawn_seeds(seed, n):
+    """親の seed から n 個の子の seed を作る（numpy.random.SeedSequence を使用）"""
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(n)]
+
+
+def record_seed(output_path, seed, source, log_path=SEED_LOG, **extra):
+    """
+    生成物 output_path を作ったときの seed を log_path に追記する
+    source には生成したプログラム（例："maze_game.generate_random_maze"）を入れる
+    """
+    directory = os.path.dirname(log_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    entry = {"file": output_path, "seed": seed, "source": source, "time_ms": int(time.time() * 1000)}
+    entry.update(extra)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+session_index.py
+
+実験セッション（迷路ファイル・移動履歴・理由ログ・seed・時刻）の対応を
+SQLite（exp_data/sessions.sqlite3）で管理するモジュール．
+
+- 新しいセッションの ID は INSERT 1 回で決まる（複数プロセスから同時に作っても重複しない）
+- セッションのファイル名は ID をサフィックスにする（例：ID=8 → generated_maze_8.txt, move_history_8.txt）
+  ので、ファイルの存在を 1 つずつ確かめて空き番号を探す必要が無い
+- 「最新のセッション」は ID 最大の行を 1 回引くだけで分かる
+- 索引を通さずに作られたファイル（単独で実行したゲームなど）と同じ番号の ID は使わず、
+  そのファイルのセッションとして登録して次の ID を取る（既存のファイルを上書き・追記しない）
+- 初めて作るときは、既存の exp_data のファイルをサフィックスの番号を ID として登録する
+  （サフィックス無しのファイルは ID=0）
+
+使い方：
+    python src/session_index.py [exp_data ディレクトリ]   # セッションの一覧を表示する
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+
+INDEX_FILENAME = "sessions.sqlite3"
+COLUMNS = ['id', 'created_ms', 'finished_ms', 'maze_file', 'history_file', 'reason_log', 'seed']
+# (exp_data 以下のディレクトリ, ファイル名の接頭辞, 列, 拡張子)．理由ログは .jsonl を優先する
+SESSION_FILES = [("maze", "generated_maze", "maze_file", (".txt",)),
+                 ("move_history", "move_history", "history_file", (".txt",)),
+                 ("reasons", "operation_reason_log", "reason_log", (".jsonl", ".txt"))]
+
+
+def session_filename(directory, filename, session_id):
+    """セッション ID をサフィックスにしたファイル名を返す（例：move_history.txt, 8 → move_history_8.txt）"""
+    os.makedirs(directory, exist_ok=True)
+    base, ext = os.path.splitext(filename)
+    suffix = "" if session_id == 0 else f"_{session_id}"
+    return os.path.join(directory, f"{base}{suffix}{ext}")
+
+
+class SessionIndex:
+    """実験セッションの索引"""
+
+    def __init__(self, data_dir="exp_data"):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self.path = os.path.join(data_dir, INDEX_FILENAME)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            created = self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='sessions'").fetchone() is None
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_ms INTEGER NOT NULL,
+                    finished_ms INTEGER,
+                    maze_file TEXT,
+                    history_file TEXT,
+                    reason_log TEXT,
+                    seed INTEGER
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_history ON sessions (history_file)")
+        if created:
+            self.import_existing()
+
+    def import_existing(self):
+        """既存の exp_data のファイルを、ファイル名のサフィックスの番号を ID として登録する"""
+        found = {}
+        for sub, prefix, column, _ in SESSION_FILES:
+            directory = os.path.join(self.data_dir, sub)
+            if not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                m = re.fullmatch(rf"{prefix}(?:_(\d+))?\.(txt|jsonl)", filename)
+                if not m:
+                    continue
+                session_id = int(m.group(1) or 0)
+                path = os.path.join(directory, filename)
+                entry = found.setdefault(session_id, {'created_ms': int(os.path.getmtime(path) * 1000)})
+                # .jsonl と .txt の両方がある理由ログは .jsonl を優先する
+                if column not in entry or filename.endswith('.jsonl'):
+                    entry[column] = path
+        with self.conn:
+            for session_id, entry in sorted(found.items()):
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO sessions (id, created_ms, maze_file, history_file, reason_log) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session_id, entry['created_ms'], entry.get('maze_file'),
+                     entry.get('history_file'), entry.get('reason_log')))
+        if found:
+            print(f"Imported {len(found)} existing session(s) into {self.path}.")
+
+    def existing_files(self, session_id):
+        """ID をサフィックスにしたファイルのうち、既に存在するものを {列: パス} で返す"""
+        found = {}
+        for sub, prefix, column, extensions in SESSION_FILES:
+            for ext in extensions:
+                path = os.path.join(self.data_dir, sub, prefix + ("" if session_id == 0 else f"_{session_id}") + ext)
+                if os.path.exists(path):
+                    found[column] = path
+                    break
+        return found
+
+    def new_session(self, maze_file=None, seed=None):
+        """
+        新しいセッションを作り、その ID を返す
+        その ID のファイルが既にあれば、それらのセッションとして登録して次の ID を取り直す
+        """
+        while True:
+            with self.conn:
+                cur = self.conn.execute(
+                    "INSERT INTO sessions (created_ms, maze_file, seed) VALUES (?, ?, ?)",
+                    (int(time.time() * 1000), maze_file, seed))
+            session_id = cur.lastrowid
+            existing = self.existing_files(session_id)
+            if not existing:
+                return session_id
+            # 索引を通さずに作られたファイルのセッションとして登録し直す
+            fields = {'maze_file': None, 'seed': None}
+            fields.update(existing)
+            self.update(session_id, **fields)
+            print(f"Session #{session_id} already has files ({', '.join(existing.values())}); skipping it.")
+
+    def update(self, session_id, **fields):
+        """セッションの項目（maze_file, history_file, reason_log, seed, finished_ms）を更新する"""
+        unknown = set(fields) - set(COLUMNS[1:])
+        if unknown:
+            raise ValueError(f"Unknown session field(s): {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.conn:
+            self.conn.execute(f"UPDATE sessions SET {assignments} WHERE id = ?",
+                              (*fields.values(), session_id))
+
+    def get(self, session_id):
+        """セッションを辞書で返す（無ければ None）"""
+        row = self.conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def latest(self, require="history_file"):
+        """require の項目が埋まっているセッションのうち最新のものを返す（無ければ None）"""
+        row = self.conn.execute(
+            f"SELECT * FROM sessions WHERE {require} IS NOT NULL ORDER BY id DESC LIMIT 1").fetchone()
+        return dict(row) if row is not None else None
+
+    def find_by_history(self, history_file):
+        """移動履歴ファイルのパスからセッションを返す（無ければ None）"""
+        row = self.conn.execute(
+            "SELECT * FROM sessions WHERE history_file = ? ORDER BY id DESC LIMIT 1",
+            (history_file,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def sessions(self):
+        """全セッションを ID 順に返す"""
+        return [dict(row) for row in self.conn.execute("SELECT * FROM sessions ORDER BY id")]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    index = SessionIndex(data_dir)
+    for s in index.sessions():
+        print(f"#{s['id']}: maze={s['maze_file']}, history={s['history_file']}, "
+              f"reasons={s['reason_log']}, seed={s['seed']}")
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+telemetry.py
+
+ゲーム（exp/maze_game.py）とリプレイ（exp/maze_replay.py）の描画・入力の遅れを記録する補助モジュール．
+描画が詰まって被験者の思考時間（移動間隔）が水増しされていないかを後から確かめるために使う．
+
+- フレームごとに記録する値（frames）
+    t_ms      : フレーム開始時刻（エポック ms，移動履歴と同じ時計）
+    frame_ms  : 前のフレームの開始からの時間
+    render_ms : 描画（fill〜flip）にかかった時間
+    events    : そのフレームで取り出したイベントの数（イベントキューの深さ）
+    missed    : frame_ms の間に取りこぼした tick の数（1000/fps ms を 1 tick とする）
+- 入力ごとに記録する値（inputs）
+    t_ms        : 移動履歴に記録した時刻
+    poll_gap_ms : 直前のフレームでイベントを取り出してから記録までの時間
+                  （キーはこの間のどこかで押されているので、押してから記録までの遅れの上限）
+    handle_ms   : このフレームでイベントを取り出してから記録までの時間（遅れの下限）
+- どちらも固定長のリングバッファ（NumPy の構造化配列）に書き込むので、長いセッションでもメモリは増えない
+- 移動履歴と同じ名前で exp_data/telemetry/ に .npz として保存する
+"""
+
+import os
+import time
+
+import numpy as np
+
+TELEMETRY_DIR = os.path.join("exp_data", "telemetry")
+
+FRAME_DTYPE = np.dtype([('t_ms', np.int64), ('frame_ms', np.float32), ('render_ms', np.float32),
+                        ('events', np.int16), ('missed', np.int16)])
+INPUT_DTYPE = np.dtype([('t_ms', np.int64), ('poll_gap_ms', np.float32), ('handle_ms', np.float32)])
+
+
+class RingBuffer:
+    """固定長のリングバッファ（古いものから上書きする）"""
+
+    def __init__(self, dtype, capacity):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.count = 0  # これまでに書き込んだ総数
+
+    def append(self, *values):
+        self.data[self.count % len(self.data)] = values
+        self.count += 1
+
+    def ordered(self):
+        """残っている記録を古い順に返す"""
+        capacity = len(self.data)
+        if self.count <= capacity:
+            return self.data[:self.count].copy()
+        i = self.count % capacity
+        return np.concatenate([self.data[i:], self.data[:i]])
+
+
+def telemetry_path(history_file, suffix="", directory=TELEMETRY_DIR):
+    """移動履歴のファイル名に対応する記録の保存先を返す（例：move_history_8.txt → move_history_8.npz）"""
+    base = os.path.splitext(os.path.basename(history_file))[0]
+    return os.path.join(directory, f"{base}{suffix}.npz")
+
+
+class SessionTelemetry:
+    """
+    1 セッション分のフレーム・入力の記録
+
+    ゲームループの中で次の順に呼ぶ：
+        frame_start() → events_polled(len(events)) → （入力を記録したら record_input(t_ms)）
+        → render_start() → 描画 → render_end()
+    """
+
+    def __init__(self, fps=30, capacity=8192):
+        self.fps = fps
+        self.frames = RingBuffer(FRAME_DTYPE, capacity)
+        self.inputs = RingBuffer(INPUT_DTYPE, capacity)
+        self._frame_t = None       # フレーム開始時刻（perf_counter）
+        self._frame_ms = 0         # フレーム開始時刻（エポック ms）
+        self._render_t = None
+        self._render_ms = 0.0
+        self._events = 0
+        self._poll_ms = None       # このフレームでイベントを取り出した時刻（エポック ms）
+        self._prev_poll_ms = None  # 直前のフレームでイベントを取り出した時刻（エポック ms）
+
+    def frame_start(self):
+        """フレームの開始．前のフレームの記録を確定する"""
+        now = time.perf_counter()
+        if self._frame_t is not None:
+            frame_ms = (now - self._frame_t) * 1000
+            missed = max(0, int(frame_ms * self.fps / 1000) - 1)
+            self.frames.append(self._frame_ms, frame_ms, self._render_ms, self._events, missed)
+        self._frame_t = now
+        self._frame_ms = int(time.time() * 1000)
+        self._render_ms = 0.0
+        self._events = 0
+
+    def events_polled(self, n_events):
+        """pygame.event.get() で n_events 個のイベントを取り出した"""
+        self._prev_poll_ms = self._poll_ms
+        self._poll_ms = int(time.time() * 1000)
+        self._events = n_events
+
+    def record_input(self, timestamp_ms):
+        """入力（移動）を timestamp_ms（エポック ms）として記録した"""
+        if self._poll_ms is None:
+            return
+        poll_gap = timestamp_ms - (self._prev_poll_ms if self._prev_poll_ms is not None else self._poll_ms)
+        self.inputs.append(timestamp_ms, poll_gap, timestamp_ms - self._poll_ms)
+
+    def render_start(self):
+        self._render_t = time.perf_counter()
+
+    def render_end(self):
+        if self._render_t is not None:
+            self._render_ms += (time.perf_counter() - self._render_t) * 1000
+            self._render_t = None
+
+    def summary(self):
+        """記録の要約（辞書）を返す"""
+        frames = self.frames.ordered()
+        inputs = self.inputs.ordered()
+
+        def percentiles(values):
+            if len(values) == 0:
+                return {'p50': float('nan'), 'p95': float('nan'), 'max': float('nan')}
+            p50, p95 = np.percentile(values, [50, 95])
+            return {'p50': float(p50), 'p95': float(p95), 'max': float(values.max())}
+
+        return {
+            'frames': self.frames.count,
+            'inputs': self.inputs.count,
+            'frame_ms': percentiles(frames['frame_ms']),
+            'render_ms': percentiles(frames['render_ms']),
+            'missed_ticks': int(frames['missed'].sum()),
+            'max_events': int(frames['events'].max()) if len(frames) else 0,
+            'input_latency_ms': percentiles(inputs['poll_gap_ms']),
+        }
+
+    def save(self, filename):
+        """記録を .npz として保存する（np.load(filename) で frames, inputs を読める）"""
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(filename, frames=self.frames.ordered(), inputs=self.inputs.ordered(),
+                            fps=self.fps, frame_count=self.frames.count, input_count=self.inputs.count)
+        s = self.summary()
+        print(f"Telemetry saved to {filename} (frames={s['frames']}, missed ticks={s['missed_ticks']}, "
+              f"render p95={s['render_ms']['p95']:.1f} ms, input latency max={s['input_latency_ms']['max']:.1f} ms).")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+think_time_model.py
+
+エージェントの時間消費ルールをパラメータ化したモデルと、
+人間の移動履歴の移動間隔（思考時間）に対するパラメータ推定を行うスクリプト．
+
+【モデル】
+- 1マスの移動には move_ms かかる．直前の移動と方向が変わる場合は turn_ms を加える
+- 意思決定ポイントでは
+      planning_ms + step_weight * (区間のステップ数) + cost_weight * (区間の総コスト)
+  だけ待機する（MazeAgent では到着した区間の値を使う）
+- ゴールへの最後の区間の前の待機は上の値に final_leg_scale を掛けたもの
+
+既定値（move_ms=20, step_weight=20, cost_weight=20, turn_ms=0, planning_ms=0, final_leg_scale=0.5）は
+これまでの MazeAgent の時間消費（1マス 20 ms，待機 (steps + cost) * 20，ゴール前 (steps + cost) * 10）と同じ．
+
+【推定】
+人間の移動履歴を待ち時間が threshold_ms 以上の手で区間に分け、各手の移動間隔を
+    move_ms + turn_ms * 方向転換 + 区間の開始 * (planning_ms + step_weight * 直前区間のステップ数 + cost_weight * 直前区間のコスト)
+で予測する．予測はパラメータについて線形なので、履歴ごとに特徴量行列を 1 回作れば
+パラメータの組全体に対する予測を行列積でまとめて計算できる．
+1手目（最初の計画）は評価から除く．
+最小二乗法はパラメータを 0 以上に制約して解く（負の待ち時間の係数は時間消費のルールとして意味を持たないため）．
+
+使い方：
+    python src/think_time_model.py [exp_data ディレクトリ] [並列数]
+"""
+
+import os
+import sys
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from corpus import load_maze, find_start, load_move_history, reconstruct_positions, think_times, iter_corpus
+from distance_field import maze_to_cost_grid
+
+# 特徴量・パラメータの並び（linear_params の順番）
+PARAM_NAMES = ['move_ms', 'turn_ms', 'planning_ms', 'step_weight', 'cost_weight']
+
+
+class ThinkTimeModel:
+    """エージェントの移動・待機時間のモデル"""
+
+    def __init__(self, move_ms=20, step_weight=20, cost_weight=20, turn_ms=0, planning_ms=0,
+                 final_leg_scale=0.5):
+        self.move_ms = move_ms
+        self.step_weight = step_weight
+        self.cost_weight = cost_weight
+        self.turn_ms = turn_ms
+        self.planning_ms = planning_ms
+        self.final_leg_scale = final_leg_scale
+
+    def move_time(self, move, prev_move):
+        """1マス移動にかかる時間"""
+        if prev_move is not None and move != prev_move:
+            return self.move_ms + self.turn_ms
+        return self.move_ms
+
+    def leg_wait(self, steps, cost):
+        """意思決定ポイントでの待機時間"""
+        return self.planning_ms + self.step_weight * steps + self.cost_weight * cost
+
+    def goal_wait(self, steps, cost):
+        """ゴールへ向かう前の待機時間"""
+        return self.final_leg_scale * self.leg_wait(steps, cost)
+
+    def linear_params(self):
+        """PARAM_NAMES の順に並べたパラメータ"""
+        return np.array([getattr(self, name) for name in PARAM_NAMES], dtype=float)
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name):g}" for name in PARAM_NAMES)
+        return f"ThinkTimeModel({values}, final_leg_scale={self.final_leg_scale:g})"
+
+
+def build_gap_features(maze, codes, start_time, timestamps, threshold_ms=500):
+    """
+    1つの移動履歴から、移動間隔の予測に使う特徴量行列と観測値を作る
+
+    戻り値：
+        X : (M-1, len(PARAM_NAMES)) の特徴量行列（1手目を除く）
+        y : (M-1,) の観測された移動間隔（ms）
+    """
+    cost_grid = maze_to_cost_grid(maze)
+    positions = reconstruct_positions(find_start(maze), codes)
+    move_cost = cost_grid[positions[1:, 0], positions[1:, 1]].astype(float)
+    gaps = think_times(start_time, timestamps).astype(float)
+
+    n = len(codes)
+    leg_start = gaps >= threshold_ms
+    leg_start[0] = True
+    leg_id = np.cumsum(leg_start) - 1
+    # 区間ごとのステップ数とコスト
+    leg_steps = np.bincount(leg_id, minlength=leg_id[-1] + 1).astype(float)
+    leg_cost = np.bincount(leg_id, weights=move_cost, minlength=leg_id[-1] + 1)
+    # 区間の開始の手には直前の区間の値を入れる
+    prev_steps = np.where(leg_start & (leg_id > 0), leg_steps[np.maximum(leg_id - 1, 0)], 0.0)
+    prev_cost = np.where(leg_start & (leg_id > 0), leg_cost[np.maximum(leg_id - 1, 0)], 0.0)
+    turn = np.zeros(n)
+    turn[1:] = codes[1:] != codes[:-1]
+
+    X = np.column_stack([np.ones(n), turn, leg_start.astype(float), prev_steps, prev_cost])
+    return X[1:], gaps[1:]
+
+
+def load_corpus_gap_features(data_dir="exp_data", threshold_ms=500):
+    """exp_data 以下の全ての人間の移動履歴について (名前, X, y) のリストを返す"""
+    corpus = []
+    for maze_file, history_file in iter_corpus(data_dir):
+        start_time, codes, timestamps = load_move_history(history_file)
+        X, y = build_gap_features(load_maze(maze_file), codes, start_time, timestamps, threshold_ms)
+        corpus.append((os.path.basename(maze_file), X, y))
+    return corpus
+
+
+def _grid_errors(args):
+    """パラメータの組 params (G, P) について各迷路の RMSE (G, 迷路数) を返す（並列実行用）"""
+    corpus, params = args
+    errors = np.empty((len(params), len(corpus)))
+    for k, (_, X, y) in enumerate(corpus):
+        residual = X @ params.T - y[:, None]
+        errors[:, k] = np.sqrt(np.mean(residual ** 2, axis=0))
+    return errors
+
+
+def grid_search(corpus, grid, workers=None, chunk_size=4096):
+    """
+    パラメータの組 grid（(G, len(PARAM_NAMES)) の配列）を並列に評価する
+
+    戻り値：
+        errors : (G, 迷路数) の各迷路での RMSE（ms）
+    """
+    grid = np.asarray(grid, dtype=float)
+    chunks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    if workers == 1 or len(chunks) == 1:
+        return np.vstack([_grid_errors((corpus, chunk)) for chunk in chunks])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return np.vstack(list(executor.map(_grid_errors, [(corpus, chunk) for chunk in chunks])))
+
+
+def _nnls(X, y, max_iter=None):
+    """
+    非負の制約付き最小二乗法（Lawson–Hanson の有効制約法）
+    min ||X p - y||  s.t.  p >= 0  の解 p を返す
+    """
+    n = X.shape[1]
+    max_iter = 3 * n if max_iter is None else max_iter
+    p = np.zeros(n)
+    passive = np.zeros(n, dtype=bool)   # 0 に固定していないパラメータ
+    tol = 1e-10 * max(1.0, np.abs(X).max()) * max(1.0, np.abs(y).max())
+    for _ in range(max_iter):
+        grad = X.T @ (y - X @ p)
+        if passive.all() or grad[~passive].max() <= tol:
+            break
+        passive[np.argmax(np.where(passive, -np.inf, grad))] = True
+        while True:
+            z = np.zeros(n)
+            z[passive], *_ = np.linalg.lstsq(X[:, passive], y, rcond=None)
+            if z[passive].min() > 0:
+                break
+            # 負になったパラメータが 0 になるところまで p から z へ近づけ、0 になったものを固定に戻す
+            neg = passive & (z <= 0)
+            alpha = np.min(p[neg] / (p[neg] - z[neg]))
+            p = p + alpha * (z - p)
+            passive &= p > tol
+        p = z
+    return p
+
+
+def fit_least_squares(corpus):
+    """
+    コーパス全体の二乗誤差を最小にするパラメータを最小二乗法で求める
+    時間のパラメータが負にならないよう、全てのパラメータを 0 以上に制約する（_nnls）
+    """
+    X = np.vstack([X for _, X, _ in corpus])
+    y = np.concatenate([y for _, _, y in corpus])
+    params = _nnls(X, y)
+    return ThinkTimeModel(**dict(zip(PARAM_NAMES, params)))
+
+
+def default_grid():
+    """グリッドサーチ用のパラメータの組"""
+    return np.array(list(itertools.product(
+        np.arange(150, 401, 25),      # move_ms
+        np.arange(0, 301, 25),        # turn_ms
+        np.arange(0, 3001, 250),      # planning_ms
+        np.arange(0, 101, 10),        # step_weight
+        np.arange(0, 21, 2),          # cost_weight
+    )), dtype=float)
+
+
+def print_errors(names, errors):
+    """迷路ごとの誤差を表示する"""
+    for name, err in zip(names, errors):
+        print(f"  {name}: RMSE = {err:.1f} ms")
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "exp_data"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    corpus = load_corpus_gap_features(data_dir)
+    names = [name for name, _, _ in corpus]
+
+    default = ThinkTimeModel()
+    print(f"### 既定のモデル {default} ###")
+    print_errors(names, _grid_errors((corpus, default.linear_params()[None, :]))[0])
+
+    grid = default_grid()
+    t0 = time.time()
+    errors = grid_search(corpus, grid, workers)
+    best = int(np.argmin(errors.mean(axis=1)))
+    model = ThinkTimeModel(**dict(zip(PARAM_NAMES, grid[best])))
+    print(f"### グリッドサーチ: {len(grid)} 通り, {time.time() - t0:.2f} 秒 ###")
+    print(f"best: {model}")
+    print_errors(names, errors[best])
+
+    model = fit_least_squares(corpus)
+    print(f"### 最小二乗法: {model} ###")
+    print_errors(names, _grid_errors((corpus, model.linear_params()[None, :]))[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+trajectory_align.py
+
+2 つの移動履歴（エージェントと人間など）の軌跡を整列し、距離と「対応付けた手どうしの時刻のずれ」を求める．
+
+- 軌跡は各手の直前の座標の列（スタートを含む，corpus.reconstruct_positions）と、
+  そのマスに着いた時刻（開始からの ms）の列とする
+- 距離は 2 種類
+    dtw  : 動的時間伸縮．マスどうしの局所コストはマンハッタン距離
+    edit : 編集距離．マスの列を記号列とみなし、挿入・削除・置換（違うマス）をそれぞれ 1 とする
+- 動的計画法は反対角線（i + j が一定の線）ごとに NumPy の配列演算でまとめて計算する
+  （同じ反対角線上のセルは互いに依存しない）．band を指定すると、対角線（長さの比で引いた線）から
+  band 以上離れたセルを計算しない（Sakoe-Chiba 帯）．各反対角線は帯の中の部分だけを保存する．
+  長さの比が大きいと細い帯では端から端までつながらないので、帯の幅は少なくとも長さの比（切り上げ）にする
+- 最適な対応付けを逆にたどり、対応付けた手（dtw は全ての対応，edit は同じマスどうしの対応）の
+  時刻のずれの絶対値の平均・中央値を求める
+- コーパスの履歴のうち同じ迷路の履歴どうしの組の距離を ProcessPoolExecutor で並列に計算し、類似度行列にする
+  （違う迷路の座標を比べても意味が無いので、違う迷路の組は計算せず NaN にする）
+    類似度（dtw）  : 1 / (1 + 距離 / 対応の数)
+    類似度（edit） : 1 − 距離 / max(長さ)
+  exp_data/alignment/similarity_<方式>.csv（と .npz）に保存する
+
+使い方：
+    python src/trajectory_align.py <移動履歴 A> <移動履歴 B> [dtw|edit] [band]
+    python src/trajectory_align.py corpus [exp_data ディレクトリ] [dtw|edit] [band] [並列数]
+      （move_history 以下の全ての履歴（人間・エージェント）を対象にする）
+"""
+
+import os
+import re
+import sys
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from corpus import load_maze, find_start, load_move_history, reconstruct_positions, find_maze_for_history
+
+INF = np.inf
+# 逆にたどるときの手（0: 斜め, 1: 上（i だけ進む）, 2: 左（j だけ進む））
+DIAG, UP, LEFT = 0, 1, 2
+
+
+class Trajectory:
+    """1つの移動履歴の軌跡（座標の列と各座標に着いた時刻の列）"""
+
+    def __init__(self, name, positions, times, maze_file=None):
+        self.name = name
+        self.positions = positions    # (N+1, 2) int
+        self.times = times            # (N+1,) int（開始からの ms）
+        self.maze_file = maze_file
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def load_trajectory(history_file, maze_file=None):
+    """移動履歴（と対応する迷路）から Trajectory を作る"""
+    maze_file = maze_file if maze_file is not None else find_maze_for_history(
+        history_file, os.path.join(os.path.dirname(os.path.dirname(history_file)) or ".", "maze"))
+    if maze_file is None:
+        raise FileNotFoundError(f"迷路ファイルが見つかりません: {history_file}")
+    start_time, codes, timestamps = load_move_history(history_file)
+    positions = reconstruct_positions(find_start(load_maze(maze_file)), codes)
+    times = np.concatenate([[0], timestamps - start_time])
+    return Trajectory(os.path.basename(history_file), positions, times, maze_file)
+
+
+def _diagonal_range(k, n, m, band):
+    """反対角線 i + j = k 上で計算するセルの i の範囲 [lo, hi]（無ければ lo > hi）"""
+    lo, hi = max(0, k - m + 1), min(n - 1, k)
+    if band is None or lo > hi:
+        return lo, hi
+    # 対角線 i / (n-1) = j / (m-1) からの i 方向のずれが band 以内のセルだけ
+    ii = np.arange(lo, hi + 1)
+    jj = k - ii
+    center = jj * (n - 1) / max(m - 1, 1)
+    keep = np.flatnonzero(np.abs(ii - center) <= band)
+    if len(keep) == 0:
+        return 1, 0
+    return lo + int(keep[0]), lo + int(keep[-1])
+
+
+def _take(values, lo, idx):
+    """反対角線の配列 values（i = lo から始まる）から、i = idx の値を取る（範囲外は INF）"""
+    pos = idx - lo
+    valid = (pos >= 0) & (pos < len(values))
+    out = np.full(len(idx), INF)
+    out[valid] = values[pos[valid]]
+    return out
+
+
+def align(a, b, method='dtw', band=None):
+    """
+    2 つの座標の列 a (n, 2), b (m, 2) を整列する
+
+    戻り値：
+        distance : 距離（到達できない帯の場合は INF）
+        pairs    : 対応付けた (i, j) の配列 (L, 2)（edit では同じマスどうしの対応だけ）
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    if method == 'edit':
+        # 長さ 0 の接頭辞を含めて (n+1) × (m+1) の表にする（座標は 1 つずらして参照する）
+        n, m = len(a) + 1, len(b) + 1
+    elif method == 'dtw':
+        n, m = len(a), len(b)
+    else:
+        raise ValueError(f"未知の方式です: {method}（dtw か edit）")
+    if band is not None:
+        # 対角線の傾きより細い帯では、長い方の列で 1 つ進む間に帯の外へ出てしまう
+        band = max(band, 1, math.ceil(max(n - 1, m - 1) / max(min(n - 1, m - 1), 1)))
+
+    diagonals, lows, moves = [], [], []
+    for k in range(n + m - 1):
+        lo, hi = _diagonal_range(k, n, m, band)
+        ii = np.arange(lo, hi + 1)
+        jj = k - ii
+        if k == 0:
+            d = np.array([0.0 if method == 'edit' else float(np.abs(a[0] - b[0]).sum())])
+            diagonals.append(d)
+            lows.append(lo)
+            moves.append(np.array([DIAG], dtype=np.int8))
+            continue
+        prev, prev_lo = diagonals[k - 1], lows[k - 1]
+        prev2, prev2_lo = (diagonals[k - 2], lows[k - 2]) if k >= 2 else (np.zeros(0), 0)
+        up = _take(prev, prev_lo, ii - 1)      # (i-1, j)
+        left = _take(prev, prev_lo, ii)        # (i, j-1)
+        diag = _take(prev2, prev2_lo, ii - 1)  # (i-1, j-1)
+        if method == 'dtw':
+            local = np.abs(a[ii] - b[jj]).sum(axis=1).astype(float)
+            candidates = np.stack([diag + local, up + local, left + local])
+        else:
+            ai = a[np.maximum(ii - 1, 0)]
+            bj = b[np.maximum(jj - 1, 0)]
+            mismatch = np.any(ai != bj, axis=1).astype(float)
+            candidates = np.stack([diag + mismatch, up + 1, left + 1])
+        choice = np.argmin(candidates, axis=0)
+        diagonals.append(candidates[choice, np.arange(len(ii))])
+        lows.append(lo)
+        moves.append(choice.astype(np.int8))
+
+    distance = float(_take(diagonals[-1], lows[-1], np.array([n - 1]))[0])
+    if not np.isfinite(distance):
+        return INF, np.zeros((0, 2), dtype=np.int64)
+
+    # 最適な対応付けを逆にたどる
+    pairs = []
+    i, j = n - 1, m - 1
+    while i > 0 or j > 0:
+        move = moves[i + j][i - lows[i + j]]
+        if method == 'dtw':
+            pairs.append((i, j))
+        elif move == DIAG and i > 0 and j > 0 and (a[i - 1] == b[j - 1]).all():
+            pairs.append((i - 1, j - 1))
+        if move == DIAG:
+            i, j = i - 1, j - 1
+        elif move == UP:
+            i -= 1
+        else:
+            j -= 1
+    if method == 'dtw':
+        pairs.append((0, 0))
+    return distance, np.array(pairs[::-1], dtype=np.int64).reshape(-1, 2)
+
+
+def compare(ta, tb, method='dtw', band=None):
+    """
+    2 つの Trajectory を整列し、距離・類似度・時刻のずれをまとめた辞書を返す
+    """
+    distance, pairs = align(ta.positions, tb.positions, method, band)
+    if not np.isfinite(distance):
+        return {'distance': INF, 'similarity': 0.0, 'pairs': 0, 'mean_time_error_ms': np.nan,
+                'median_time_error_ms': np.nan}
+    if method == 'dtw':
+        similarity = 1.0 / (1.0 + distance / max(len(pairs), 1))
+    else:
+        similarity = 1.0 - distance / max(len(ta), len(tb))
+    errors = np.abs(ta.times[pairs[:, 0]] - tb.times[pairs[:, 1]]) if len(pairs) else np.zeros(0)
+    return {
+        'distance': distance,
+        'similarity': similarity,
+        'pairs': len(pairs),
+        'mean_time_error_ms': float(errors.mean()) if len(errors) else np.nan,
+        'median_time_error_ms': float(np.median(errors)) if len(errors) else np.nan,
+    }
+
+
+def _compare_chunk(args):
+    """履歴の組 (i, j) のリストそれぞれの距離・類似度を返す（並列実行用）"""
+    trajectories, pairs, method, band = args
+    results = []
+    for i, j in pairs:
+        result = compare(trajectories[i], trajectories[j], method, band)
+        results.append((i, j, result['distance'], result['similarity'], result['mean_time_error_ms']))
+    return results
+
+
+def similarity_matrix(trajectories, method='dtw', band=None, workers=None, chunk_size=16):
+    """
+    同じ迷路の全ての組の距離・類似度・時刻のずれの平均を並列に求める
+    （迷路が分からない Trajectory は、迷路が分からないものどうしで比べる）
+
+    戻り値：
+        distance, similarity, time_error : (T, T) の配列（対角は 0, 1, 0．違う迷路の組は NaN）
+    """
+    t = len(trajectories)
+    pairs = [(i, j) for i in range(t) for j in range(i + 1, t)
+             if trajectories[i].maze_file == trajectories[j].maze_file]
+    chunks = [(trajectories, pairs[k:k + chunk_size], method, band) for k in range(0, len(pairs), chunk_size)]
+    distance = np.full((t, t), np.nan)
+    similarity = np.full((t, t), np.nan)
+    time_error = np.full((t, t), np.nan)
+    np.fill_diagonal(distance, 0)
+    np.fill_diagonal(similarity, 1)
+    np.fill_diagonal(time_error, 0)
+    if workers == 1 or len(chunks) <= 1:
+        results = map(_compare_chunk, chunks)
+        for chunk in results:
+            _fill(chunk, distance, similarity, time_error)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in executor.map(_compare_chunk, chunks):
+                _fill(chunk, distance, similarity, time_error)
+    return distance, similarity, time_error
+
+
+def _fill(chunk, distance, similarity, time_error):
+    for i, j, d, s, e in chunk:
+        distance[i, j] = distance[j, i] = d
+        similarity[i, j] = similarity[j, i] = s
+        time_error[i, j] = time_error[j, i] = e
+
+
+def corpus_trajectories(data_dir="exp_data"):
+    """move_history 以下の全ての移動履歴（人間・エージェント）の Trajectory を返す"""
+    history_dir = os.path.join(data_dir, "move_history")
+    maze_dir = os.path.join(data_dir, "maze")
+    trajectories = []
+    for filename in sorted(os.listdir(history_dir)):
+        if not re.fullmatch(r"\w*move_history(_\d+)?\.txt", filename):
+            continue
+        history_file = os.path.join(history_dir, filename)
+        maze_file = find_maze_for_history(history_file, maze_dir)
+        if maze_file is not None:
+            trajectories.append(load_trajectory(history_file, maze_file))
+    return trajectories
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'corpus':
+        data_dir = sys.argv[2] if len(sys.argv) > 2 else "exp_data"
+        method = sys.argv[3] if len(sys.argv) > 3 else 'dtw'
+        band = int(sys.argv[4]) if len(sys.argv) > 4 and sys.argv[4] != 'none' else None
+        workers = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        trajectories = corpus_trajectories(data_dir)
+        if len(trajectories) < 2:
+            print(f"{data_dir} に比べられる移動履歴がありません．")
+            sys.exit(1)
+        t0 = time.perf_counter()
+        distance, similarity, time_error = similarity_matrix(trajectories, method, band, workers)
+        elapsed = time.perf_counter() - t0
+        names = [t.name for t in trajectories]
+        out_dir = os.path.join(data_dir, "alignment")
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.join(out_dir, f"similarity_{method}")
+        with open(base + ".csv", 'w', encoding='utf-8') as f:
+            f.write(',' + ','.join(names) + '\n')
+            for name, row in zip(names, similarity):
+                f.write(name + ',' + ','.join(f"{v:.4f}" if np.isfinite(v) else '' for v in row) + '\n')
+        np.savez_compressed(base + ".npz", names=np.array(names), distance=distance, similarity=similarity,
+                            time_error_ms=time_error)
+        n_pairs = int((~np.isnan(similarity)).sum() - len(names)) // 2
+        n_mazes = len({t.maze_file for t in trajectories})
+        print(f"{len(names)} 個の履歴（{n_mazes} 個の迷路），同じ迷路の {n_pairs} 組（{method}, band={band}）: "
+              f"{elapsed:.2f} s → {base}.csv")
+        for i, name in enumerate(names):
+            others = np.where((np.arange(len(names)) == i) | np.isnan(similarity[i]), -np.inf, similarity[i])
+            j = int(np.argmax(others))
+            if not np.isfinite(others[j]):
+                print(f"  {name}: 同じ迷路の履歴がありません")
+                continue
+            print(f"  {name}: 最も近い {names[j]}（類似度 {similarity[i, j]:.3f}，"
+                  f"時刻のずれの平均 {time_error[i, j] / 1000:.1f} s）")
+        return
+
+    if len(sys.argv) < 3:
+        print("Usage: python trajectory_align.py <history_a> <history_b> [dtw|edit] [band]")
+        print("       python trajectory_align.py corpus [exp_data] [dtw|edit] [band|none] [workers]")
+        sys.exit(1)
+    method = sys.argv[3] if len(sys.argv) > 3 else 'dtw'
+    band = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    ta, tb = load_trajectory(sys.argv[1]), load_trajectory(sys.argv[2])
+    t0 = time.perf_counter()
+    result = compare(ta, tb, method, band)
+    elapsed = time.perf_counter() - t0
+    print(f"{ta.name}（{len(ta)} 点）と {tb.name}（{len(tb)} 点）: {method} 距離 {result['distance']:.1f}，"
+          f"類似度 {result['similarity']:.3f}（{elapsed * 1000:.1f} ms）")
+    print(f"対応付けた手 {result['pairs']} 組の時刻のずれ: 平均 {result['mean_time_error_ms'] / 1000:.2f} s，"
+          f"中央値 {result['median_time_error_ms'] / 1000:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+viewport.py
+
+画面に収まらない大きな迷路をゲーム・リプレイで表示するための補助モジュール．
+
+- Viewport：ウィンドウの大きさを max_width × max_height までに抑え、プレイヤーを中心にスクロールする（カメラ追従）．
+  拡大・縮小（zoom）ができ、描画は画面に見えているマスだけに絞る（visible_cells）
+  迷路がウィンドウに収まる場合は従来通り（TILE_SIZE のマスで迷路全体）の表示になる
+- Minimap：迷路全体を 1 マス 1 ピクセルで描いて縮小した全体図．探索済みのマスが増えたときだけ作り直し、
+  普段はキャッシュした Surface を貼るだけにする
+- GlyphCache：マスのコストの数字の画像をキャッシュする（毎フレーム font.render しない）
+"""
+
+import numpy as np
+import pygame
+
+MIN_ZOOM = 0.25
+MAX_ZOOM = 2.0
+
+# ミニマップの色（ゲームの色と同じ）
+_WALL = (0, 0, 0)
+_OPEN = (0, 255, 255)
+_VISITED = (192, 192, 192)
+_START = (255, 0, 0)
+_PLAYER = (255, 255, 0)
+_FRAME = (255, 255, 255)
+
+
+class Viewport:
+    """迷路のうちウィンドウに表示する範囲（カメラ）"""
+
+    def __init__(self, rows, cols, tile_size=40, max_width=1280, max_height=800):
+        self.rows = rows
+        self.cols = cols
+        self.base_tile = tile_size
+        self.zoom = 1.0
+        self.width = min(cols * tile_size, max_width)
+        self.height = min(rows * tile_size, max_height)
+        self.left = 0  # 表示範囲の左上（迷路全体の画像でのピクセル座標）
+        self.top = 0
+
+    @property
+    def tile(self):
+        """現在の拡大率での 1 マスの大きさ（ピクセル）"""
+        return max(2, int(round(self.base_tile * self.zoom)))
+
+    def fits(self):
+        """迷路全体がウィンドウに収まっているか"""
+        return self.cols * self.tile <= self.width and self.rows * self.tile <= self.height
+
+    def set_zoom(self, zoom):
+        """拡大率を MIN_ZOOM〜MAX_ZOOM の範囲で設定する"""
+        self.zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+
+    def handle_key(self, key):
+        """拡大・縮小のキー（+ / -）なら拡大率を変えて True を返す"""
+        if key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self.set_zoom(self.zoom * 1.25)
+            return True
+        if key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.set_zoom(self.zoom / 1.25)
+            return True
+        return False
+
+    def follow(self, position):
+        """position（行, 列）のマスが中央に来るようにスクロールする（迷路の外は表示しない）"""
+        i, j = position
+        t = self.tile
+        self.left = min(max(j * t + t // 2 - self.width // 2, 0), max(self.cols * t - self.width, 0))
+        self.top = min(max(i * t + t // 2 - self.height // 2, 0), max(self.rows * t - self.height, 0))
+
+    def visible_cells(self):
+        """表示範囲に入るマスの範囲 (row0, row1, col0, col1)（row1, col1 は含まない）を返す"""
+        t = self.tile
+        return (self.top // t, min(self.rows, (self.top + self.height - 1) // t + 1),
+                self.left // t, min(self.cols, (self.left + self.width - 1) // t + 1))
+
+    def tile_rect(self, i, j):
+        """マス (i, j) のウィンドウ上の矩形 (x, y, w, h) を返す"""
+        t = self.tile
+        return (j * t - self.left, i * t - self.top, t, t)
+
+
+class Minimap:
+    """迷路全体の縮小図（探索済みのマスが増えたときだけ作り直す）"""
+
+    def __init__(self, maze, size=160):
+        self.rows = len(maze)
+        self.cols = len(maze[0])
+        scale = size / max(self.rows, self.cols)
+        self.size = (max(1, int(self.cols * scale)), max(1, int(self.rows * scale)))
+        # surfarray は (x, y) = (列, 行) の順
+        is_open = np.array([[c.isdigit() for c in row] for row in maze], dtype=bool).T
+        self.base = np.zeros((self.cols, self.rows, 3), dtype=np.uint8)
+        self.base[is_open] = _OPEN
+        self.base[~is_open] = _WALL
+        self.surface = None
+        self.n_visited = -1
+
+    def update(self, visited, start):
+        """探索済みのマスの数が変わっていれば縮小図を作り直す"""
+        if len(visited) == self.n_visited:
+            return
+        pixels = self.base.copy()
+        if visited:
+            cells = np.array(list(visited), dtype=np.int64)
+            pixels[cells[:, 1], cells[:, 0]] = _VISITED
+        pixels[start[1], start[0]] = _START
+        self.surface = pygame.transform.scale(pygame.surfarray.make_surface(pixels), self.size)
+        self.n_visited = len(visited)
+
+    def draw(self, screen, viewport, player, margin=8):
+        """ウィンドウの右上に縮小図・表示範囲の枠・プレイヤーの位置を描く"""
+        if self.surface is None:
+            return
+        w, h = self.size
+        x0 = viewport.width - w - margin
+        y0 = margin
+        screen.blit(self.surface, (x0, y0))
+        sx = w / self.cols
+        sy = h / self.rows
+        t = viewport.tile
+        frame = (x0 + viewport.left / t * sx, y0 + viewport.top / t * sy,
+                 viewport.width / t * sx, viewport.height / t * sy)
+        pygame.draw.rect(screen, _FRAME, frame, 1)
+        pygame.draw.rect(screen, _FRAME, (x0 - 1, y0 - 1, w + 2, h + 2), 1)
+        pygame.draw.circle(screen, _PLAYER, (int(x0 + (player[1] + 0.5) * sx), int(y0 + (player[0] + 0.5) * sy)),
+                           max(2, int(min(sx, sy))))
+
+
+class GlyphCache:
+    """マスのコストの数字の画像のキャッシュ"""
+
+    def __init__(self, font):
+        self.font = font
+        self.glyphs = {}
+
+    def get(self, text, color):
+        key = (text, color)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            glyph = self.glyphs[key] = self.font.render(text, True, color)
+        return glyph